@@ -4,16 +4,25 @@
 
 """Functions for handling Authentik and its API."""
 
+import hashlib
 import json
 import logging
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse
 
 import requests
 
 from ._helpers import make_url, remove_path_from_url
+from ._metrics import ApiMetrics, normalize_endpoint
+from ._trace import SPAN_KIND_CLIENT, Tracer
 from ._user import User
 
+# Maximum number of API requests sent at the same time by batch operations
+MAX_CONCURRENT_REQUESTS = 8
+
 
 class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
     """Class for Authentik API and."""
@@ -26,6 +35,8 @@ class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
         invitation_expiry_days: int = 30,
         create_missing_groups: bool = False,
         dry: bool = False,
+        metrics: ApiMetrics | None = None,
+        tracer: Tracer | None = None,
     ) -> None:
         """Initialize the Authentik API client.
 
@@ -37,8 +48,15 @@ class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
             create_missing_groups (bool, optional): If True, missing groups will be created.
                 Defaults to False
             dry (bool, optional): If True, non-GET API calls will not be executed. Defaults to False
+            metrics (ApiMetrics, optional): Where to record the numbers of all requests. Defaults
+                to a new, empty instance
+            tracer (Tracer, optional): The tracer to record a span per request with. Defaults to
+                a disabled tracer
         """
         self.url: str = url + "/api/v3"
+        self.metrics: ApiMetrics = metrics if metrics is not None else ApiMetrics()
+        self.tracer: Tracer = tracer if tracer is not None else Tracer(enabled=False)
+        self._base_path: str = urlparse(self.url).path
         self.headers: dict[str, str] = {
             "Authorization": f"Bearer {token}",
             "Accept": "application/json",
@@ -50,6 +68,61 @@ class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
         self.create_missing_groups: bool = create_missing_groups
         self.dry: bool = dry
 
+    def _send_request(self, url: str, method: str, data: dict | None) -> requests.Response | None:
+        """Send a request with the given method, or nothing for a write in a dry run.
+
+        Raises:
+            ValueError: If an invalid HTTP method is provided.
+        """
+        if method == "GET":
+            return requests.get(url, headers=self.headers, params=data, timeout=10)
+        # In dry run, do not execute non-GET calls
+        if self.dry:
+            logging.info("Dry run, not executing the above API call")
+            return None
+
+        if method == "POST":
+            return requests.post(url, headers=self.headers, json=data, timeout=10)
+        if method == "PATCH":
+            return requests.patch(url, headers=self.headers, json=data, timeout=10)
+        if method == "DELETE":
+            return requests.delete(url, headers=self.headers, timeout=10)
+        msg = f"Invalid method: {method}"
+        raise ValueError(msg)
+
+    def _measured_request(
+        self, url: str, method: str, data: dict | None
+    ) -> requests.Response | None:
+        """Send a request, and record its status, duration and size in the metrics."""
+        start = time.perf_counter()
+        response = self._send_request(url, method=method, data=data)
+        if response is not None:
+            self.metrics.record(
+                method=method,
+                path=urlparse(url).path.removeprefix(self._base_path),
+                status=response.status_code,
+                seconds=time.perf_counter() - start,
+                size=len(response.content or b""),
+            )
+        return response
+
+    def _traced_request(self, url: str, method: str, data: dict | None) -> requests.Response | None:
+        """Send a request as `_measured_request` does, and record it as a client span."""
+        path = urlparse(url).path.removeprefix(self._base_path)
+        with self.tracer.span(
+            f"{method} {normalize_endpoint(path)}",
+            kind=SPAN_KIND_CLIENT,
+            **{"http.request.method": method, "url.full": url},
+        ) as span:
+            response = self._measured_request(url, method=method, data=data)
+            if response is None:
+                span.set("dry_run", True)
+            else:
+                span.set("http.response.status_code", response.status_code)
+                if response.status_code >= 400:  # noqa: PLR2004
+                    span.error = f"HTTP {response.status_code}"
+        return response
+
     def _api_request(
         self,
         url: str,
@@ -75,23 +148,13 @@ class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
         """
         logging.info("API call: %s %s with data %s", method, url, data)
 
-        if method == "GET":
-            response = requests.get(url, headers=self.headers, params=data, timeout=10)
+        # Without a trace file, not even the name and attributes of a span are built
+        if self.tracer.enabled:
+            response = self._traced_request(url, method=method, data=data)
         else:
-            # In dry run, do not execute non-GET calls but return empty dict
-            if self.dry:
-                logging.info("Dry run, not executing the above API call")
-                return {}
-
-            if method == "POST":
-                response = requests.post(url, headers=self.headers, json=data, timeout=10)
-            elif method == "PATCH":
-                response = requests.patch(url, headers=self.headers, json=data, timeout=10)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=self.headers, timeout=10)
-            else:
-                msg = f"Invalid method: {method}"
-                raise ValueError(msg)
+            response = self._measured_request(url, method=method, data=data)
+        if response is None:
+            return {}
 
         if response.status_code not in range(200, 300):
             logging.error(
@@ -148,7 +211,24 @@ class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
             return [{}]
 
         # Paginate through all pages for list endpoints
-        all_results: list[dict] = []
+        return list(self.iter_results(url=url, method=method, data=data))
+
+    def iter_results(
+        self, url: str, method: str = "GET", data: dict | None = None
+    ) -> Iterator[dict]:
+        """Iterate the results of a list endpoint, requesting one page after the other.
+
+        Unlike `api_call` with `returns_list`, only the current page is held in memory, so
+        callers can convert the results into a compact form while iterating.
+
+        Args:
+            url (str): The URL of the list endpoint.
+            method (str, optional): The HTTP method to use. Defaults to "GET".
+            data (dict, optional): Filter attributes to send with each request. Defaults to None.
+
+        Yields:
+            dict: The results of all pages, in order.
+        """
         page = 1
         page_size = 500
         while True:
@@ -158,7 +238,7 @@ class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
 
             result = self._api_request(url=url, method=method, data=paginated_data)
             logging.debug("API response pagination: %s", result.get("pagination", {}))
-            all_results.extend(result.get("results", []))
+            yield from result.get("results", [])
 
             pagination = result.get("pagination", {})
             total_pages = pagination.get("total_pages", 1)
@@ -166,8 +246,6 @@ class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
                 break
             page += 1
 
-        return all_results
-
     # --------------------------------------------------------------------------
     # USERS
     # --------------------------------------------------------------------------
@@ -177,6 +255,10 @@ class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
         api_url = self.url + "/core/users/"
         return self.api_call(url=api_url, returns_list=True)
 
+    def iter_users(self) -> Iterator[dict]:
+        """Iterate all users, holding only one page of them in memory at a time."""
+        return self.iter_results(url=self.url + "/core/users/")
+
     def get_users(self, **attributes: str) -> list[dict]:
         """Get one or multiple users by optional attributes, see
         https://docs.goauthentik.io/docs/developer-docs/api/reference/core-users-list.
@@ -299,14 +381,62 @@ class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
         api_url = self.url + "/core/groups/"
         return self.api_call(url=api_url, returns_list=True)
 
-    def create_group(self, group_name: str) -> str:
-        """Create a new group."""
+    def iter_groups(self) -> Iterator[dict]:
+        """Iterate all groups, holding only one page of them in memory at a time."""
+        return self.iter_results(url=self.url + "/core/groups/")
+
+    def _post_group(self, group_name: str) -> str:
+        """Create a new group without announcing it, and return its UUID."""
         api_url = self.url + "/core/groups/"
         data = {"name": group_name}
         group = self.api_call(url=api_url, method="POST", data=data)
-        print("Group created:", group_name)
         return str(group.get("pk", ""))
 
+    def create_group(self, group_name: str) -> str:
+        """Create a new group."""
+        group_uuid = self._post_group(group_name)
+        print("Group created:", group_name)
+        return group_uuid
+
+    def _map_concurrently(self, func: Callable[[str], str], names: list[str]) -> dict[str, str]:
+        """Call `func` for each name in parallel threads and map the names to the results."""
+        if not names:
+            return {}
+        workers = min(MAX_CONCURRENT_REQUESTS, len(names))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(names, executor.map(func, names), strict=True))
+
+    def create_groups(self, group_names: Iterable[str]) -> dict[str, str]:
+        """Create several new groups at once, with concurrent requests.
+
+        The created groups are announced after all of them have been created, in alphabetical
+        order.
+
+        Args:
+            group_names (Iterable[str]): Names of the groups to create.
+
+        Returns:
+            dict[str, str]: The UUIDs of the created groups by name.
+        """
+        group_uuids = self._map_concurrently(self._post_group, sorted(set(group_names)))
+        for group_name in group_uuids:
+            print("Group created:", group_name)
+        return group_uuids
+
+    def get_group_uuids_by_name(self, group_names: Iterable[str]) -> dict[str, str]:
+        """Get the uuids of several groups at once, with concurrent requests.
+
+        Like `get_group_uuid_by_name`, missing groups are created if `create_missing_groups` is
+        enabled, and a ValueError is raised otherwise.
+
+        Args:
+            group_names (Iterable[str]): Names of the groups to look up.
+
+        Returns:
+            dict[str, str]: The UUIDs of the groups by name.
+        """
+        return self._map_concurrently(self.get_group_uuid_by_name, sorted(set(group_names)))
+
     def get_group_uuid_by_name(self, group_name: str) -> str:
         """Get a specific group's uuid by its name."""
         api_url = self.url + "/core/groups/"
@@ -345,3 +475,66 @@ class AuthentikAPI:  # pylint: disable=too-many-instance-attributes
         api_url = self.url + "/core/groups/" + str(group_uuid) + "/remove_user/"
         data = {"pk": user_id}
         return self.api_call(url=api_url, method="POST", data=data)
+
+    # --------------------------------------------------------------------------
+    # STATE
+    # --------------------------------------------------------------------------
+
+    def _count_and_first(self, api_url: str, **attributes: str) -> tuple[int, dict]:
+        """Get the total number of objects of a list endpoint, and the first one of them."""
+        result = self._api_request(url=api_url, data={"page_size": 1, **attributes})
+        count: int = result.get("pagination", {}).get("count", 0)
+        first: dict = (result.get("results") or [{}])[0]
+        return count, first
+
+    def _hash_users(self) -> str:
+        """Return a hash of all users, except their last login, which changes without edits."""
+        digest = hashlib.sha256()
+        for user in self.iter_users():
+            user.pop("last_login", None)
+            digest.update(json.dumps(user, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get_state_fingerprint(self) -> dict:
+        """Get a cheap fingerprint of the users, groups and invitations in Authentik.
+
+        It consists of the number of all and of active users, the time of the latest change to
+        a user, a hash of the names and members of all groups, and the number of invitations.
+        Users and invitations cost one small request each, plus one to check the order of the
+        users, groups one request per 500 groups, without the user objects. It changes when
+        objects are added or removed, users are edited or deactivated, or group memberships are
+        edited by hand.
+
+        If the server ignores the ordering by `last_updated`, e.g. an Authentik version without
+        this field, the newest and the oldest user are the same. Then a hash of all users takes
+        the place of the latest change, which costs one request per 500 users.
+        """
+        users, newest_user = self._count_and_first(
+            self.url + "/core/users/", ordering="-last_updated"
+        )
+        _, oldest_user = self._count_and_first(self.url + "/core/users/", ordering="last_updated")
+        if users > 1 and newest_user.get("pk") == oldest_user.get("pk"):
+            logging.info("Users are not ordered by their last update, hashing all users instead")
+            last_updated = self._hash_users()
+        else:
+            last_updated = newest_user.get("last_updated", "")
+        active_users, _ = self._count_and_first(self.url + "/core/users/", is_active="true")
+        groups = 0
+        memberships = hashlib.sha256()
+        for group in self.iter_results(
+            url=self.url + "/core/groups/", data={"include_users": "false"}
+        ):
+            groups += 1
+            member_pks = sorted(group.get("users") or [])
+            memberships.update(
+                json.dumps([group.get("pk"), group.get("name"), member_pks]).encode()
+            )
+        invitations, _ = self._count_and_first(self.url + "/stages/invitation/invitations/")
+        return {
+            "users": users,
+            "active_users": active_users,
+            "last_updated": last_updated,
+            "groups": groups,
+            "group_members": memberships.hexdigest(),
+            "invitations": invitations,
+        }
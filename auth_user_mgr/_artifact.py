@@ -0,0 +1,137 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Compile a user inventory into a single pre-validated artifact, and load it again."""
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import zlib
+from pathlib import Path
+
+from ._config import read_users_config, scan_inventory_files
+from ._fileio import write_bytes_atomic
+
+# Magic bytes and format version at the start of every artifact
+ARTIFACT_MAGIC = b"AUMI"
+ARTIFACT_VERSION = 1
+_HEADER = struct.Struct(">4sH")
+
+
+def hash_source_files(
+    file_or_dir: Path, exclude: tuple[str, ...] | list[str] = ()
+) -> dict[str, str]:
+    """Return the SHA-256 hashes of the inventory files, by path relative to the inventory."""
+    base = file_or_dir if file_or_dir.is_dir() else file_or_dir.parent
+    return {
+        f.path.relative_to(base).as_posix(): hashlib.sha256(f.path.read_bytes()).hexdigest()
+        for f in scan_inventory_files(file_or_dir, exclude=exclude)
+    }
+
+
+def is_inventory_artifact(path: str | Path) -> bool:
+    """Check whether a path is a compiled inventory artifact, based on its magic bytes."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC
+    except OSError:
+        return False
+
+
+def compile_inventory(
+    user_config_path: str, output: str | Path, exclude: tuple[str, ...] | list[str] = ()
+) -> list[dict]:
+    """Compile a user inventory file or directory into a single artifact.
+
+    The users are read, checked for unique emails, sorted and validated exactly as for a sync.
+    The artifact stores them together with the hashes of all source files, so a later load can
+    check that it still matches the inventory. It consists of a short header with magic bytes
+    and the format version, followed by the zlib-compressed JSON payload.
+
+    Args:
+        user_config_path (str): Path to the user inventory file or directory.
+        output (str | Path): Path of the artifact to write.
+        exclude (tuple[str, ...] | list[str], optional): Glob patterns of inventory files or
+            directories to skip.
+
+    Returns:
+        list[dict]: The compiled users.
+    """
+    source = Path(user_config_path)
+    output = Path(output)
+    hashes = hash_source_files(source, exclude=exclude)
+    users_config = read_users_config(user_config_path, exclude=exclude)
+
+    payload = {
+        # Relative to the artifact, so the artifact and inventory can move together
+        "source": Path(os.path.relpath(source.resolve(), output.resolve().parent)).as_posix(),
+        "exclude": list(exclude),
+        "files": hashes,
+        "users": users_config,
+    }
+    data = _HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION) + zlib.compress(
+        json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    )
+    write_bytes_atomic(output, data)
+    logging.info("Compiled %d users from %d files into %s", len(users_config), len(hashes), output)
+    return users_config
+
+
+def load_inventory_artifact(path: str | Path) -> list[dict]:
+    """Load the users from a compiled inventory artifact.
+
+    If the source inventory the artifact was compiled from exists, the hashes of its files are
+    compared with the ones stored in the artifact. If it cannot be found, e.g. because only the
+    artifact was passed on to a pipeline job, a warning is logged and the users are loaded
+    anyway.
+
+    Args:
+        path (str | Path): Path of the artifact.
+
+    Returns:
+        list[dict]: The users, validated, deduplicated and sorted by email.
+
+    Raises:
+        ValueError: If the file is not a valid artifact, was written by an incompatible version,
+            or no longer matches its source files.
+    """
+    path = Path(path)
+    data = path.read_bytes()
+    try:
+        magic, version = _HEADER.unpack_from(data)
+        if magic != ARTIFACT_MAGIC:
+            msg = "missing magic bytes"
+            raise ValueError(msg)  # noqa: TRY301
+        if version != ARTIFACT_VERSION:
+            msg = f"format version {version}, expected {ARTIFACT_VERSION}"
+            raise ValueError(msg)  # noqa: TRY301
+        payload = json.loads(zlib.decompress(data[_HEADER.size :]))
+    except (struct.error, zlib.error, ValueError) as e:
+        msg = f"Invalid inventory artifact {path}: {e}. Recompile it with 'auth-user-mgr compile'."
+        raise ValueError(msg) from None
+
+    source = path.parent / payload["source"]
+    if not source.exists():
+        logging.warning(
+            "Source inventory %s of artifact %s not found, cannot check it is up to date",
+            source,
+            path,
+        )
+    elif (hashes := hash_source_files(source, exclude=payload["exclude"])) != payload["files"]:
+        changed = sorted(
+            rel_path
+            for rel_path in hashes.keys() | payload["files"].keys()
+            if hashes.get(rel_path) != payload["files"].get(rel_path)
+        )
+        msg = (
+            f"Inventory artifact {path} does not match its source {source}, changed files: "
+            f"{', '.join(changed)}. Recompile it with 'auth-user-mgr compile'."
+        )
+        raise ValueError(msg)
+
+    users_config: list[dict] = payload["users"]
+    logging.debug("Loaded %d users from inventory artifact %s", len(users_config), path)
+    return users_config
@@ -5,13 +5,26 @@
 """Handle config files for application and users."""
 
 import csv
+import io
+import json
 import logging
+import os
+import re
+from collections.abc import Iterable, Iterator
+from fnmatch import translate
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
 
-from jsonschema import FormatChecker, validate
+from jsonschema import Draft202012Validator, FormatChecker, validate
 from jsonschema.exceptions import ValidationError
 from ruamel.yaml import YAML
 
+from ._fileio import write_text_atomic
+
+if TYPE_CHECKING:
+    from ._index import InventoryIndex
+
 APP_CONFIG_SCHEMA = {
     "type": "object",
     "properties": {
@@ -25,6 +38,8 @@ APP_CONFIG_SCHEMA = {
         "smtp_password": {"type": "string"},
         "smtp_starttls": {"type": "boolean"},
         "smtp_from": {"type": "string", "format": "email"},
+        "smtp_max_per_minute": {"type": "integer", "minimum": 1},
+        "smtp_max_per_hour": {"type": "integer", "minimum": 1},
         "create_missing_groups": {"type": "boolean"},
         "delete_unconfigured_users": {"type": "boolean"},
         "invitation_expiry_days": {"type": "integer"},
@@ -38,34 +53,158 @@ APP_CONFIG_SCHEMA = {
     "additionalProperties": False,
 }
 
-USER_CONFIG_SCHEMA = {
-    "type": "array",
-    "items": {
-        "type": "object",
-        "properties": {
-            "name": {"type": "string"},
-            "email": {"type": "string", "format": "email"},
-            "username": {"type": "string"},
-            "groups": {
-                "type": "array",
-                "items": {"type": "string"},
-            },
+USER_CONFIG_ITEM_SCHEMA: dict = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "email": {"type": "string", "format": "email"},
+        "username": {"type": "string"},
+        "groups": {
+            "type": "array",
+            "items": {"type": "string"},
         },
-        "required": ["name", "email"],
-        "additionalProperties": False,
     },
+    "required": ["name", "email"],
+    "additionalProperties": False,
+}
+
+USER_CONFIG_SCHEMA: dict = {
+    "type": "array",
+    "items": USER_CONFIG_ITEM_SCHEMA,
 }
 
 
-def get_yaml_file_paths(file_or_dir: str) -> list[Path]:
-    """Get paths of YAML files from a directory or a single file."""
-    path = Path(file_or_dir)
-    if path.is_dir():
-        return list(path.glob("*.yml")) + list(path.glob("*.yaml"))
-    if path.is_file() and path.suffix in {".yaml", ".yml"}:
-        return [path]
-    msg = f"Invalid path: {file_or_dir}. Must be a directory or a YAML file."
-    raise ValueError(msg)
+YAML_FILE_PATTERNS: tuple[str, ...] = ("*.yaml", "*.yml")
+# Machine-generated inventory files: a JSON array of users, or JSON Lines with one user per line
+JSON_FILE_PATTERNS: tuple[str, ...] = ("*.json", "*.jsonl")
+INVENTORY_FILE_PATTERNS: tuple[str, ...] = YAML_FILE_PATTERNS + JSON_FILE_PATTERNS
+
+
+class InventoryFile(NamedTuple):
+    """A discovered inventory file together with its stat-based fingerprint.
+
+    Attributes:
+        path (Path): Path of the file, relative to the current working directory if the scanned
+            root was relative.
+        size (int): File size in bytes.
+        mtime_ns (int): Last modification time in nanoseconds.
+    """
+
+    path: Path
+    size: int
+    mtime_ns: int
+
+    @property
+    def fingerprint(self) -> str:
+        """Cheap change marker for caching layers, changes whenever size or mtime change."""
+        return f"{self.size}:{self.mtime_ns}"
+
+
+@lru_cache(maxsize=32)
+def _compile_patterns(patterns: tuple[str, ...]) -> re.Pattern[str]:
+    """Compile glob patterns into a single regular expression, matching any of them."""
+    return re.compile("|".join(f"(?:{translate(p)})" for p in patterns))
+
+
+def matches_any(rel_path: str, patterns: tuple[str, ...] | list[str]) -> bool:
+    """Check whether a relative POSIX path or its last component matches any glob pattern."""
+    regex = _compile_patterns(tuple(patterns))
+    name = rel_path.rsplit("/", 1)[-1]
+    return bool(regex.match(name) or regex.match(rel_path))
+
+
+def scan_inventory_files(
+    file_or_dir: str | Path,
+    include: tuple[str, ...] | list[str] = INVENTORY_FILE_PATTERNS,
+    exclude: tuple[str, ...] | list[str] = (),
+    recursive: bool = True,
+) -> list[InventoryFile]:
+    """Discover inventory files in a directory tree or return a single file.
+
+    Directories are walked with `os.scandir`, which reuses the file type information from the
+    directory listing instead of issuing a separate stat call per entry. Hidden files and
+    directories (starting with a dot) are skipped. Exclude patterns are matched against both the
+    name and the path relative to the root, and prune whole directories if they match one.
+
+    Args:
+        file_or_dir (str | Path): Directory to scan, or a single inventory file.
+        include (tuple[str, ...] | list[str], optional): Glob patterns of files to include.
+            Defaults to YAML, JSON and JSON Lines files.
+        exclude (tuple[str, ...] | list[str], optional): Glob patterns of files or directories to
+            skip. Defaults to none.
+        recursive (bool, optional): Whether to descend into subdirectories. Defaults to True.
+
+    Returns:
+        list[InventoryFile]: The discovered files, sorted by their path relative to the root so
+        the order is identical on every platform and filesystem.
+
+    Raises:
+        ValueError: If the path is neither a directory nor a file matching the include patterns.
+    """
+    root = Path(file_or_dir)
+    if root.is_file() and matches_any(root.name, include):
+        stat = root.stat()
+        return [InventoryFile(path=root, size=stat.st_size, mtime_ns=stat.st_mtime_ns)]
+    if not root.is_dir():
+        msg = f"Invalid path: {file_or_dir}. Must be a directory or an inventory file."
+        raise ValueError(msg)
+
+    include_regex = _compile_patterns(tuple(include))
+    found: list[tuple[str, InventoryFile]] = []
+    pending: list[tuple[str, str]] = [(str(root), "")]
+    while pending:
+        dir_path, rel_dir = pending.pop()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                rel_path = f"{rel_dir}{entry.name}"
+                if exclude and matches_any(rel_path, exclude):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending.append((entry.path, f"{rel_path}/"))
+                elif include_regex.match(entry.name) and entry.is_file():
+                    stat = entry.stat()
+                    found.append(
+                        (
+                            rel_path,
+                            InventoryFile(
+                                path=root.joinpath(rel_path),
+                                size=stat.st_size,
+                                mtime_ns=stat.st_mtime_ns,
+                            ),
+                        )
+                    )
+
+    found.sort(key=lambda item: item[0])
+    return [inventory_file for _, inventory_file in found]
+
+
+def get_yaml_file_paths(
+    file_or_dir: str, exclude: tuple[str, ...] | list[str] = (), recursive: bool = True
+) -> list[Path]:
+    """Get paths of YAML files from a directory tree or a single file, in a deterministic order."""
+    return [
+        f.path
+        for f in scan_inventory_files(
+            file_or_dir, include=YAML_FILE_PATTERNS, exclude=exclude, recursive=recursive
+        )
+    ]
+
+
+def get_inventory_file_paths(
+    file_or_dir: str, exclude: tuple[str, ...] | list[str] = (), recursive: bool = True
+) -> list[Path]:
+    """Get paths of YAML and JSON (Lines) inventory files from a directory tree or a single file,
+    in a deterministic order.
+    """
+    return [f.path for f in scan_inventory_files(file_or_dir, exclude=exclude, recursive=recursive)]
+
+
+def is_json_inventory_file(file_path: Path) -> bool:
+    """Check whether an inventory file is a JSON or JSON Lines file, based on its suffix."""
+    return file_path.suffix.lower() in {".json", ".jsonl"}
 
 
 def _get_yaml() -> YAML:
@@ -119,6 +258,49 @@ def load_yaml_file(file_path: Path) -> dict | list[dict]:
         raise RuntimeError(msg) from e
 
 
+def iter_json_lines(lines: Iterable[str], source: Path) -> Iterator[dict]:
+    """Parse JSON Lines one line at a time, skipping blank lines.
+
+    Raises:
+        RuntimeError: If a line is not valid JSON, with the file and line number.
+    """
+    for line_num, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            msg = f"Error reading JSON Lines file {source}, line {line_num}: {e}"
+            raise RuntimeError(msg) from e
+
+
+def load_json_file(file_path: Path) -> dict | list[dict]:
+    """Load a JSON or JSON Lines file and return its content.
+
+    JSON Lines files (`.jsonl`) are streamed and parsed line by line, so the whole text is never
+    held in memory at once.
+    """
+    try:
+        with open(file_path, encoding="utf-8") as f:
+            if file_path.suffix.lower() == ".jsonl":
+                return list(iter_json_lines(f, file_path))
+            data = json.load(f)
+    except FileNotFoundError as e:
+        msg = f"Config file not found: {file_path}"
+        raise FileNotFoundError(msg) from e
+    except (OSError, ValueError) as e:
+        msg = f"Error reading JSON file {file_path}: {e}"
+        raise RuntimeError(msg) from e
+    return data if data is not None else []
+
+
+def load_inventory_file(file_path: Path) -> dict | list[dict]:
+    """Load a YAML, JSON or JSON Lines file, depending on its suffix, and return its content."""
+    if is_json_inventory_file(file_path):
+        return load_json_file(file_path)
+    return load_yaml_file(file_path)
+
+
 def save_yaml_file(file_path: Path, data: dict | list[dict]) -> None:
     """Write data to a YAML file, preserving comments if originally loaded with ruamel.yaml."""
     yml = _get_yaml()
@@ -148,21 +330,26 @@ def check_unique_key(
         seen_values.add(normalized)
 
 
-def read_yaml_config_files(file_or_dir: str, unique_key: str = "") -> list[dict]:
-    """Read YAML config files from a directory or a single file and return their content as a list
-    of dictionaries. If a unique key is provided, ensure that all items have unique values for that
-    key.
+def read_yaml_config_files(
+    file_or_dir: str, unique_key: str = "", exclude: tuple[str, ...] | list[str] = ()
+) -> list[dict]:
+    """Read YAML config files from a directory tree or a single file and return their content as
+    a list of dictionaries. If a unique key is provided, ensure that all items have unique values
+    for that key. Files matching one of the `exclude` glob patterns are skipped.
+
+    JSON and JSON Lines files are read alongside the YAML files, so generated inventory files do
+    not need to be converted to YAML first.
     """
     logging.debug("Reading config file/directory: %s", file_or_dir)
-    yaml_file_paths = get_yaml_file_paths(file_or_dir)
-    logging.debug("Found YAML files: %s", yaml_file_paths)
+    yaml_file_paths = get_inventory_file_paths(file_or_dir, exclude=exclude)
+    logging.debug("Found config files: %s", yaml_file_paths)
 
     seen_keys: set[str] = set()
     cfg_output: list[dict] = []
 
     for path in yaml_file_paths:
-        logging.debug("Reading YAML file: %s", path)
-        content = load_yaml_file(path)
+        logging.debug("Reading config file: %s", path)
+        content = load_inventory_file(path)
 
         # If we handle multiple files, check for conflicting unique keys
         if unique_key and isinstance(content, list):
@@ -194,26 +381,173 @@ def validate_config_schema(cfg: dict | list[dict], schema: dict) -> None:
     logging.debug("Config validated successfully against schema.")
 
 
-def read_app_and_users_config(
-    app_config_path: str, user_config_path: str
-) -> tuple[dict, list[dict]]:
-    """Read app and user config files and return a tuple of dicts."""
-    # Load the app and user config files
+def read_app_config(app_config_path: str) -> dict:
+    """Read and validate the app config file."""
     app_config: dict = read_yaml_config_files(app_config_path)[0]  # is always a single file
-    users_config: list[dict] = read_yaml_config_files(user_config_path, unique_key="email")
-
-    # Validate the configs against their schemas and required keys
     validate_config_schema(cfg=app_config, schema=APP_CONFIG_SCHEMA)
+    return app_config
+
+
+def read_users_config(
+    user_config_path: str, exclude: tuple[str, ...] | list[str] = ()
+) -> list[dict]:
+    """Read the user inventory, checked for unique emails, sorted by email and validated.
+
+    Glob patterns in `exclude` are applied when discovering the user inventory files.
+    """
+    users_config: list[dict] = read_yaml_config_files(
+        user_config_path, unique_key="email", exclude=exclude
+    )
     validate_config_schema(cfg=users_config, schema=USER_CONFIG_SCHEMA)
+    return users_config
+
+
+def read_app_and_users_config(
+    app_config_path: str, user_config_path: str, exclude: tuple[str, ...] | list[str] = ()
+) -> tuple[dict, list[dict]]:
+    """Read app and user config files and return a tuple of dicts.
 
+    Glob patterns in `exclude` are applied when discovering the user inventory files.
+    """
+    app_config = read_app_config(app_config_path)
+    users_config = read_users_config(user_config_path, exclude=exclude)
     return app_config, users_config
 
 
+class CsvUserReader:
+    """Stream users from a CSV file in normalised, deduplicated and validated chunks.
+
+    Expected columns: name, email (required); username (optional). Rows with empty name or email
+    are skipped, as are repeated emails (case-insensitive, the first row wins). Each chunk is
+    validated against the user config schema before it is yielded, so only the current chunk and
+    the set of seen emails are held in memory.
+
+    Attributes:
+        csv_path (Path): Path to the CSV file.
+        chunk_size (int): Maximum number of users per yielded chunk.
+        strict (bool): If True, an invalid row raises a ValueError. If False, it is logged with its
+            line number, recorded in `errors` and skipped, and reading continues.
+        rows_read (int): Number of data rows read so far.
+        users_yielded (int): Number of valid, unique users yielded so far.
+        duplicates (int): Number of rows skipped because their email was seen before.
+        invalid (int): Number of rows skipped because they failed schema validation.
+        errors (list[str]): Messages for the first invalid rows, at most `MAX_ERRORS`.
+    """
+
+    MAX_ERRORS = 50
+
+    def __init__(self, csv_path: str, chunk_size: int = 1000, strict: bool = True) -> None:
+        """
+        Args:
+            csv_path (str): Path to the CSV file.
+            chunk_size (int, optional): Maximum number of users per chunk. Defaults to 1000.
+            strict (bool, optional): Whether an invalid row aborts reading. Defaults to True.
+
+        Raises:
+            FileNotFoundError: If the CSV file does not exist.
+        """
+        self.csv_path = Path(csv_path)
+        if not self.csv_path.is_file():
+            msg = f"CSV file not found: {csv_path}"
+            raise FileNotFoundError(msg)
+        self.chunk_size = chunk_size
+        self.strict = strict
+        self.rows_read: int = 0
+        self.users_yielded: int = 0
+        self.duplicates: int = 0
+        self.invalid: int = 0
+        self.errors: list[str] = []
+        self._chunk_validator = Draft202012Validator(
+            USER_CONFIG_SCHEMA, format_checker=FormatChecker()
+        )
+        self._item_validator = Draft202012Validator(
+            USER_CONFIG_ITEM_SCHEMA, format_checker=FormatChecker()
+        )
+
+    def __iter__(self) -> Iterator[list[dict]]:
+        """Yield chunks of valid, unique user dictionaries.
+
+        Raises:
+            ValueError: If required columns (name, email) are missing from the CSV header, or if
+                `strict` is set and a row fails schema validation.
+        """
+        seen_emails: set[str] = set()
+        with open(self.csv_path, encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f, skipinitialspace=True)
+
+            # Validate required columns
+            fieldnames = [name.strip() for name in (reader.fieldnames or [])]
+            for required in ("name", "email"):
+                if required not in fieldnames:
+                    msg = f"CSV file is missing required column: '{required}'"
+                    raise ValueError(msg)
+
+            chunk: list[tuple[int, dict]] = []
+            for row in reader:
+                self.rows_read += 1
+                # Strip whitespace from keys and values
+                clean_row = {k.strip(): (v or "").strip() for k, v in row.items() if k is not None}
+
+                name = clean_row.get("name", "")
+                email = clean_row.get("email", "")
+
+                # Skip rows with missing required fields
+                if not name or not email:
+                    logging.debug("Skipping CSV row with empty name or email: %s", clean_row)
+                    continue
+
+                # Skip repeated emails, the first occurrence wins
+                if email.lower() in seen_emails:
+                    logging.debug(
+                        "Skipping CSV row with duplicate email on line %s", reader.line_num
+                    )
+                    self.duplicates += 1
+                    continue
+                seen_emails.add(email.lower())
+
+                user: dict = {"name": name, "email": email}
+                username = clean_row.get("username", "")
+                if username:
+                    user["username"] = username
+
+                chunk.append((reader.line_num, user))
+                if len(chunk) >= self.chunk_size:
+                    yield self._validate_chunk(chunk)
+                    chunk = []
+
+            if chunk:
+                yield self._validate_chunk(chunk)
+
+    def _validate_chunk(self, chunk: list[tuple[int, dict]]) -> list[dict]:
+        """Validate a chunk of (line number, user) pairs and return the valid users."""
+        users = [user for _, user in chunk]
+        # Fast path: validate the chunk as a whole, and only look at single rows if that fails
+        if not self._chunk_validator.is_valid(users):
+            users = []
+            for line_num, user in chunk:
+                error = next(iter(self._item_validator.iter_errors(user)), None)
+                if error is None:
+                    users.append(user)
+                    continue
+                msg = f"Invalid user in CSV file {self.csv_path}, line {line_num}: {error.message}"
+                if self.strict:
+                    logging.critical(msg)
+                    raise ValueError(msg)
+                logging.error(msg)
+                self.invalid += 1
+                if len(self.errors) < self.MAX_ERRORS:
+                    self.errors.append(msg)
+
+        self.users_yielded += len(users)
+        return users
+
+
 def parse_csv_users(csv_path: str) -> list[dict]:
     """Parse a CSV file containing user data for import.
 
     Expected columns: name, email (required); username (optional).
-    Rows with empty name or email are skipped.
+    Rows with empty name or email, and rows repeating an earlier email, are skipped. See
+    `CsvUserReader` to stream large files in chunks instead.
 
     Args:
         csv_path (str): Path to the CSV file.
@@ -223,45 +557,10 @@ def parse_csv_users(csv_path: str) -> list[dict]:
 
     Raises:
         FileNotFoundError: If the CSV file does not exist.
-        ValueError: If required columns (name, email) are missing from the CSV header.
+        ValueError: If required columns (name, email) are missing from the CSV header, or a row
+            fails schema validation.
     """
-    path = Path(csv_path)
-    if not path.is_file():
-        msg = f"CSV file not found: {csv_path}"
-        raise FileNotFoundError(msg)
-
-    with open(path, encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, skipinitialspace=True)
-
-        # Validate required columns
-        fieldnames = [name.strip() for name in (reader.fieldnames or [])]
-        for required in ("name", "email"):
-            if required not in fieldnames:
-                msg = f"CSV file is missing required column: '{required}'"
-                raise ValueError(msg)
-
-        users: list[dict] = []
-        for row in reader:
-            # Strip whitespace from keys and values
-            clean_row = {k.strip(): v.strip() for k, v in row.items() if k is not None}
-
-            name = clean_row.get("name", "")
-            email = clean_row.get("email", "")
-
-            # Skip rows with missing required fields
-            if not name or not email:
-                logging.debug("Skipping CSV row with empty name or email: %s", clean_row)
-                continue
-
-            user: dict = {"name": name, "email": email}
-            username = clean_row.get("username", "")
-            if username:
-                user["username"] = username
-
-            users.append(user)
-
-    # Validate parsed users against the user config schema
-    validate_config_schema(cfg=users, schema=USER_CONFIG_SCHEMA)
+    users = [user for chunk in CsvUserReader(csv_path) for user in chunk]
 
     logging.info("Parsed %d users from CSV file: %s", len(users), csv_path)
     return users
@@ -293,73 +592,418 @@ def _append_groups_in_place(user_entry: dict, new_groups: list[str]) -> None:
         groups_seq.ca.items[len(groups_seq) - 1] = saved_comment
 
 
+def _detect_newline(file_path: Path) -> str:
+    """Return the line ending of an existing file, CRLF or LF, judged by its first line.
+
+    `Path.read_text` turns all line endings into LF, so files edited on Windows must get theirs
+    back on writing, or every line would show up as changed.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            first_line = f.readline()
+    except FileNotFoundError:
+        return "\n"
+    return "\r\n" if first_line.endswith(b"\r\n") else "\n"
+
+
+# A root-level list item, or a key of it at the canonical two-space indentation
+_ITEM_KEY_PREFIX = r"^(?:- |  )"
+_GROUPS_KEY_PATTERN = re.compile(_ITEM_KEY_PREFIX + r"groups:[ \t]*(?P<rest>.*?)[ \t]*$")
+_SEQUENCE_ITEM_PATTERN = re.compile(r"^(?P<indent> +)- (?P<value>.*?)[ \t]*$")
+# Any line starting at column 0 that is not a comment, which ends the current root-level item
+_ROOT_LINE_PATTERN = re.compile(r"^[^ \t\r\n#]", re.MULTILINE)
+# Single-line scalars that every YAML resolver reads as the same string, followed by an optional
+# comment: plain scalars starting with a letter and without indicators, single-quoted scalars,
+# and double-quoted scalars without escapes
+_STRING_SCALAR_PATTERN = re.compile(
+    r"(?:([^\W\d_][\w .@+'()/,-]*)|'((?:[^']|'')*)'|\"([^\"\\]*)\")(?:[ \t]+#.*|[ \t]*)"
+)
+# Plain scalars that are booleans or null in YAML 1.1 or 1.2
+_NON_STRING_WORDS = frozenset({"true", "false", "yes", "no", "on", "off", "y", "n", "null"})
+
+
+def parse_yaml_string_scalar(value: str) -> str | None:
+    """Return the string of a simple single-line YAML scalar with an optional comment.
+
+    Both the group splicing and the canonical layout fast path of the index read values with
+    this parser, so that they agree with each other and with ruamel.yaml.
+
+    Returns:
+        str | None: The string, or None if the scalar may be anything else, e.g. a number,
+        boolean or date, or uses escapes or flow style, so that a YAML parser has to decide.
+    """
+    if (match := _STRING_SCALAR_PATTERN.fullmatch(value)) is None:
+        return None
+    if match[1] is not None:
+        plain = match[1].rstrip()
+        return None if plain.lower() in _NON_STRING_WORDS else plain
+    if match[2] is not None:
+        return match[2].replace("''", "'")
+    return match[3]
+
+
+@lru_cache(maxsize=1024)
+def _render_yaml_sequence_value(value: str) -> str | None:
+    """Render a string as a YAML sequence item value, as ruamel.yaml would dump it."""
+    stream = io.StringIO()
+    _get_yaml().dump([value], stream, transform=_prettify_yaml_formatting)
+    dumped = stream.getvalue().strip()
+    if "\n" in dumped or not dumped.startswith("- "):
+        return None
+    return dumped[2:]
+
+
+def _find_yaml_item_span(text: str, email: str) -> tuple[int, int] | None:
+    """Find the start and end offset of the root-level list item with the given email.
+
+    Returns:
+        tuple[int, int] | None: The span of the item, or None if it cannot be located reliably.
+    """
+    email_match = re.search(
+        _ITEM_KEY_PREFIX + r"email:[ \t]*(['\"]?)" + re.escape(email) + r"\1[ \t]*(?:#.*)?$",
+        text,
+        flags=re.MULTILINE | re.IGNORECASE,
+    )
+    if email_match is None:
+        return None
+
+    if text.startswith("- ", email_match.start()):
+        item_start = email_match.start()
+    else:
+        item_start = text.rfind("\n- ", 0, email_match.start()) + 1
+        if item_start == 0 and not text.startswith("- "):
+            return None
+    next_root = _ROOT_LINE_PATTERN.search(text, email_match.end())
+    item_end = next_root.start() if next_root else len(text)
+    if next_root and not text.startswith("- ", item_end):
+        return None
+    return item_start, item_end
+
+
+def _find_groups_insertion(lines: list[str]) -> tuple[int, list[str], str, list[str]] | None:
+    """Find where to insert new groups into the lines of a user item.
+
+    Returns:
+        tuple | None: The line index to insert at, the header lines to insert before the groups
+        (a new `groups` key if there is none yet), the indentation of group items, and the
+        existing groups. None if the layout of the groups is irregular.
+    """
+    groups_idx = next((i for i, line in enumerate(lines) if _GROUPS_KEY_PATTERN.match(line)), None)
+    if groups_idx is None:
+        # No groups key: add one after the last line of the item's content
+        last_content = max(i for i, line in enumerate(lines) if line.strip() and line[0] != "#")
+        return last_content + 1, ["  groups:\n"], "    ", []
+
+    # Only a block sequence (or no value at all) can be extended line by line
+    groups_match = _GROUPS_KEY_PATTERN.match(lines[groups_idx])
+    rest = groups_match["rest"] if groups_match else ""
+    if rest and not rest.startswith("#"):
+        return None
+
+    insert_at = groups_idx + 1
+    indent = ""
+    existing: list[str] = []
+    for i in range(groups_idx + 1, len(lines)):
+        line = lines[i]
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        item_match = _SEQUENCE_ITEM_PATTERN.match(line)
+        if item_match is None or (indent and item_match["indent"] != indent):
+            # Another key of the user ends the sequence, anything else cannot be handled
+            if line.startswith("  ") and not line.startswith("   "):
+                break
+            return None
+        if (value := parse_yaml_string_scalar(item_match["value"])) is None:
+            return None
+        indent = item_match["indent"]
+        existing.append(value)
+        insert_at = i + 1
+
+    return insert_at, [], indent or "    ", existing
+
+
+def _splice_groups_into_yaml_text(
+    text: str, email: str, groups_to_add: list[str]
+) -> tuple[str, list[str]] | None:
+    """Merge groups into a user's `groups` sequence by editing only the lines of that user.
+
+    The user's root-level list item is located by its `email` key, and new group lines are
+    inserted after the last existing item of its `groups` sequence (or a new `groups` key is added
+    at the end of the item). Everything outside the inserted lines is left byte-identical.
+
+    Args:
+        text (str): The YAML file content.
+        email (str): The email address of the user, case-insensitive.
+        groups_to_add (list[str]): Groups that should be present for this user. Missing ones are
+            appended in sorted order, like `_append_groups_in_place` does.
+
+    Returns:
+        tuple[str, list[str]] | None: The new text and the user's groups after the merge. None if
+        the user was not found or the layout is irregular (e.g. flow style, multi-line scalars,
+        unusual indentation), in which case a full round-trip is required.
+    """
+    if (span := _find_yaml_item_span(text, email)) is None:
+        return None
+    item_start, item_end = span
+
+    lines = text[item_start:item_end].splitlines(keepends=True)
+    if (insertion := _find_groups_insertion(lines)) is None:
+        return None
+    insert_at, header, indent, existing = insertion
+
+    new_groups = sorted(g for g in dict.fromkeys(groups_to_add) if g not in existing)
+    if not new_groups:
+        return text, existing
+
+    new_lines: list[str] = []
+    for group in new_groups:
+        if (rendered := _render_yaml_sequence_value(group)) is None:
+            return None
+        new_lines.append(f"{indent}- {rendered}\n")
+    if not lines[insert_at - 1].endswith("\n"):
+        lines[insert_at - 1] += "\n"
+    lines[insert_at:insert_at] = header + new_lines
+
+    return text[:item_start] + "".join(lines) + text[item_end:], existing + new_groups
+
+
+def _update_user_groups_round_trip(
+    file_path: Path, text: str, email: str, groups_to_add: list[str], dry: bool
+) -> bool:
+    """Merge groups into a user via a full ruamel.yaml round-trip of the file.
+
+    Returns:
+        bool: True if the user was found in the file, False otherwise.
+    """
+    # Use same YAML instance for load and dump to preserve original formatting
+    yml = _get_yaml()
+    data = yml.load(text)
+
+    if not isinstance(data, list):
+        return False
+
+    for user_entry in data:
+        if not isinstance(user_entry, dict):
+            continue
+        if (user_entry.get("email") or "").lower() != email.lower():
+            continue
+
+        # User found — merge groups (append new groups at end to keep existing order)
+        existing_groups = list(user_entry.get("groups") or [])
+        new_groups = [g for g in groups_to_add if g not in existing_groups]
+
+        if new_groups:
+            _append_groups_in_place(user_entry, new_groups)
+            if dry:
+                logging.info(
+                    "[DRY RUN] Would update groups for %s in %s: %s",
+                    email,
+                    file_path,
+                    list(user_entry["groups"]),
+                )
+            else:
+                stream = io.StringIO()
+                yml.dump(data, stream, transform=_prettify_yaml_formatting)
+                write_text_atomic(file_path, stream.getvalue(), _detect_newline(file_path))
+                logging.info(
+                    "Updated groups for %s in %s: %s",
+                    email,
+                    file_path,
+                    list(user_entry["groups"]),
+                )
+        else:
+            logging.info("User %s already has all required groups in %s", email, file_path)
+
+        return True
+
+    return False
+
+
+def _json_file_defines_user(file_path: Path, email: str) -> bool:
+    """Check whether a user is defined in a JSON (Lines) inventory file."""
+    data = load_json_file(file_path)
+    return any(
+        isinstance(user_entry, dict) and (user_entry.get("email") or "").lower() == email.lower()
+        for user_entry in (data if isinstance(data, list) else [data])
+    )
+
+
+def _warn_json_file_not_modified(file_path: Path, email: str, groups_to_add: list[str]) -> None:
+    """Warn that a user's groups are not merged because the user is defined in a JSON file.
+
+    JSON inventory files are generated by other tools and therefore never modified. The groups
+    have to be added at the source instead.
+    """
+    logging.warning(
+        "User %s is defined in the generated file %s, which is not modified. "
+        "Add the groups at its source instead: %s",
+        email,
+        file_path,
+        groups_to_add,
+    )
+
+
 def update_user_groups_in_yaml_files(
-    file_paths: list[Path], email: str, groups_to_add: list[str], dry: bool = False
+    file_paths: list[Path],
+    email: str,
+    groups_to_add: list[str],
+    dry: bool = False,
+    index: "InventoryIndex | None" = None,
 ) -> bool:
     """Search existing YAML user files for a user by email and merge groups.
 
     If the user is found, ensures all groups in `groups_to_add` are present in the user's
-    `groups` list. The file is rewritten with comments preserved.
+    `groups` list. Files not mentioning the email at all are skipped without parsing them. In the
+    file containing the user, only the lines of the user's `groups` sequence are edited and the
+    file is replaced atomically. Irregular layouts fall back to a full round-trip with comments
+    preserved.
+
+    With an up-to-date inventory index, only the file the index points to is searched.
 
     Args:
         file_paths (list[Path]): List of YAML file paths to search.
         email (str): The email address to search for.
         groups_to_add (list[str]): Groups that should be present for this user.
         dry (bool): If True, do not write changes to disk.
+        index (InventoryIndex, optional): Persistent index of the inventory the files belong to.
 
     Returns:
         bool: True if the user was found in any file, False otherwise.
     """
-    for file_path in file_paths:
-        # Use same YAML instance for load and dump to preserve original formatting
-        yml = _get_yaml()
-        with open(file_path, encoding="utf-8") as f:
-            data = yml.load(f)
+    if index is not None:
+        entry = index.lookup(email)
+        # Files outside the indexed inventory are still searched the regular way
+        file_paths = [
+            p for p in file_paths if (entry is not None and p == entry.path) or not index.covers(p)
+        ]
 
-        if not isinstance(data, list):
+    for file_path in file_paths:
+        text = file_path.read_text(encoding="utf-8")
+        # Cheap pre-check before looking at the file's structure
+        if email.lower() not in text.lower():
             continue
 
-        for user_entry in data:
-            if not isinstance(user_entry, dict):
-                continue
-            if (user_entry.get("email") or "").lower() != email.lower():
-                continue
+        if is_json_inventory_file(file_path):
+            if _json_file_defines_user(file_path, email):
+                _warn_json_file_not_modified(file_path, email, groups_to_add)
+                return True
+            continue
 
-            # User found — merge groups (append new groups at end to keep existing order)
-            existing_groups = list(user_entry.get("groups") or [])
-            new_groups = [g for g in groups_to_add if g not in existing_groups]
-
-            if new_groups:
-                _append_groups_in_place(user_entry, new_groups)
-                if dry:
-                    logging.info(
-                        "[DRY RUN] Would update groups for %s in %s: %s",
-                        email,
-                        file_path,
-                        list(user_entry["groups"]),
-                    )
-                else:
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        yml.dump(data, f, transform=_prettify_yaml_formatting)
-                    logging.info(
-                        "Updated groups for %s in %s: %s",
-                        email,
-                        file_path,
-                        list(user_entry["groups"]),
-                    )
-            else:
-                logging.info("User %s already has all required groups in %s", email, file_path)
+        spliced = _splice_groups_into_yaml_text(text, email, groups_to_add)
+        if spliced is None:
+            logging.debug("Cannot patch %s in place, falling back to a full round-trip", file_path)
+            if _update_user_groups_round_trip(file_path, text, email, groups_to_add, dry):
+                return True
+            continue
 
-            return True
+        new_text, groups = spliced
+        if new_text == text:
+            logging.info("User %s already has all required groups in %s", email, file_path)
+        elif dry:
+            logging.info("[DRY RUN] Would update groups for %s in %s: %s", email, file_path, groups)
+        else:
+            write_text_atomic(file_path, new_text, _detect_newline(file_path))
+            logging.info("Updated groups for %s in %s: %s", email, file_path, groups)
+        return True
 
     return False
 
 
+# Document start/end markers at column 0 make appending plain text after them unsafe
+_DOCUMENT_MARKER_PATTERN = re.compile(r"^(?:---|\.\.\.)", re.MULTILINE)
+
+
+def _serialize_yaml_users(user_dicts: list[dict]) -> str:
+    """Serialise user entries to YAML text, formatted exactly like a full file dump."""
+    yml = _get_yaml()
+    stream = io.StringIO()
+    yml.dump(list(user_dicts), stream, transform=_prettify_yaml_formatting)
+    return stream.getvalue()
+
+
+def _is_appendable_yaml_text(text: str) -> bool:
+    """Check cheaply whether root-level list items can be appended to the YAML text as plain text.
+
+    This is the case if the first content line starts a root-level block sequence at column 0,
+    and there are no document markers that would end the sequence before the end of the file.
+    """
+    for line in io.StringIO(text):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if not (line.startswith("- ") or line.rstrip() == "-"):
+            return False
+        break
+    else:
+        # No content at all, nothing to append to
+        return False
+    return _DOCUMENT_MARKER_PATTERN.search(text) is None
+
+
+def _join_yaml_text(existing: str, addition: str) -> str:
+    """Join appended root-level list items to existing YAML text.
+
+    Applies the same rule as `_prettify_yaml_formatting`: a blank line separates root-level list
+    items, except after a blank line or a comment.
+    """
+    if existing and not existing.endswith("\n"):
+        existing += "\n"
+    last_line = existing.rstrip("\n").rsplit("\n", 1)[-1]
+    if existing.endswith("\n\n") or not last_line or last_line.startswith("#"):
+        return addition
+    return "\n" + addition
+
+
+def append_users_to_yaml_file(file_path: Path, user_dicts: list[dict], dry: bool = False) -> None:
+    """Append new user entries to a YAML file in one write, creating the file if necessary.
+
+    If the file already contains a root-level block sequence, only the new entries are serialised
+    and appended to the end of the file as text, so the existing content is neither parsed nor
+    re-dumped. Otherwise, the file is loaded, extended and dumped again, preserving comments.
+
+    Args:
+        file_path (Path): Path to the target YAML file.
+        user_dicts (list[dict]): User dictionaries with keys like name, email, groups, and
+            optionally username.
+        dry (bool): If True, do not write changes to disk.
+    """
+    if not user_dicts:
+        return
+    emails = ", ".join(str(u.get("email")) for u in user_dicts)
+    if dry:
+        logging.info("[DRY RUN] Would append users %s to %s", emails, file_path)
+        return
+
+    existing = file_path.read_text(encoding="utf-8") if file_path.is_file() else ""
+    newline = _detect_newline(file_path)
+    if _is_appendable_yaml_text(existing):
+        addition = _serialize_yaml_users(user_dicts)
+        with open(file_path, "a", encoding="utf-8", newline=newline) as f:
+            if not existing.endswith("\n"):
+                f.write("\n")
+            f.write(_join_yaml_text(existing, addition))
+        logging.info("Appended users %s to %s", emails, file_path)
+        return
+
+    # Use same YAML instance for load and dump to preserve original formatting
+    yml = _get_yaml()
+    data = yml.load(existing) if existing.strip() else []
+    if not isinstance(data, list):
+        data = []
+    data.extend(user_dicts)
+
+    # Ensure parent directory exists
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, "w", encoding="utf-8", newline=newline) as f:
+        yml.dump(data, f, transform=_prettify_yaml_formatting)
+    logging.info("Appended users %s to %s", emails, file_path)
+
+
 def append_user_to_yaml_file(file_path: Path, user_dict: dict, dry: bool = False) -> None:
     """Append a new user entry to a YAML file, creating the file if necessary.
 
     If the file exists, its content (including comments) is preserved and the new user is
-    appended to the list.
+    appended to the list. See `append_users_to_yaml_file` to append several users in one write.
 
     Args:
         file_path (Path): Path to the target YAML file.
@@ -367,24 +1011,276 @@ def append_user_to_yaml_file(file_path: Path, user_dict: dict, dry: bool = False
             username.
         dry (bool): If True, do not write changes to disk.
     """
-    # Use same YAML instance for load and dump to preserve original formatting
-    yml = _get_yaml()
+    append_users_to_yaml_file(file_path=file_path, user_dicts=[user_dict], dry=dry)
+
+
+class YamlUserIndex:
+    """Index of user entries across YAML inventory files, for batch edits like the CSV import.
+
+    Every file is parsed exactly once when the index is created. Group merges and new user
+    entries are applied to the in-memory documents, and `save` writes each modified file exactly
+    once, preserving comments and formatting like the single-user functions above. Files are
+    patched at text level where possible: group merges are spliced into the affected lines and
+    new entries are appended as text, with a full re-dump only for irregular layouts.
+
+    Attributes:
+        documents (dict[Path, tuple[YAML, list]]): The loaded documents by file path, each with
+            the YAML instance used to load it, so the same instance can dump it again.
+        entries_by_email (dict[str, tuple[Path, dict]]): User entries and their file by lowercased
+            email. If an email appears in several files, the first file wins.
+        modified_files (dict[Path, None]): Files with pending changes, in order of modification.
+        appended_users (dict[Path, list[dict]]): New user entries by file, not yet written.
+        inventory_index (InventoryIndex | None): Persistent index of the inventory. If given,
+            files covered by it are only parsed once a user in them is looked up.
+        read_only_files (set[Path]): Loaded JSON (Lines) files. They are generated by other
+            tools, so their users are indexed, but group merges into them are only reported.
+        written_emails (dict[str, Path]): Files of new entries already written by
+            `flush_appended`, by lowercased email. Only the email is kept of these entries.
+    """
 
-    if file_path.is_file():
-        with open(file_path, encoding="utf-8") as f:
-            data = yml.load(f)
+    def __init__(
+        self, file_paths: list[Path], inventory_index: "InventoryIndex | None" = None
+    ) -> None:
+        """
+        Args:
+            file_paths (list[Path]): YAML files to index. Files not containing a list are skipped.
+            inventory_index (InventoryIndex, optional): Persistent index of the inventory the
+                files belong to, to parse only the files of users that are looked up.
+        """
+        self.documents: dict[Path, tuple[YAML, list]] = {}
+        self.entries_by_email: dict[str, tuple[Path, dict]] = {}
+        self.modified_files: dict[Path, None] = {}
+        self.appended_users: dict[Path, list[dict]] = {}
+        # Groups added to pre-existing entries, by file and email
+        self._merged_groups: dict[Path, dict[str, list[str]]] = {}
+        # Identities of entries added in this session, which are serialised when appended anyway
+        self._new_entry_ids: set[int] = set()
+        self.inventory_index = inventory_index
+        self.read_only_files: set[Path] = set()
+        self.written_emails: dict[str, Path] = {}
+        self._file_paths = set(file_paths)
+
+        for file_path in file_paths:
+            if inventory_index is None or not inventory_index.covers(file_path):
+                self._load(file_path)
+
+    def _load(self, file_path: Path) -> list:
+        """Load an inventory file into the index and return its document list."""
+        # Use same YAML instance for load and dump to preserve original formatting
+        yml = _get_yaml()
+        data = None
+        if file_path.is_file():
+            if is_json_inventory_file(file_path):
+                data = load_json_file(file_path)
+                self.read_only_files.add(file_path)
+            else:
+                with open(file_path, encoding="utf-8") as f:
+                    data = yml.load(f)
         if not isinstance(data, list):
+            logging.debug("YAML file %s does not contain a list of users, skipping", file_path)
             data = []
-    else:
-        data = []
+        self.documents[file_path] = (yml, data)
+
+        for user_entry in data:
+            if not isinstance(user_entry, dict):
+                continue
+            email = (user_entry.get("email") or "").lower()
+            if email and email not in self.entries_by_email:
+                self.entries_by_email[email] = (file_path, user_entry)
+
+        return data
+
+    def _find(self, email: str) -> tuple[Path, dict] | None:
+        """Find a user entry by email, loading its file first if it is not parsed yet."""
+        if (found := self.entries_by_email.get(email.lower())) is not None:
+            return found
+        if self.inventory_index is None:
+            return None
+        entry = self.inventory_index.lookup(email)
+        if entry is None or entry.path in self.documents or entry.path not in self._file_paths:
+            return None
+        self._load(entry.path)
+        return self.entries_by_email.get(email.lower())
+
+    def merge_groups(self, email: str, groups_to_add: list[str], dry: bool = False) -> bool:
+        """Merge groups into an indexed user entry, without writing to disk yet.
+
+        Args:
+            email (str): The email address to search for, case-insensitive.
+            groups_to_add (list[str]): Groups that should be present for this user.
+            dry (bool): If True, only log the change that would be made. The in-memory document
+                is updated in both cases, so later rows see the merged groups.
+
+        Returns:
+            bool: True if the user was found in the index, False otherwise.
+        """
+        if (file_path := self.written_emails.get(email.lower())) is not None:
+            # The entry is only on disk, so the groups are spliced into the file text on save
+            self._merged_groups.setdefault(file_path, {}).setdefault(email.lower(), []).extend(
+                groups_to_add
+            )
+            self.modified_files[file_path] = None
+            logging.info(
+                "%s groups for %s in %s: %s",
+                "[DRY RUN] Would update" if dry else "Updating",
+                email,
+                file_path,
+                groups_to_add,
+            )
+            return True
+        if (found := self._find(email)) is None:
+            return False
+        file_path, user_entry = found
+        if file_path in self.read_only_files:
+            _warn_json_file_not_modified(file_path, email, groups_to_add)
+            return True
 
-    data.append(user_dict)
+        # User found — merge groups (append new groups at end to keep existing order)
+        existing_groups = list(user_entry.get("groups") or [])
+        new_groups = [g for g in groups_to_add if g not in existing_groups]
+        if not new_groups:
+            logging.info("User %s already has all required groups in %s", email, file_path)
+            return True
 
-    if dry:
-        logging.info("[DRY RUN] Would append user %s to %s", user_dict.get("email"), file_path)
-    else:
-        # Ensure parent directory exists
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as f:
-            yml.dump(data, f, transform=_prettify_yaml_formatting)
-        logging.info("Appended user %s to %s", user_dict.get("email"), file_path)
+        _append_groups_in_place(user_entry, new_groups)
+        self.modified_files[file_path] = None
+        if id(user_entry) not in self._new_entry_ids:
+            merged = self._merged_groups.setdefault(file_path, {})
+            merged.setdefault(email.lower(), []).extend(new_groups)
+        logging.info(
+            "%s groups for %s in %s: %s",
+            "[DRY RUN] Would update" if dry else "Updating",
+            email,
+            file_path,
+            list(user_entry["groups"]),
+        )
+        return True
+
+    def add_user(self, file_path: Path, user_dict: dict, dry: bool = False) -> None:
+        """Append a new user entry to a file's document and index it, without writing yet.
+
+        Args:
+            file_path (Path): Path to the target YAML file, which may not exist yet.
+            user_dict (dict): User dictionary with keys like name, email, groups, and optionally
+                username.
+            dry (bool): If True, only log the change that would be made.
+        """
+        data = self.documents[file_path][1] if file_path in self.documents else None
+        if data is None:
+            data = self._load(file_path)
+
+        data.append(user_dict)
+        self.entries_by_email.setdefault(
+            (user_dict.get("email") or "").lower(), (file_path, user_dict)
+        )
+        self.appended_users.setdefault(file_path, []).append(user_dict)
+        self._new_entry_ids.add(id(user_dict))
+        self.modified_files[file_path] = None
+        logging.info(
+            "%s user %s to %s",
+            "[DRY RUN] Would append" if dry else "Appending",
+            user_dict.get("email"),
+            file_path,
+        )
+
+    def flush_appended(self) -> list[Path]:
+        """Write the new entries of files that received nothing else, and release them.
+
+        Called by the streaming import after each chunk, so that new users are not held in memory
+        until `save`. Files with group merges into existing entries keep their new entries until
+        `save` writes the file in one go.
+
+        Returns:
+            list[Path]: The files that new entries were appended to.
+        """
+        written = []
+        for file_path, user_dicts in list(self.appended_users.items()):
+            if file_path in self._merged_groups:
+                continue
+            append_users_to_yaml_file(file_path, user_dicts)
+            # New entries are always at the end of the document
+            data = self.documents[file_path][1]
+            del data[len(data) - len(user_dicts) :]
+            for user_dict in user_dicts:
+                email = (user_dict.get("email") or "").lower()
+                if self.entries_by_email.get(email, (None, None))[1] is user_dict:
+                    del self.entries_by_email[email]
+                    self.written_emails[email] = file_path
+                self._new_entry_ids.discard(id(user_dict))
+            del self.appended_users[file_path]
+            written.append(file_path)
+        return written
+
+    def save(self, dry: bool = False) -> list[Path]:
+        """Write every modified file exactly once.
+
+        Files that only received new entries get them appended in a single write, see
+        `append_users_to_yaml_file`. In files with changes to existing entries, the new groups
+        are spliced into the text and the file is replaced atomically. If that is not possible
+        due to an irregular layout, the whole document is dumped instead.
+
+        Args:
+            dry (bool): If True, do not write changes to disk.
+
+        Returns:
+            list[Path]: The files that were (or in a dry run, would have been) written.
+        """
+        modified = list(self.modified_files)
+        for file_path in modified:
+            if dry:
+                logging.info("[DRY RUN] Would write changes to %s", file_path)
+                continue
+            if file_path not in self._merged_groups:
+                append_users_to_yaml_file(file_path, self.appended_users.get(file_path, []))
+                continue
+            if (text := self._patch_text(file_path)) is None:
+                logging.debug("Cannot patch %s in place, dumping the whole document", file_path)
+                yml, data = self._reload(file_path)
+                stream = io.StringIO()
+                yml.dump(data, stream, transform=_prettify_yaml_formatting)
+                text = stream.getvalue()
+            write_text_atomic(file_path, text, _detect_newline(file_path))
+            logging.info("Wrote changes to %s", file_path)
+
+        self.modified_files.clear()
+        self.appended_users.clear()
+        self._merged_groups.clear()
+        return modified
+
+    def _reload(self, file_path: Path) -> tuple[YAML, list]:
+        """Return the document of a file with all pending changes, to dump it as a whole.
+
+        If new entries of the file were already written by `flush_appended`, the document in
+        memory lacks them, so the file is loaded again and the pending changes are re-applied.
+        """
+        if file_path not in self.written_emails.values():
+            return self.documents[file_path]
+        yml = _get_yaml()
+        with open(file_path, encoding="utf-8") as f:
+            data = yml.load(f)
+        merged = self._merged_groups[file_path]
+        for user_entry in data:
+            if not isinstance(user_entry, dict):
+                continue
+            if groups := merged.get((user_entry.get("email") or "").lower()):
+                existing_groups = list(user_entry.get("groups") or [])
+                if new_groups := [g for g in dict.fromkeys(groups) if g not in existing_groups]:
+                    _append_groups_in_place(user_entry, new_groups)
+        data.extend(self.appended_users.get(file_path, []))
+        return yml, data
+
+    def _patch_text(self, file_path: Path) -> str | None:
+        """Apply the pending changes of a file to its current text, or None if not possible."""
+        text = file_path.read_text(encoding="utf-8")
+        for email, groups in self._merged_groups[file_path].items():
+            if (spliced := _splice_groups_into_yaml_text(text, email, groups)) is None:
+                return None
+            text = spliced[0]
+
+        if appended := self.appended_users.get(file_path):
+            if not _is_appendable_yaml_text(text):
+                return None
+            if not text.endswith("\n"):
+                text += "\n"
+            text += _join_yaml_text(text, _serialize_yaml_users(appended))
+        return text
@@ -0,0 +1,36 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Compute the group membership changes needed to reach the configured state."""
+
+from collections.abc import Iterable
+from typing import NamedTuple
+
+
+class MembershipChanges(NamedTuple):
+    """The group membership changes of a single user.
+
+    Attributes:
+        add (list[str]): Names of the groups to add the user to, sorted.
+        remove (list[str]): Names of the groups to remove the user from, sorted.
+    """
+
+    add: list[str]
+    remove: list[str]
+
+
+def diff_user_memberships(configured: Iterable[str], current: Iterable[str]) -> MembershipChanges:
+    """Compare the configured and current groups of a single user.
+
+    Args:
+        configured (Iterable[str]): Names of the groups the user shall be a member of.
+        current (Iterable[str]): Names of the groups the user is a member of.
+
+    Returns:
+        MembershipChanges: The groups to add the user to and remove them from.
+    """
+    configured_set, current_set = set(configured), set(current)
+    return MembershipChanges(
+        add=sorted(configured_set - current_set), remove=sorted(current_set - configured_set)
+    )
@@ -4,8 +4,11 @@
 
 """Class and functions to send an email to the invitees."""
 
+import copy
 import logging
+import queue
 import smtplib
+import threading
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formatdate, make_msgid
@@ -13,9 +16,19 @@ from pathlib import Path
 
 from jinja2 import Template
 
+from ._ratelimit import RateLimiter
+from ._trace import SPAN_KIND_CLIENT, Tracer
 
-class Mail:
-    """Class for an email with specific template and subject this app will send."""
+INBUILT_TEMPLATE_DIR = Path(__file__).resolve().parent / "templates"
+
+
+class Mail:  # pylint: disable=too-many-instance-attributes
+    """Class for an email with specific template and subject this app will send.
+
+    All emails of a run are sent over one authenticated SMTP connection, which is opened on the
+    first email and re-opened transparently if the server closed it, e.g. after an idle timeout
+    or a limit of messages per connection. Call `close` when done.
+    """
 
     def __init__(  # noqa: PLR0913
         self,
@@ -26,6 +39,10 @@ class Mail:
         smtp_starttls: bool,
         smtp_from: str,
         dry: bool,
+        max_messages_per_connection: int = 100,
+        max_per_minute: int = 0,
+        max_per_hour: int = 0,
+        tracer: Tracer | None = None,
     ) -> None:
         self.smtp_server: str = smtp_server
         self.smtp_port: str | int = smtp_port
@@ -37,6 +54,70 @@ class Mail:
         self.subject_suffix: str = ""
         self.instance_url: str = ""
         self.instance_title: str = ""
+        # Re-open the connection proactively after this many messages, as many relays limit them
+        self.max_messages_per_connection: int = max_messages_per_connection
+        self._smtp: smtplib.SMTP | None = None
+        self._messages_on_connection: int = 0
+        # Limits of sent messages per minute and hour. Copies share the limiter, and so the limits
+        limits = [(max_per_minute, 60), (max_per_hour, 3600)]
+        self.rate_limiter: RateLimiter | None = (
+            RateLimiter([(count, period) for count, period in limits if count > 0])
+            if any(count > 0 for count, _ in limits)
+            else None
+        )
+        # Records a span per sent message. Copies share the tracer
+        self.tracer: Tracer = tracer if tracer is not None else Tracer(enabled=False)
+        # Compiled templates with the mtime of their file, by path
+        self._template_paths: dict[tuple[str, str], Path] = {}
+        self._templates: dict[Path, tuple[int, Template]] = {}
+
+    def _connect(self) -> smtplib.SMTP:
+        """Open and authenticate a new SMTP connection."""
+        logging.debug("Connecting to SMTP server %s:%s", self.smtp_server, self.smtp_port)
+        server = smtplib.SMTP(self.smtp_server, int(self.smtp_port))
+        try:
+            if self.smtp_starttls:
+                server.starttls()
+            server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        self._messages_on_connection = 0
+        return server
+
+    def close(self) -> None:
+        """Close the SMTP connection, if one is open."""
+        if self._smtp is None:
+            return
+        server, self._smtp = self._smtp, None
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _sendmail(self, recipient: str, content: str) -> None:
+        """Send a message over the open connection, reconnecting once if the server dropped it.
+
+        If rate limits are set, wait until they allow one more message first.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.sendmail(self.smtp_from, recipient, content)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPSenderRefused, ConnectionError) as exc:
+            # A sender refused with 421 means that the server is closing the connection
+            if isinstance(exc, smtplib.SMTPSenderRefused) and exc.smtp_code != 421:  # noqa: PLR2004
+                raise
+            logging.info("SMTP connection lost (%s), reconnecting", exc)
+            self.close()
+            self._smtp = self._connect()
+            self._smtp.sendmail(self.smtp_from, recipient, content)
+
+        self._messages_on_connection += 1
+        if self._messages_on_connection >= self.max_messages_per_connection:
+            self.close()
 
     def create_copy_with_details(
         self,
@@ -60,11 +141,21 @@ class Mail:
 
     def get_inbuilt_template_dir(self) -> Path:
         """Get the inbuilt template directory."""
-        # Get the directory of the current module
-        module_dir = Path(__file__).resolve().parent
+        return INBUILT_TEMPLATE_DIR
 
-        # Construct the path to the inbuilt templates directory
-        return module_dir / "templates"
+    def get_template_path(self, message: str, template_file: str) -> Path:
+        """
+        Returns the path of the Jinja2 template file. If the template file is empty, use the
+        default template from ./templates/<type>.html.j2.
+
+        :param message: Message type of the template (e.g., "invitation")
+        :param template_file: Path to the Jinja2 template file
+        :return: Path of the template file
+        """
+        # Use default template path if no file path is set
+        if not template_file:
+            return self.get_inbuilt_template_dir() / f"{message}.html.j2"
+        return Path(template_file).resolve()
 
     def read_template(self, message: str, template_file: str) -> str:
         """
@@ -75,24 +166,58 @@ class Mail:
         :param template_file: Path to the Jinja2 template file
         :return: Template string
         """
-        # Use default template path if no file path is set
-        if not template_file:
-            file_path = self.get_inbuilt_template_dir() / f"{message}.html.j2"
-        else:
-            file_path = Path(template_file).resolve()
+        file_path = self.get_template_path(message=message, template_file=template_file)
 
         logging.debug("Reading template for '%s' from '%s'", message, file_path)
 
         with open(file_path, encoding="utf-8") as file:
             return file.read()
 
+    def get_template(self, message: str, template_file: str) -> Template:
+        """
+        Returns the compiled Jinja2 template. Templates are read and compiled once, and only again
+        if their file has been modified since.
+
+        :param message: Message type of the template (e.g., "invitation")
+        :param template_file: Path to the Jinja2 template file
+        :return: Compiled template
+        """
+        key = (message, template_file)
+        if (file_path := self._template_paths.get(key)) is None:
+            file_path = self._template_paths[key] = self.get_template_path(message, template_file)
+        mtime = file_path.stat().st_mtime_ns
+        cached = self._templates.get(file_path)
+        if cached is None or cached[0] != mtime:
+            template_str = self.read_template(message=message, template_file=template_file)
+            cached = self._templates[file_path] = (mtime, Template(template_str, autoescape=True))
+        return cached[1]
+
+    def copy(self) -> "Mail":
+        """Return a copy with the same settings and details, but without an open connection."""
+        mail = copy.copy(self)
+        mail._smtp = None  # noqa: SLF001
+        mail._messages_on_connection = 0  # noqa: SLF001
+        mail._template_paths = {}  # noqa: SLF001
+        mail._templates = {}  # noqa: SLF001
+        return mail
+
     def send_email(
         self, message: str, recipient: str, template_file: str = "", **template_vars: str | int
     ) -> None:
-        """Sends an email using a Jinja2 template."""
-        # Read and render the email body using Jinja2
-        template_str = self.read_template(message=message, template_file=template_file)
-        template = Template(template_str, autoescape=True)
+        """Sends an email using a Jinja2 template. Errors are printed, not raised."""
+        try:
+            self.deliver_email(
+                message=message, recipient=recipient, template_file=template_file, **template_vars
+            )
+        except Exception as e:  # noqa: BLE001
+            print(f"Failed to send email: {e}")
+
+    def build_email(
+        self, message: str, recipient: str, template_file: str = "", **template_vars: str | int
+    ) -> MIMEMultipart:
+        """Renders an email using a Jinja2 template, and returns the complete message."""
+        # Render the email body using the compiled Jinja2 template
+        template = self.get_template(message=message, template_file=template_file)
         email_body = template.render(
             instance_url=self.instance_url, instance_title=self.instance_title, **template_vars
         )
@@ -107,20 +232,150 @@ class Mail:
 
         # Attach the email body as HTML
         msg.attach(MIMEText(email_body, "html"))
-        logging.debug("Email content: \n%s", msg.as_string())
+        return msg
+
+    def deliver_email(
+        self, message: str, recipient: str, template_file: str = "", **template_vars: str | int
+    ) -> None:
+        """Sends an email using a Jinja2 template, raising any error."""
+        msg = self.build_email(
+            message=message, recipient=recipient, template_file=template_file, **template_vars
+        )
+
+        # Serialise the message only once, and in dry runs only if it is logged
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        content = msg.as_string() if debug or not self.dry else ""
+        if debug:
+            logging.debug("Email content: \n%s", content)
 
         if self.dry:
             logging.info("Dry run, not sending email to %s", recipient)
             return
 
+        self.send_message(recipient, content)
+
+    def send_message(self, recipient: str, content: str) -> None:
+        """Sends an already serialised email, raising any error."""
+        # Without a trace file, not even the attributes of a span are built
+        if self.tracer.enabled:
+            with self.tracer.span("Send email", kind=SPAN_KIND_CLIENT, recipient=recipient):
+                self._sendmail(recipient, content)
+        else:
+            self._sendmail(recipient, content)
+        logging.info("Email sent to %s", recipient)
+
+
+class MailQueue:
+    """Send emails in background threads, so that the sync does not wait for the mail server.
+
+    `send_email` has the same signature as `Mail.send_email`, but only puts the email into a
+    bounded queue, blocking if it is full. Worker threads, each with its own copy of the `Mail`
+    and thus its own SMTP connection, deliver the emails. They are started with the first email,
+    so a run without emails starts no threads. Call `close` to wait until all emails are
+    delivered, then read `sent` and `failures`. If the run failed, call `abort` before, so that
+    `close` does not wait for the emails still in the queue.
+
+    Attributes:
+        sent (int): Number of delivered emails.
+        failures (list[tuple[str, str]]): Recipient and error of each email that could not be
+            delivered, in order of failure.
+    """
+
+    def __init__(self, mail: Mail, workers: int = 2, maxsize: int = 100) -> None:
+        """Prepare the queue, without starting the worker threads yet.
+
+        Args:
+            mail (Mail): The configured mail client, copied for each worker.
+            workers (int, optional): Number of worker threads. Defaults to 2.
+            maxsize (int, optional): Maximum number of queued emails, or 0 for no limit.
+                Defaults to 100.
+        """
+        self._queue: queue.Queue[tuple[str, str, str, dict[str, str | int]] | None] = queue.Queue(
+            maxsize=maxsize
+        )
+        self._lock = threading.Lock()
+        self.rate_limiter = mail.rate_limiter
+        self.sent: int = 0
+        self.failures: list[tuple[str, str]] = []
+        self._mail = mail
+        self._worker_count = workers
+        self._workers: list[threading.Thread] = []
+        self._closed = False
+
+    def _start(self) -> None:
+        """Start the worker threads."""
+        self._workers = [
+            threading.Thread(
+                target=self._work, args=(self._mail.copy(),), name=f"mail-{i}", daemon=True
+            )
+            for i in range(self._worker_count)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def send_email(
+        self, message: str, recipient: str, template_file: str = "", **template_vars: str | int
+    ) -> None:
+        """Queue an email for delivery in the background."""
+        if self._closed:
+            msg = "The mail queue is already closed"
+            raise RuntimeError(msg)
+        if not self._workers:
+            self._start()
+        self._queue.put((message, recipient, template_file, template_vars))
+
+    def _work(self, mail: Mail) -> None:
+        """Deliver queued emails until the end marker is received."""
         try:
-            # Send the email
-            with smtplib.SMTP(self.smtp_server, int(self.smtp_port)) as server:
-                if self.smtp_starttls:
-                    server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.sendmail(self.smtp_from, recipient, msg.as_string())
-            logging.info("Email sent to %s", recipient)
+            while (item := self._queue.get()) is not None:
+                message, recipient, template_file, template_vars = item
+                try:
+                    mail.deliver_email(
+                        message=message,
+                        recipient=recipient,
+                        template_file=template_file,
+                        **template_vars,
+                    )
+                except Exception as exc:  # noqa: BLE001
+                    logging.warning("Failed to send email to %s: %s", recipient, exc)
+                    with self._lock:
+                        self.failures.append((recipient, str(exc)))
+                else:
+                    with self._lock:
+                        self.sent += 1
+        finally:
+            mail.close()
 
-        except Exception as e:  # noqa: BLE001
-            print(f"Failed to send email: {e}")
+    def abort(self) -> None:
+        """Drop the queued emails that no worker is sending yet, and record them as failures.
+
+        `close` then only waits for the emails that are being delivered right now.
+        """
+        self._closed = True
+        dropped: list[str] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                dropped.append(item[1])
+        if dropped:
+            logging.warning(
+                "Dropping %d queued emails, as the run failed: %s", len(dropped), ", ".join(dropped)
+            )
+            with self._lock:
+                self.failures.extend(
+                    (recipient, "Not sent, the run failed") for recipient in dropped
+                )
+
+    def close(self) -> None:
+        """Wait until all queued emails are delivered, then stop the workers."""
+        self._closed = True
+        if self.rate_limiter is not None and self._workers:
+            self.rate_limiter.log_projection(self._queue.qsize())
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
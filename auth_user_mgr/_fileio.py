@@ -0,0 +1,40 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Write files atomically, so that readers never see a partially written file."""
+
+import os
+import tempfile
+from pathlib import Path
+
+
+def write_bytes_atomic(file_path: Path, data: bytes) -> None:
+    """Write data to a file atomically, so readers never see a partially written file.
+
+    The data is written to a temporary file in the same directory, which then replaces the target.
+    The permissions of an existing target file are kept.
+    """
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if file_path.exists():
+            Path(tmp_name).chmod(file_path.stat().st_mode & 0o7777)
+        Path(tmp_name).replace(file_path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def write_text_atomic(file_path: Path, text: str, newline: str = "\n") -> None:
+    """Write UTF-8 text to a file atomically, see `write_bytes_atomic`.
+
+    Line breaks in the text are written as `newline`, e.g. the one of the file being replaced.
+    """
+    if newline != "\n":
+        text = text.replace("\n", newline)
+    write_bytes_atomic(file_path, text.encode("utf-8"))
@@ -0,0 +1,62 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Helpers to compare the user inventory with earlier git revisions."""
+
+import logging
+import shutil
+import subprocess
+from pathlib import Path
+
+
+def _run_git(base: Path, *args: str) -> subprocess.CompletedProcess[bytes]:
+    """Run a git command in a directory and return the completed process, without checking it.
+
+    Raises:
+        ValueError: If git is not available.
+    """
+    if (git := shutil.which("git")) is None:
+        msg = "Cannot find git, which is required to compare with git revisions."
+        raise ValueError(msg)
+    return subprocess.run([git, "-C", str(base), *args], capture_output=True, check=False)  # noqa: S603
+
+
+def get_changed_files(base: Path, since: str = "") -> set[str]:
+    """Return the files below a directory that changed in the git working tree.
+
+    Args:
+        base (Path): The directory to look for changes in.
+        since (str, optional): Git revision to compare with. Defaults to HEAD, i.e. only
+            uncommitted changes. Untracked files are always included.
+
+    Returns:
+        set[str]: Paths of the changed files, relative to `base`.
+
+    Raises:
+        ValueError: If git is not available or the changes cannot be determined.
+    """
+    changed: set[str] = set()
+    for args in (
+        ("diff", "--name-only", "--relative", since or "HEAD", "--"),
+        ("ls-files", "--others", "--exclude-standard"),
+    ):
+        result = _run_git(base, *args)
+        if result.returncode:
+            msg = f"Cannot determine changed files in {base}: {result.stderr.decode().strip()}"
+            raise ValueError(msg)
+        changed.update(line for line in result.stdout.decode().splitlines() if line)
+    logging.debug("Changed files in %s: %s", base, sorted(changed))
+    return changed
+
+
+def read_file_at_revision(base: Path, rev: str, rel_path: str) -> bytes | None:
+    """Return the content of a file at a git revision, or None if it did not exist then.
+
+    Args:
+        base (Path): The directory `rel_path` is relative to.
+        rev (str): The git revision.
+        rel_path (str): Path of the file, relative to `base`.
+    """
+    result = _run_git(base, "show", f"{rev}:./{rel_path}")
+    return None if result.returncode else result.stdout
@@ -0,0 +1,112 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Find the users whose configuration changed since a git revision, for incremental syncs."""
+
+import logging
+from pathlib import Path
+from typing import NamedTuple
+
+from ruamel.yaml import YAMLError
+
+from ._config import INVENTORY_FILE_PATTERNS, matches_any
+from ._git import get_changed_files, read_file_at_revision
+from ._index import load_content
+from ._validate import validate_inventory
+
+
+class InventoryDiff(NamedTuple):
+    """Users that changed between a git revision and the working tree.
+
+    Attributes:
+        changed (list[dict]): Current entries of users that were added or changed, sorted by email.
+        removed (list[str]): Lowercased emails of users that were removed from the inventory.
+    """
+
+    changed: list[dict]
+    removed: list[str]
+
+
+def _is_inventory_path(rel_path: str, exclude: tuple[str, ...] | list[str]) -> bool:
+    """Check whether a changed path is an inventory file, following the discovery rules."""
+    parts = rel_path.split("/")
+    if any(part.startswith(".") for part in parts):
+        return False
+    if not matches_any(parts[-1], INVENTORY_FILE_PATTERNS):
+        return False
+    prefixes = ("/".join(parts[: i + 1]) for i in range(len(parts)))
+    return not (exclude and any(matches_any(prefix, exclude) for prefix in prefixes))
+
+
+def _users_by_email(file_path: Path, content: bytes | None) -> dict[str, dict]:
+    """Parse the users of an inventory file's content by lowercased email."""
+    try:
+        data = load_content(file_path, content) if content else None
+    except (YAMLError, RuntimeError, ValueError) as e:
+        # Only possible for earlier revisions, the current inventory has been validated
+        logging.warning(
+            "Cannot parse %s at the earlier revision, treating all its users as new. Removed "
+            "users in it are only deleted by a full sync: %s",
+            file_path,
+            e,
+        )
+        return {}
+    if not isinstance(data, list):
+        return {}
+    return {
+        user["email"].lower(): user
+        for user in data
+        if isinstance(user, dict) and isinstance(user.get("email"), str)
+    }
+
+
+def diff_inventory_since(
+    file_or_dir: str, rev: str, exclude: tuple[str, ...] | list[str] = ()
+) -> InventoryDiff:
+    """Compare the user inventory in the working tree with its state at a git revision.
+
+    The whole current inventory is validated first, as a sync would, without writing the
+    persistent index into the checkout. Then only the files that changed since the revision
+    are parsed, at the revision and now, and their users are compared by email. Users moved to
+    another file without changes are not reported.
+
+    Args:
+        file_or_dir (str): Path to the user inventory file or directory.
+        rev (str): The git revision to compare with.
+        exclude (tuple[str, ...] | list[str], optional): Glob patterns of inventory files or
+            directories to skip.
+
+    Returns:
+        InventoryDiff: The added or changed users, and the removed users.
+
+    Raises:
+        ValueError: If the current inventory is invalid, or the revision cannot be compared.
+    """
+    validation = validate_inventory(file_or_dir, exclude=exclude, use_index=False)
+    if validation.errors:
+        for error in validation.errors:
+            logging.error(error)
+        msg = f"The user inventory has {len(validation.errors)} errors, see above."
+        raise ValueError(msg)
+
+    root = Path(file_or_dir)
+    base = root if root.is_dir() else root.parent
+    previous: dict[str, dict] = {}
+    current: dict[str, dict] = {}
+    for rel_path in sorted(get_changed_files(base, since=rev)):
+        if (root.is_file() and rel_path != root.name) or not _is_inventory_path(rel_path, exclude):
+            continue
+        path = base / rel_path
+        previous.update(_users_by_email(path, read_file_at_revision(base, rev, rel_path)))
+        current.update(_users_by_email(path, path.read_bytes() if path.is_file() else None))
+
+    changed = [user for email, user in current.items() if previous.get(email) != user]
+    removed = sorted(previous.keys() - current.keys())
+    logging.info(
+        "Inventory changes since %s: %d users added or changed, %d removed",
+        rev,
+        len(changed),
+        len(removed),
+    )
+    return InventoryDiff(changed=sorted(changed, key=lambda u: u["email"]), removed=removed)
@@ -0,0 +1,383 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Persistent index of the users in an inventory, stored in a sidecar file next to it."""
+
+import hashlib
+import json
+import logging
+import re
+from pathlib import Path
+from typing import NamedTuple
+
+from jsonschema import Draft202012Validator, FormatChecker
+from ruamel.yaml import YAML, YAMLError
+
+from ._config import (
+    USER_CONFIG_ITEM_SCHEMA,
+    InventoryFile,
+    is_json_inventory_file,
+    iter_json_lines,
+    parse_yaml_string_scalar,
+    scan_inventory_files,
+)
+from ._fileio import write_text_atomic
+
+INDEX_VERSION = 2
+INDEX_FILE_NAME = ".auth-user-mgr-index.json"
+
+
+class IndexEntry(NamedTuple):
+    """Location of a user entry in the inventory.
+
+    Attributes:
+        path (Path): The inventory file containing the user.
+        position (int): Position of the entry in the file's list of users, starting at 0.
+        content_hash (str): SHA-256 hash of the entry's content, changes whenever the user's
+            configuration changes.
+    """
+
+    path: Path
+    position: int
+    content_hash: str
+
+
+def index_path_for(file_or_dir: str | Path) -> Path:
+    """Return the path of the index file for an inventory directory or single inventory file.
+
+    The index file is hidden (starts with a dot), so it is never discovered as inventory itself.
+    """
+    root = Path(file_or_dir)
+    if root.is_dir():
+        return root / INDEX_FILE_NAME
+    return root.with_name(f".{root.name}.index.json")
+
+
+def _hash_entry(user_entry: dict) -> str:
+    """Return a stable hash of a user entry's content, independent of key order."""
+    canonical = json.dumps(user_entry, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# Validator for single user entries, so all entries of a file can be checked one by one
+_USER_VALIDATOR = Draft202012Validator(USER_CONFIG_ITEM_SCHEMA, format_checker=FormatChecker())
+
+
+# Lines of the canonical inventory layout: a key of a root-level list item, or an item of a
+# sequence below such a key
+_ITEM_KEY_PATTERN = re.compile(r"(- |  )([A-Za-z_]\w*):(?: +(.*))?")
+_ITEM_SEQUENCE_PATTERN = re.compile(r"    - (.*)")
+
+
+def _load_canonical_yaml(text: str) -> list[dict] | None:
+    """Parse YAML text in the canonical inventory layout much faster than a YAML parser.
+
+    The canonical layout is the one the import writes: a root-level list of mappings whose
+    values are simple strings or lists of them, at two and four spaces of indentation. Values
+    are read by `parse_yaml_string_scalar`, like the groups spliced by the import.
+
+    Returns:
+        list[dict] | None: The users, or None if the text deviates from the layout in any way,
+        so that a YAML parser has to decide.
+    """
+    users: list[dict] = []
+    user: dict = {}
+    # The key without a value of the current user that sequence items belong to, if any
+    sequence_key = ""
+    sequence: list[str] = []
+    for raw_line in text.splitlines():
+        line = raw_line.rstrip()
+        if not line or line.lstrip().startswith("#"):
+            continue
+        if match := _ITEM_SEQUENCE_PATTERN.fullmatch(line):
+            if not sequence_key or (value := parse_yaml_string_scalar(match[1])) is None:
+                return None
+            sequence.append(value)
+            user[sequence_key] = sequence
+            continue
+        if (match := _ITEM_KEY_PATTERN.fullmatch(line)) is None:
+            return None
+        if match[1] == "- ":
+            user = {}
+            users.append(user)
+        key, raw_value = match[2], match[3]
+        if not users or key in user:
+            return None
+        sequence_key = key if raw_value is None else ""
+        if raw_value is None:
+            user[key] = None
+            sequence = []
+        elif (value := parse_yaml_string_scalar(raw_value)) is not None:
+            user[key] = value
+        else:
+            return None
+    return users or None
+
+
+def load_content(file_path: Path, content: bytes) -> object:
+    """Parse an inventory file's content depending on its format, without formatting details.
+
+    YAML files in the canonical layout are parsed by `_load_canonical_yaml`, all others by
+    ruamel.yaml.
+    """
+    if file_path.suffix.lower() == ".jsonl":
+        return list(iter_json_lines(content.decode("utf-8").splitlines(), file_path))
+    if is_json_inventory_file(file_path):
+        return json.loads(content)
+    try:
+        users = _load_canonical_yaml(content.decode("utf-8"))
+    except UnicodeDecodeError:
+        users = None
+    return users if users is not None else YAML(typ="safe").load(content)
+
+
+def _parse_file(file_path: Path, content: bytes) -> tuple[list[list], list[str]]:
+    """Parse and validate an inventory file's content.
+
+    Emails and usernames are lowercased. Entries that are not mappings keep their position with
+    empty values, so positions always match the file.
+
+    Returns:
+        tuple[list[list], list[str]]: The [email, username, hash] rows in file order, and the
+        errors found in the file. All schema violations of all entries are reported, not only
+        the first one.
+    """
+    try:
+        data = load_content(file_path, content)
+    except (YAMLError, RuntimeError, ValueError) as e:
+        return [], [f"cannot be parsed: {e}"]
+    if data is None:
+        return [], []
+    if not isinstance(data, list):
+        return [], [f"expected a list of users, got {type(data).__name__}"]
+
+    entries: list[list] = []
+    errors: list[str] = []
+    for position, user_entry in enumerate(data, start=1):
+        if not isinstance(user_entry, dict):
+            entries.append(["", "", ""])
+            errors.append(
+                f"entry {position}: expected a dictionary, got {type(user_entry).__name__}"
+            )
+            continue
+        email = user_entry.get("email")
+        username = user_entry.get("username")
+        entries.append(
+            [
+                email.lower() if isinstance(email, str) else "",
+                username.lower() if isinstance(username, str) else "",
+                _hash_entry(user_entry),
+            ]
+        )
+        errors.extend(
+            f"entry {position}: {error.message}"
+            for error in _USER_VALIDATOR.iter_errors(user_entry)
+        )
+    return entries, errors
+
+
+class InventoryIndex:
+    """Maps emails and usernames to the inventory file and position of their user entry.
+
+    The index is kept in a JSON file next to the inventory (see `index_path_for`) and rebuilt
+    incrementally: only files whose fingerprint changed since the last run are read again, and
+    only files whose content hash changed are parsed again. An index file with an unknown
+    version, for another root or another set of exclude patterns, or which cannot be read, is
+    discarded and rebuilt from scratch. Lookups check the fingerprint of the file they point to,
+    so an entry is never returned for a file that changed after the index was refreshed.
+
+    Attributes:
+        root (Path): The inventory directory or single inventory file.
+        index_path (Path): Path of the index file.
+        base (Path): The directory that the paths of indexed files are relative to.
+        exclude (list[str]): Glob patterns of inventory files or directories to skip.
+        files (dict[str, dict]): Indexed files by path relative to the inventory directory, each
+            with `fingerprint`, `sha256`, `entries` ([email, username, hash] rows) and the
+            parsing and schema validation `errors` of the file.
+        by_email (dict[str, IndexEntry]): Entry locations by lowercased email. If an email
+            appears in several files, the first file wins.
+        by_username (dict[str, IndexEntry]): Entry locations by lowercased username.
+        reparsed (list[Path]): Files that were parsed again by the last refresh.
+    """
+
+    def __init__(
+        self,
+        file_or_dir: str | Path,
+        exclude: tuple[str, ...] | list[str] = (),
+        index_path: Path | None = None,
+    ) -> None:
+        """
+        Args:
+            file_or_dir (str | Path): The inventory directory or single inventory file.
+            exclude (tuple[str, ...] | list[str], optional): Glob patterns of inventory files or
+                directories to skip.
+            index_path (Path, optional): Path of the index file. Defaults to the sidecar path
+                returned by `index_path_for`.
+        """
+        self.root = Path(file_or_dir)
+        self.index_path = index_path or index_path_for(self.root)
+        self.exclude = sorted(exclude)
+        self.base = self.root if self.root.is_dir() else self.root.parent
+        self.files: dict[str, dict] = {}
+        self.by_email: dict[str, IndexEntry] = {}
+        self.by_username: dict[str, IndexEntry] = {}
+        self.reparsed: list[Path] = []
+        self._paths: set[Path] = set()
+        self._dirty = False
+
+    @classmethod
+    def open(
+        cls,
+        file_or_dir: str | Path,
+        exclude: tuple[str, ...] | list[str] = (),
+        persist: bool = False,
+    ) -> "InventoryIndex":
+        """Build the index of an inventory, or load, update and save its persistent index.
+
+        Args:
+            file_or_dir (str | Path): The inventory directory or single inventory file.
+            exclude (tuple[str, ...] | list[str], optional): Glob patterns of inventory files or
+                directories to skip.
+            persist (bool, optional): If True, load the index file, parse only new and changed
+                files, and save the index file if it changed. Otherwise, build the index from
+                scratch in memory, without reading or writing the index file, so that read-only
+                commands leave the inventory untouched. Defaults to False.
+
+        Returns:
+            InventoryIndex: The up-to-date index.
+        """
+        index = cls(file_or_dir, exclude=exclude)
+        if persist:
+            index.load()
+        index.refresh()
+        if persist:
+            index.save()
+        return index
+
+    def load(self) -> None:
+        """Read the index file, discarding it if it is missing, unreadable or incompatible."""
+        self.files = {}
+        try:
+            stored = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            logging.debug("No index file at %s, building a new one", self.index_path)
+            return
+        except (OSError, ValueError) as e:
+            logging.warning("Cannot read index file %s, rebuilding it: %s", self.index_path, e)
+            return
+
+        if not isinstance(stored, dict) or (
+            stored.get("version"),
+            stored.get("root"),
+            stored.get("exclude"),
+        ) != (INDEX_VERSION, self.root.name, self.exclude):
+            logging.info("Index file %s is outdated, rebuilding it", self.index_path)
+            return
+        self.files = stored.get("files") or {}
+
+    def refresh(self) -> list[Path]:
+        """Bring the index up to date with the inventory on disk.
+
+        Returns:
+            list[Path]: The files that were parsed again because their content changed.
+        """
+        previous = self.files
+        self.files = {}
+        self.reparsed = []
+        for inventory_file in scan_inventory_files(self.root, exclude=self.exclude):
+            rel_path = inventory_file.path.relative_to(self.base).as_posix()
+            stored = previous.get(rel_path)
+            if stored is not None and stored.get("fingerprint") == inventory_file.fingerprint:
+                self.files[rel_path] = stored
+            else:
+                self._index_file(rel_path, inventory_file, stored)
+        if self.files.keys() != previous.keys():
+            self._dirty = True
+        self._build_lookups()
+        if self.reparsed:
+            logging.debug("Re-indexed %d changed inventory files", len(self.reparsed))
+        return self.reparsed
+
+    def _index_file(
+        self, rel_path: str, inventory_file: InventoryFile, stored: dict | None
+    ) -> None:
+        """(Re-)index a single file whose fingerprint is new or changed."""
+        content = inventory_file.path.read_bytes()
+        sha256 = hashlib.sha256(content).hexdigest()
+        if stored is not None and stored.get("sha256") == sha256:
+            # Touched but unchanged, e.g. after a checkout: keep the entries
+            entries = stored.get("entries") or []
+            errors = stored.get("errors") or []
+        else:
+            entries, errors = _parse_file(inventory_file.path, content)
+            self.reparsed.append(inventory_file.path)
+        self.files[rel_path] = {
+            "fingerprint": inventory_file.fingerprint,
+            "sha256": sha256,
+            "entries": entries,
+            "errors": errors,
+        }
+        self._dirty = True
+
+    def _build_lookups(self) -> None:
+        """Rebuild the email and username lookups from the indexed files, in file order."""
+        self.by_email = {}
+        self.by_username = {}
+        self._paths = set()
+        for rel_path, file_info in self.files.items():
+            path = self.base.joinpath(rel_path)
+            self._paths.add(path)
+            for position, (email, username, content_hash) in enumerate(file_info["entries"]):
+                entry = IndexEntry(path=path, position=position, content_hash=content_hash)
+                if email:
+                    self.by_email.setdefault(email, entry)
+                if username:
+                    self.by_username.setdefault(username, entry)
+
+    def save(self) -> None:
+        """Write the index file atomically, if the index changed since it was loaded."""
+        if not self._dirty:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "root": self.root.name,
+            "exclude": self.exclude,
+            "files": self.files,
+        }
+        write_text_atomic(self.index_path, json.dumps(data, separators=(",", ":")))
+        self._dirty = False
+        logging.debug("Saved inventory index to %s", self.index_path)
+
+    def covers(self, file_path: Path) -> bool:
+        """Check whether an inventory file is part of the index."""
+        return file_path in self._paths
+
+    def lookup(self, email_or_username: str) -> IndexEntry | None:
+        """Find the location of a user by email or username, case-insensitive.
+
+        If the file the entry points to changed since the index was refreshed, the index is
+        refreshed first.
+
+        Args:
+            email_or_username (str): The email address or username to look up.
+
+        Returns:
+            IndexEntry | None: The location of the user entry, or None if the user is unknown.
+        """
+        key = email_or_username.lower()
+        entry = self.by_email.get(key) or self.by_username.get(key)
+        if entry is not None and self._is_stale(entry.path):
+            self.refresh()
+            entry = self.by_email.get(key) or self.by_username.get(key)
+        return entry
+
+    def _is_stale(self, file_path: Path) -> bool:
+        """Check whether an indexed file changed on disk since it was indexed."""
+        rel_path = file_path.relative_to(self.base).as_posix()
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            return True
+        fingerprint = InventoryFile(file_path, stat.st_size, stat.st_mtime_ns).fingerprint
+        return self.files[rel_path]["fingerprint"] != fingerprint
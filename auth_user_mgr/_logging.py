@@ -0,0 +1,137 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Set up the log handlers: plain or JSON lines, optionally written by a background thread."""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = "[%(asctime)s] %(levelname)s: %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# The background writer of the current configuration, stopped on exit to flush its queue
+_listener: QueueListener | None = None
+
+
+def truncate_arg(value: object, max_length: int) -> object:
+    """Return a log argument, or its string shortened to `max_length` characters if longer.
+
+    Numbers are kept as they are, so that numeric placeholders like `%d` still work.
+    """
+    if isinstance(value, (int, float)):
+        return value
+    text = str(value)
+    if len(text) <= max_length:
+        return value
+    return f"{text[:max_length]}... ({len(text)} characters)"
+
+
+class TruncatingFilter(logging.Filter):
+    """Shorten long arguments of log records, e.g. API payloads or serialised emails.
+
+    Only the arguments are shortened, never the message template or a traceback.
+    """
+
+    def __init__(self, max_length: int) -> None:
+        """Set the maximum length of an argument."""
+        super().__init__()
+        self.max_length = max_length
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Shorten the arguments of the record in place, and keep it."""
+        if isinstance(record.args, dict):
+            record.args = {k: truncate_arg(v, self.max_length) for k, v in record.args.items()}
+        elif record.args:
+            record.args = tuple(truncate_arg(arg, self.max_length) for arg in record.args)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as JSON objects, one per line, for log collectors."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Return the record as a single line of JSON."""
+        data = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """Queue records with their message merged, and their traceback kept apart from it.
+
+    The standard handler appends the traceback to the message, which would hide it in the
+    message of a JSON line.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Return a copy of the record that does not refer to the arguments or the exception."""
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+        return record
+
+
+def stop_queue() -> None:
+    """Stop the background writer, after it has written all queued records."""
+    global _listener  # noqa: PLW0603
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_handlers(json_lines: bool = False, queued: bool = False, max_arg_length: int = 0) -> None:
+    """Replace the handlers of the root logger with one writing to stderr.
+
+    Args:
+        json_lines (bool, optional): If True, write each record as a line of JSON.
+        queued (bool, optional): If True, only put the records into a queue, and write them to
+            stderr in a background thread, so that slow terminals or log pipes do not block the
+            calling thread. The queue is flushed on exit.
+        max_arg_length (int, optional): If positive, shorten longer log arguments to this number
+            of characters.
+    """
+    global _listener  # noqa: PLW0603
+    stop_queue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    formatter = JsonFormatter if json_lines else logging.Formatter
+    stream_handler.setFormatter(formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+
+    handler: logging.Handler = stream_handler
+    if queued:
+        log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        handler = _QueueHandler(log_queue)
+        _listener = QueueListener(log_queue, stream_handler)
+        _listener.start()
+    if max_arg_length > 0:
+        # On the handler of the calling thread, so that arguments are shortened before the
+        # message is formatted
+        handler.addFilter(TruncatingFilter(max_arg_length))
+    root.addHandler(handler)
+
+
+atexit.register(stop_queue)
@@ -0,0 +1,224 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Record numbers about the requests to the Authentik API, per endpoint."""
+
+import json
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Sequence
+from pathlib import Path
+from typing import NamedTuple
+
+from ._fileio import write_text_atomic
+
+# Path segments which identify an object, replaced to group requests by endpoint
+_ID_SEGMENT = re.compile(
+    r"/(?:\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})(?=/|$)"
+)
+# Upper bounds in seconds of the latency buckets, as the defaults of the Prometheus clients. A
+# last bucket counts the slower requests
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Status codes from which an API response counts as an error
+ERROR_STATUS = 400
+
+
+def normalize_endpoint(path: str) -> str:
+    """Replace numeric IDs and UUIDs in an API path with `{id}`.
+
+    Args:
+        path (str): The path of the request, e.g. `/core/groups/<uuid>/add_user/`.
+
+    Returns:
+        str: The endpoint, e.g. `/core/groups/{id}/add_user/`.
+    """
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
+def percentile(buckets: Sequence[int], share: float, maximum: float) -> float:
+    """Estimate the value below which `share` of the values lie, from their latency buckets.
+
+    As `histogram_quantile` of Prometheus, interpolate linearly within the bucket of the rank.
+
+    Args:
+        buckets (Sequence[int]): Number of values per bucket of `LATENCY_BUCKETS`, and above.
+        share (float): The share of values, e.g. 0.95 for the 95th percentile.
+        maximum (float): The largest value, returned for ranks above the last bound, and the
+            most any estimate can be.
+
+    Returns:
+        float: The estimated percentile, or 0.0 without values.
+    """
+    rank = share * sum(buckets)
+    cumulative, lower = 0, 0.0
+    for upper, count in zip(LATENCY_BUCKETS, buckets[:-1], strict=True):
+        if count and cumulative + count >= rank:
+            return min(maximum, lower + (upper - lower) * (rank - cumulative) / count)
+        cumulative += count
+        lower = upper
+    return maximum
+
+
+class EndpointStats(NamedTuple):
+    """The numbers of all requests with the same method to the same endpoint.
+
+    Attributes:
+        method (str): The HTTP method.
+        endpoint (str): The endpoint, with IDs replaced by `{id}`.
+        count (int): Number of requests.
+        statuses (dict[int, int]): Number of responses by HTTP status code.
+        bytes (int): Total size of the response bodies.
+        seconds (float): Total time of the requests.
+        buckets (list[int]): Number of requests per latency bucket of `LATENCY_BUCKETS`, the
+            last one for the requests slower than all bounds.
+        p50 (float): Median latency in seconds, estimated from the buckets.
+        p95 (float): 95th percentile of the latency in seconds, estimated from the buckets.
+        p99 (float): 99th percentile of the latency in seconds, estimated from the buckets.
+        max (float): Maximum latency in seconds.
+    """
+
+    method: str
+    endpoint: str
+    count: int
+    statuses: dict[int, int]
+    bytes: int
+    seconds: float
+    buckets: list[int]
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+class ApiMetrics:
+    """Collect the count, status codes, latencies and response sizes of API requests.
+
+    Requests are grouped by method and endpoint. Latencies are counted in the fixed buckets of
+    `LATENCY_BUCKETS`, with their sum and maximum, so memory does not grow with the number of
+    requests. Recording is thread-safe, as some API calls are made concurrently.
+    """
+
+    def __init__(self) -> None:
+        """Start without any recorded request."""
+        self._lock = threading.Lock()
+        self._buckets: dict[tuple[str, str], list[int]] = {}
+        self._seconds: dict[tuple[str, str], float] = {}
+        self._max: dict[tuple[str, str], float] = {}
+        self._statuses: dict[tuple[str, str], Counter[int]] = {}
+        self._bytes: Counter[tuple[str, str]] = Counter()
+
+    def __len__(self) -> int:
+        """Return the number of recorded requests."""
+        return sum(sum(buckets) for buckets in self._buckets.values())
+
+    def record(self, method: str, path: str, status: int, seconds: float, size: int) -> None:
+        """Record one request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path of the request below the API base URL.
+            status (int): The HTTP status code of the response.
+            seconds (float): The time from sending the request to receiving the response.
+            size (int): The size of the response body in bytes.
+        """
+        key = (method, normalize_endpoint(path))
+        # The bucket of the lowest bound not below the latency, as `le` in Prometheus
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = [0] * (len(LATENCY_BUCKETS) + 1)
+                self._seconds[key] = self._max[key] = 0.0
+                self._statuses[key] = Counter()
+            self._buckets[key][bucket] += 1
+            self._seconds[key] += seconds
+            self._max[key] = max(self._max[key], seconds)
+            self._statuses[key][status] += 1
+            self._bytes[key] += size
+
+    def failures(self) -> int:
+        """Return the number of requests answered with an error status."""
+        with self._lock:
+            return sum(
+                count
+                for statuses in self._statuses.values()
+                for status, count in statuses.items()
+                if status >= ERROR_STATUS
+            )
+
+    def endpoints(self) -> list[EndpointStats]:
+        """Return the numbers of each endpoint, the ones with the most total time first."""
+        stats: list[EndpointStats] = []
+        with self._lock:
+            for (method, endpoint), buckets in self._buckets.items():
+                maximum = self._max[method, endpoint]
+                stats.append(
+                    EndpointStats(
+                        method=method,
+                        endpoint=endpoint,
+                        count=sum(buckets),
+                        statuses=dict(sorted(self._statuses[method, endpoint].items())),
+                        bytes=self._bytes[method, endpoint],
+                        seconds=self._seconds[method, endpoint],
+                        buckets=buckets[:],
+                        p50=percentile(buckets, 0.50, maximum),
+                        p95=percentile(buckets, 0.95, maximum),
+                        p99=percentile(buckets, 0.99, maximum),
+                        max=maximum,
+                    )
+                )
+        return sorted(stats, key=lambda s: (-s.seconds, s.endpoint, s.method))
+
+    def format_table(self) -> list[str]:
+        """Return the numbers of each endpoint as the lines of a plain-text table."""
+        header = ("Method", "Endpoint", "Calls", "Status", "KiB", "Total s", "p50 ms", "p95 ms")
+        rows = [
+            (
+                s.method,
+                s.endpoint,
+                str(s.count),
+                " ".join(f"{status}:{count}" for status, count in s.statuses.items()),
+                f"{s.bytes / 1024:.1f}",
+                f"{s.seconds:.2f}",
+                f"{s.p50 * 1000:.0f}",
+                f"{s.p95 * 1000:.0f}",
+            )
+            for s in self.endpoints()
+        ]
+        widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+        # Left-align the text columns, right-align the numbers
+        return [
+            "  ".join(
+                cell.ljust(width) if i < 2 else cell.rjust(width)  # noqa: PLR2004
+                for i, (cell, width) in enumerate(zip(row, widths, strict=True))
+            ).rstrip()
+            for row in [header, *rows]
+        ]
+
+    def to_dict(self) -> dict:
+        """Return all numbers as a JSON-serialisable dictionary."""
+        endpoints = self.endpoints()
+        return {
+            "requests": sum(s.count for s in endpoints),
+            "seconds": sum(s.seconds for s in endpoints),
+            "bytes": sum(s.bytes for s in endpoints),
+            "latency_buckets": list(LATENCY_BUCKETS),
+            "endpoints": [
+                {**s._asdict(), "statuses": {str(k): v for k, v in s.statuses.items()}}
+                for s in endpoints
+            ],
+        }
+
+
+def write_metrics_file(path: str | Path, api: ApiMetrics, phases: dict[str, float]) -> None:
+    """Write the API metrics and the phase timings of a run to a JSON file.
+
+    Args:
+        path (str | Path): Path of the metrics file.
+        api (ApiMetrics): The metrics of the API requests.
+        phases (dict[str, float]): Seconds spent in each phase of the run.
+    """
+    data = {"api": api.to_dict(), "phases": phases}
+    write_text_atomic(Path(path), json.dumps(data, indent=2) + "\n")
@@ -0,0 +1,152 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measure how long the phases of a command take, and profile it on demand."""
+
+import cProfile
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Generator
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+
+from ._trace import Tracer
+
+# Seconds between two stack samples for the collapsed-stack file
+SAMPLE_INTERVAL = 0.005
+
+
+class PhaseTimer:
+    """Record the wall time of named phases, in the order they first ran.
+
+    A phase which runs several times, e.g. once per chunk, accumulates its durations. Each run
+    of a phase is also recorded as a span of the tracer.
+
+    Attributes:
+        phases (dict[str, float]): Seconds spent in each phase.
+        tracer (Tracer): The tracer to record the phases and finer spans with.
+    """
+
+    def __init__(self, tracer: Tracer | None = None) -> None:
+        """Start the total time.
+
+        Args:
+            tracer (Tracer, optional): The tracer of the run. Defaults to a disabled tracer.
+        """
+        self.phases: dict[str, float] = {}
+        self.tracer: Tracer = tracer if tracer is not None else Tracer(enabled=False)
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None, None, None]:
+        """Measure the wall time of the enclosed code as phase `name`."""
+        start = time.perf_counter()
+        try:
+            with self.tracer.span(name):
+                yield
+        finally:
+            duration = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+            logging.debug("Phase '%s' took %.3f seconds", name, duration)
+
+    @property
+    def total(self) -> float:
+        """Seconds since the timer was created."""
+        return time.perf_counter() - self.started
+
+    def format_lines(self) -> list[str]:
+        """Return one line per phase with its duration and share of the total, then the total."""
+        total = self.total
+        width = max((len(name) for name in self.phases), default=0)
+        lines = [
+            f"{name + ':':<{width + 1}} {seconds:8.2f} s  {seconds / total:4.0%}"
+            for name, seconds in self.phases.items()
+        ]
+        lines.append(f"{'Total:':<{width + 1}} {total:8.2f} s")
+        return lines
+
+
+def _frame_label(frame: FrameType) -> str:
+    """Return the module and function of a frame, as used in collapsed stacks."""
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class StackSampler:
+    """Sample the stack of a thread periodically in the background, and count the stacks.
+
+    The counts are written in the collapsed-stack format of flame graph tools: one line per
+    distinct stack, with the frames from the outermost to the innermost separated by semicolons,
+    followed by the number of samples.
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL) -> None:
+        """Prepare sampling the given thread.
+
+        Args:
+            thread_id (int): Identifier of the thread to sample.
+            interval (float, optional): Seconds between two samples.
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        """Take samples until stopped."""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # noqa: SLF001
+            labels: list[str] = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def start(self) -> None:
+        """Start sampling."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampling thread."""
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path) -> None:
+        """Write the collapsed stacks to a file, most frequent first."""
+        with open(path, "w", encoding="utf-8") as file:
+            file.writelines(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+@contextmanager
+def profile_to(path: str) -> Generator[None, None, None]:
+    """Profile the enclosed code, if a path is given, and write the results.
+
+    The cProfile statistics are written to `path`, to be read with `pstats` or tools like
+    snakeviz. Sampled stacks are written to `<path>.collapsed`, to be rendered as a flame graph
+    e.g. by flamegraph.pl or speedscope. Without a path, nothing is measured.
+
+    Args:
+        path (str): Path of the statistics file, or an empty string to not profile.
+    """
+    if not path:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        sampler.stop()
+        profiler.dump_stats(path)
+        sampler.write(Path(f"{path}.collapsed"))
+        print(f"Profile written to {path} and {path}.collapsed")
@@ -0,0 +1,155 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Write the numbers of a run as a Prometheus textfile, e.g. for the node exporter."""
+
+import time
+from pathlib import Path
+
+from ._fileio import write_text_atomic
+from ._metrics import ERROR_STATUS, LATENCY_BUCKETS, ApiMetrics
+from ._profile import PhaseTimer
+
+METRIC_PREFIX = "auth_user_mgr"
+
+
+def _escape_label_value(value: str) -> str:
+    """Escape a label value as required by the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PrometheusTextfile:
+    """Collect gauges of one command run and write them in the Prometheus text format.
+
+    All values describe a single run, so they are gauges, except for the histograms of the API
+    latency, which count the requests of the run. Every sample is labelled with the command. A
+    file of the node exporter's textfile collector is replaced on every run, which is why it is
+    written atomically: the collector only ever reads a complete file.
+    """
+
+    def __init__(self, command: str) -> None:
+        """Start without any metric.
+
+        Args:
+            command (str): The command of the run, e.g. `sync`, added as label to all samples.
+        """
+        self.command = command
+        # Type, help text and samples by metric name, in the order they were first added. A
+        # sample has its own name, which differs for the series of a histogram
+        self._families: dict[str, tuple[str, str, list[tuple[str, dict[str, str], float]]]] = {}
+
+    def _add(  # noqa: PLR0913
+        self, kind: str, name: str, help_text: str, suffix: str, value: float, labels: dict
+    ) -> None:
+        """Add one sample of the metric `name`, as series `name` + `suffix`."""
+        full_name = f"{METRIC_PREFIX}_{name}"
+        family = self._families.setdefault(full_name, (kind, help_text, []))
+        family[2].append((full_name + suffix, {"command": self.command, **labels}, value))
+
+    def gauge(self, name: str, help_text: str, value: float, **labels: str) -> None:
+        """Add one sample of a gauge.
+
+        Args:
+            name (str): Name of the metric, without the prefix.
+            help_text (str): Description of the metric.
+            value (float): The value of the sample.
+            **labels (str): Labels of the sample, in addition to the command.
+        """
+        self._add("gauge", name, help_text, "", value, labels)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        buckets: list[int],
+        total: float,
+        **labels: str,
+    ) -> None:
+        """Add the `_bucket`, `_sum` and `_count` series of one histogram.
+
+        Args:
+            name (str): Name of the metric, without the prefix.
+            help_text (str): Description of the metric.
+            buckets (list[int]): Number of observations per bucket of `LATENCY_BUCKETS`, the last
+                one for those above all bounds.
+            total (float): The sum of all observations.
+            **labels (str): Labels of the series, in addition to the command.
+        """
+        cumulative = 0
+        for bound, count in zip([*map(repr, LATENCY_BUCKETS), "+Inf"], buckets, strict=True):
+            cumulative += count
+            self._add("histogram", name, help_text, "_bucket", cumulative, {**labels, "le": bound})
+        self._add("histogram", name, help_text, "_sum", total, labels)
+        self._add("histogram", name, help_text, "_count", cumulative, labels)
+
+    def add_timings(self, timings: PhaseTimer) -> None:
+        """Add the duration of each phase and of the whole run."""
+        for phase, seconds in timings.phases.items():
+            self.gauge(
+                "phase_duration_seconds", "Duration of a phase of the run", seconds, phase=phase
+            )
+        self.gauge("duration_seconds", "Duration of the run", timings.total)
+
+    def add_users(self, **counts: int) -> None:
+        """Add the number of users in each state, e.g. `changed=3`."""
+        for state, count in counts.items():
+            self.gauge("users", "Users by their state in the run", count, state=state)
+
+    def add_api_metrics(self, metrics: ApiMetrics) -> None:
+        """Add the requests, errors and latency histogram per API endpoint."""
+        for stats in metrics.endpoints():
+            labels = {"method": stats.method, "endpoint": stats.endpoint}
+            for status, count in stats.statuses.items():
+                self.gauge(
+                    "api_requests",
+                    "Requests to the Authentik API",
+                    count,
+                    status=str(status),
+                    **labels,
+                )
+            errors = sum(
+                count for status, count in stats.statuses.items() if status >= ERROR_STATUS
+            )
+            self.gauge("api_errors", "Requests to the Authentik API that failed", errors, **labels)
+            self.histogram(
+                "api_duration_seconds",
+                "Latency of the requests to the Authentik API",
+                stats.buckets,
+                stats.seconds,
+                **labels,
+            )
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text format."""
+        lines: list[str] = []
+        for name, (kind, help_text, samples) in self._families.items():
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+            for sample_name, labels, value in samples:
+                label_str = ",".join(
+                    f'{key}="{_escape_label_value(val)}"' for key, val in labels.items()
+                )
+                lines.append(f"{sample_name}{{{label_str}}} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str | Path, now: float | None = None) -> None:
+        """Mark the run as successful and write the file atomically.
+
+        Args:
+            path (str | Path): Path of the textfile, which must end with `.prom` for the
+                collector.
+            now (float, optional): The time of the success, for tests. Defaults to the current
+                time.
+        """
+        self.gauge(
+            "last_success_timestamp_seconds",
+            "Unix time of the last successful run",
+            time.time() if now is None else now,
+        )
+        file_path = Path(path)
+        is_new = not file_path.exists()
+        write_text_atomic(file_path, self.render())
+        if is_new:
+            # The temporary file is only readable by its owner, but the collector may run as
+            # another user
+            file_path.chmod(0o644)
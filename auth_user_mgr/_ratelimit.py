@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Limit the rate of an operation, e.g. sending emails, with token buckets."""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+
+class TokenBucket:
+    """A bucket of up to `capacity` tokens, refilled evenly over `period` seconds.
+
+    A full bucket allows a burst of `capacity` operations. After that, one operation is allowed
+    every `period / capacity` seconds, so the operations are spread over the period.
+    """
+
+    def __init__(self, capacity: int, period: float, now: float) -> None:
+        """Create a full bucket.
+
+        Args:
+            capacity (int): Maximum number of operations per period.
+            period (float): Length of the period in seconds.
+            now (float): The current time of the clock used with this bucket.
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        """Add the tokens accrued since the last update."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, count: int = 1) -> float:
+        """Return the seconds until `count` tokens are available, after a refill."""
+        return max(0.0, (count - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Allow an operation at most `count` times per `period` seconds, for several limits.
+
+    `acquire` blocks until all limits allow one more operation. It is thread-safe, so several
+    threads may share a limiter, e.g. the workers of a `MailQueue`.
+
+    Attributes:
+        limits (list[tuple[int, float]]): The maximum number of operations and the length of its
+            period in seconds, for each limit.
+        buckets (list[TokenBucket]): The token bucket of each limit.
+    """
+
+    def __init__(
+        self,
+        limits: list[tuple[int, float]],
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], object] = time.sleep,
+    ) -> None:
+        """Create a limiter with full buckets.
+
+        Args:
+            limits (list[tuple[int, float]]): The maximum number of operations and the length
+                of its period in seconds, for each limit.
+            clock (Callable[[], float], optional): Monotonic clock. Defaults to time.monotonic.
+            sleep (Callable[[float], object], optional): Sleep function. Defaults to time.sleep.
+        """
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.limits = limits
+        now = clock()
+        self.buckets = [TokenBucket(count, period, now) for count, period in limits]
+
+    def _wait_time(self, count: int = 1) -> float:
+        """Return the seconds until `count` operations are allowed by all limits."""
+        now = self._clock()
+        for bucket in self.buckets:
+            bucket.refill(now)
+        return max((bucket.wait_time(count) for bucket in self.buckets), default=0.0)
+
+    def acquire(self) -> float:
+        """Wait until one more operation is allowed, and count it.
+
+        Returns:
+            float: The seconds waited.
+        """
+        waited = 0.0
+        with self._lock:
+            while (wait := self._wait_time()) > 0:
+                logging.debug("Rate limit reached, waiting %.2f seconds", wait)
+                self._sleep(wait)
+                waited += wait
+            for bucket in self.buckets:
+                bucket.tokens -= 1
+        return waited
+
+    def projected_duration(self, count: int) -> float:
+        """Return the seconds it will take at least until `count` more operations are done."""
+        if count <= 0:
+            return 0.0
+        with self._lock:
+            return self._wait_time(count)
+
+    def log_projection(self, count: int, what: str = "emails") -> None:
+        """Log when `count` more operations will be done at the earliest, if they have to wait."""
+        if (duration := self.projected_duration(count)) > 0:
+            logging.info(
+                "Rate limit: sending %s %s will take about %s, until %s",
+                count,
+                what,
+                timedelta(seconds=round(duration)),
+                (datetime.now() + timedelta(seconds=duration)).strftime("%H:%M:%S"),  # noqa: DTZ005
+            )
@@ -0,0 +1,239 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Keep rendered emails in an on-disk spool until they are delivered."""
+
+import itertools
+import logging
+import os
+import smtplib
+import time
+from email.parser import HeaderParser
+from pathlib import Path
+from typing import NamedTuple
+
+from ._email import Mail
+
+# Seconds to wait before retrying a failed message, doubled with every failed attempt
+RETRY_DELAY = 60
+MAX_RETRY_DELAY = 3600
+# Seconds after which incomplete messages in tmp/ are removed, as in Maildir
+TMP_MAX_AGE = 36 * 3600
+# Minimum seconds for which deliveries are kept in sent/, so that limits set later count them
+SENT_MIN_AGE = 3600
+
+_counter = itertools.count()
+
+
+class SpoolResult(NamedTuple):
+    """The result of a delivery attempt of the spooled messages.
+
+    Attributes:
+        sent (int): Number of delivered messages.
+        failures (list[tuple[str, str]]): Recipient and error of each message whose delivery
+            failed in this attempt. They stay in the spool.
+        pending (int): Number of messages left in the spool, including those not due yet.
+    """
+
+    sent: int
+    failures: list[tuple[str, str]]
+    pending: int
+
+
+def _retry_delay(attempts: int) -> float:
+    """Return the seconds to wait after the given number of failed attempts."""
+    if not attempts:
+        return 0
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+class MailSpool:
+    """A Maildir-like directory of rendered emails, delivered in bulk with retries.
+
+    `send_email` has the same signature as `Mail.send_email`, but only renders the email and
+    writes it to the spool, so it never waits for the mail server. Messages are written to `tmp/`
+    and moved to `new/` once complete, so a crash never leaves a partial message to be delivered.
+
+    `flush` delivers all due messages over one connection. A message that fails is kept and
+    retried by a later flush, after a delay that doubles with every failed attempt. The number of
+    attempts is the last part of the file name, and the time of the last one its mtime.
+
+    Every delivery is recorded as an empty file in `sent/`, with the time of delivery as mtime.
+    With rate limits, `flush` counts the deliveries within each limit's period, also those of
+    earlier runs, and only sends as many messages as all limits still allow. The others stay in
+    the spool for a later flush, so a flush never waits for the limits.
+
+    Attributes:
+        directory (Path): The spool directory.
+        sent (int): Number of messages delivered by `close`.
+        failures (list[tuple[str, str]]): Recipient and error of each message that `close` could
+            not deliver.
+    """
+
+    def __init__(self, directory: str | Path, mail: Mail) -> None:
+        """Create the spool directories if needed.
+
+        Args:
+            directory (str | Path): The spool directory.
+            mail (Mail): The configured mail client, used to render and deliver the messages.
+        """
+        self.directory = Path(directory)
+        self.mail = mail
+        self.sent: int = 0
+        self.failures: list[tuple[str, str]] = []
+        for subdir in ("tmp", "new", "sent"):
+            (self.directory / subdir).mkdir(parents=True, exist_ok=True)
+
+    def __len__(self) -> int:
+        """Return the number of spooled messages."""
+        return sum(1 for _ in os.scandir(self.directory / "new"))
+
+    def add(self, content: str) -> Path:
+        """Write a serialised message to the spool.
+
+        Args:
+            content (str): The complete message, including its headers.
+
+        Returns:
+            Path: The path of the spooled message.
+        """
+        name = f"{time.time_ns()}.{os.getpid()}_{next(_counter)}.0"
+        tmp_path = self.directory / "tmp" / name
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        new_path = self.directory / "new" / name
+        tmp_path.replace(new_path)
+        return new_path
+
+    def send_email(
+        self, message: str, recipient: str, template_file: str = "", **template_vars: str | int
+    ) -> None:
+        """Render an email and write it to the spool for delivery by `flush`.
+
+        An email that cannot be rendered is recorded in `failures`, like one that cannot be
+        delivered, so that it does not end the sync.
+        """
+        try:
+            msg = self.mail.build_email(
+                message=message, recipient=recipient, template_file=template_file, **template_vars
+            )
+        except Exception as exc:  # noqa: BLE001
+            logging.warning("Failed to render email to %s: %r", recipient, exc)
+            self.failures.append((recipient, repr(exc)))
+            return
+        path = self.add(msg.as_string())
+        logging.info("Email to %s spooled as %s", recipient, path.name)
+
+    def _remove_stale_tmp_files(self, now: float) -> None:
+        """Remove incomplete messages left behind by a crash."""
+        for entry in os.scandir(self.directory / "tmp"):
+            if entry.stat().st_mtime < now - TMP_MAX_AGE:
+                logging.info("Removing incomplete spooled message %s", entry.name)
+                Path(entry.path).unlink(missing_ok=True)
+
+    def _record_delivery(self, path: Path, now: float) -> None:
+        """Replace a delivered message by an empty file in sent/, to count it for rate limits."""
+        sent_path = self.directory / "sent" / path.name
+        sent_path.touch()
+        os.utime(sent_path, (now, now))
+        path.unlink()
+
+    def _delivery_budget(self, now: float) -> int | None:
+        """Return how many messages the rate limits allow now, or None if there are no limits.
+
+        Records of deliveries older than all limit periods are removed.
+        """
+        limits = self.mail.rate_limiter.limits if self.mail.rate_limiter is not None else []
+        max_age = max([SENT_MIN_AGE, *(period for _, period in limits)])
+        delivered: list[float] = []
+        for entry in os.scandir(self.directory / "sent"):
+            if (mtime := entry.stat().st_mtime) < now - max_age:
+                Path(entry.path).unlink(missing_ok=True)
+            else:
+                delivered.append(mtime)
+        if not limits:
+            return None
+        return max(
+            0,
+            min(count - sum(1 for t in delivered if t > now - period) for count, period in limits),
+        )
+
+    def _defer(self, path: Path, attempts: int) -> None:
+        """Record a failed delivery attempt in the name and mtime of a message."""
+        name = f"{path.name.rpartition('.')[0]}.{attempts + 1}"
+        deferred = path.with_name(name)
+        path.replace(deferred)
+        os.utime(deferred)
+
+    def flush(self, now: float | None = None) -> SpoolResult:
+        """Deliver all due messages that the rate limits allow, in the order they were spooled.
+
+        If the mail server cannot be reached at all, the flush stops after the first failure,
+        without counting an attempt for the remaining messages.
+
+        Args:
+            now (float, optional): The current time, for tests. Defaults to the system time.
+
+        Returns:
+            SpoolResult: The delivered and failed messages, and the messages left.
+        """
+        now = time.time() if now is None else now
+        self._remove_stale_tmp_files(now)
+        sent = 0
+        failures: list[tuple[str, str]] = []
+        due: list[tuple[Path, int]] = []
+        for entry in sorted(os.scandir(self.directory / "new"), key=lambda e: e.name):
+            attempts = int(entry.name.rpartition(".")[2] or 0)
+            if entry.stat().st_mtime + _retry_delay(attempts) <= now:
+                due.append((Path(entry.path), attempts))
+        if (budget := self._delivery_budget(now)) is not None and len(due) > budget:
+            logging.info(
+                "Rate limit: sending %d of %d due emails, the others are left for a later flush",
+                budget,
+                len(due),
+            )
+            due = due[:budget]
+        # The budget already respects the limits, so the limiter shall not wait on top
+        mail = self.mail.copy()
+        mail.rate_limiter = None
+
+        try:
+            for path, attempts in due:
+                recipient = ""
+                try:
+                    content = path.read_text(encoding="utf-8")
+                    recipient = HeaderParser().parsestr(content, headersonly=True)["To"] or ""
+                    mail.send_message(recipient, content)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as exc:
+                    # Rejected message, try the next one
+                    logging.warning("Failed to send spooled email to %s: %s", recipient, exc)
+                    failures.append((recipient, str(exc)))
+                    self._defer(path, attempts)
+                except OSError as exc:
+                    # Mail server unavailable, includes all other SMTP errors
+                    logging.warning("Failed to send spooled email to %s: %s", recipient, exc)
+                    failures.append((recipient, str(exc)))
+                    self._defer(path, attempts)
+                    break
+                except Exception as exc:  # noqa: BLE001
+                    # Any other error concerns only this message, e.g. a non-ASCII address, so
+                    # it must neither end the flush nor block the messages after it
+                    logging.warning("Failed to send spooled email to %s: %r", recipient, exc)
+                    failures.append((recipient, repr(exc)))
+                    self._defer(path, attempts)
+                else:
+                    self._record_delivery(path, now)
+                    sent += 1
+        finally:
+            mail.close()
+
+        return SpoolResult(sent=sent, failures=failures, pending=len(self))
+
+    def close(self) -> None:
+        """Deliver all due messages, and record the result in `sent` and `failures`."""
+        result = self.flush()
+        self.sent += result.sent
+        self.failures.extend(result.failures)
@@ -0,0 +1,92 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Record the state of the last applied sync, so unchanged runs can be skipped."""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+
+from ._artifact import hash_source_files, is_inventory_artifact
+from ._fileio import write_text_atomic
+
+STATE_VERSION = 2
+
+
+def hash_local_state(config: str, users: str, exclude: tuple[str, ...] | list[str] = ()) -> str:
+    """Return a hash of the app config and all user inventory files.
+
+    Only the file contents are hashed, the files are not parsed. A compiled inventory is hashed
+    as a whole.
+
+    Args:
+        config (str): Path to the application configuration YAML file.
+        users (str): Path to the user inventory file or directory, or a compiled inventory.
+        exclude (tuple[str, ...] | list[str], optional): Glob patterns of inventory files or
+            directories to skip.
+
+    Returns:
+        str: The SHA-256 hash of the local state.
+    """
+    users_path = Path(users)
+    if is_inventory_artifact(users_path):
+        inventory = {users_path.name: hashlib.sha256(users_path.read_bytes()).hexdigest()}
+    else:
+        inventory = hash_source_files(users_path, exclude=exclude)
+    data = {
+        "config": hashlib.sha256(Path(config).read_bytes()).hexdigest(),
+        "exclude": sorted(exclude),
+        "inventory": inventory,
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def read_sync_state(state_file: str | Path) -> dict | None:
+    """Read the state recorded by the last applied sync.
+
+    Args:
+        state_file (str | Path): Path of the state file.
+
+    Returns:
+        dict | None: The recorded `local` hash and `remote` fingerprint, or None if no usable
+        state has been recorded yet.
+    """
+    try:
+        stored = json.loads(Path(state_file).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        logging.debug("No sync state recorded in %s yet", state_file)
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning("Cannot read sync state file %s, ignoring it: %s", state_file, e)
+        return None
+    if not isinstance(stored, dict) or stored.get("version") != STATE_VERSION:
+        logging.info("Sync state file %s is outdated, ignoring it", state_file)
+        return None
+    return stored
+
+
+def is_unchanged(stored: dict, local: str, remote: dict) -> bool:
+    """Check whether the local and remote state match the recorded state of the last sync."""
+    return (stored.get("local"), stored.get("remote")) == (local, remote)
+
+
+def write_sync_state(state_file: str | Path, local: str, remote: dict) -> None:
+    """Record the state after a successfully applied sync, atomically.
+
+    Args:
+        state_file (str | Path): Path of the state file.
+        local (str): The hash of the app config and user inventory, see `hash_local_state`.
+        remote (dict): The fingerprint of the Authentik instance after the sync, see
+            `AuthentikAPI.get_state_fingerprint`.
+    """
+    data = {
+        "version": STATE_VERSION,
+        "synced_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "local": local,
+        "remote": remote,
+    }
+    write_text_atomic(Path(state_file), json.dumps(data, indent=2) + "\n")
+    logging.debug("Recorded sync state in %s", state_file)
@@ -0,0 +1,245 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Record trace spans of a run and write them as OpenTelemetry JSON, without dependencies."""
+
+import json
+import random
+import threading
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from pathlib import Path
+
+from ._fileio import write_text_atomic
+
+# Span kinds and status codes of the OpenTelemetry protocol
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_CODE_ERROR = 2
+
+SERVICE_NAME = "auth-user-mgr"
+
+# Types of span attribute values, int included
+AttributeValue = str | float | bool
+
+
+def _otlp_value(value: AttributeValue) -> dict:
+    """Return an attribute value in the typed form of OTLP JSON."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64-bit integers are strings in OTLP JSON
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:  # pylint: disable=too-many-instance-attributes
+    """One timed operation, e.g. a phase, the sync of one user or one API request.
+
+    Used as a context manager, the span starts on entering and is recorded by its tracer on
+    exit, marked as failed if the enclosed code raised.
+
+    Attributes:
+        name (str): Name of the operation.
+        span_id (str): Random identifier, as 16 hex characters.
+        parent_id (str): Identifier of the enclosing span, or an empty string for the root.
+        kind (int): OpenTelemetry span kind, internal or client.
+        attributes (dict[str, str | int | float | bool]): Details of the operation.
+        start (int): Start time in nanoseconds since the epoch.
+        end (int): End time in nanoseconds since the epoch, 0 while the span is open.
+        error (str): Error message if the operation failed, otherwise an empty string.
+    """
+
+    __slots__ = (
+        "_tracer",
+        "attributes",
+        "end",
+        "error",
+        "kind",
+        "name",
+        "parent_id",
+        "span_id",
+        "start",
+    )
+
+    def __init__(
+        self, tracer: "Tracer", name: str, kind: int, attributes: dict[str, AttributeValue]
+    ) -> None:
+        """Prepare a span of the given tracer, started when entered."""
+        self._tracer = tracer
+        self.name = name
+        # Span IDs only need to be unique within the trace, so no cryptographic randomness
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = ""
+        self.kind = kind
+        self.attributes = attributes
+        self.start = 0
+        self.end = 0
+        self.error = ""
+
+    # typing.Self is only available from Python 3.11 on
+    def __enter__(self) -> "Span":  # noqa: PYI034
+        """Start the span as child of the innermost open span."""
+        self.parent_id = self._tracer._open(self)  # noqa: SLF001
+        self.start = time.time_ns()
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, _tb: object
+    ) -> None:
+        """End the span, and record an error if the enclosed code raised."""
+        self.end = time.time_ns()
+        if exc is not None and not self.error:
+            self.error = f"{type(exc).__name__}: {exc}"
+        self._tracer._close(self)  # noqa: SLF001
+
+    def set(self, key: str, value: AttributeValue) -> None:
+        """Set an attribute, e.g. a result only known at the end of the operation."""
+        self.attributes[key] = value
+
+    def to_otlp(self, trace_id: str) -> dict:
+        """Return the span in OTLP JSON format."""
+        span = {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()
+            ],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": STATUS_CODE_ERROR, "message": self.error}
+        return span
+
+
+class _DisabledSpan:
+    """A span of a disabled tracer, which ignores everything."""
+
+    error = ""
+
+    def __enter__(self) -> "_DisabledSpan":  # noqa: PYI034
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        pass
+
+    def set(self, key: str, value: AttributeValue) -> None:
+        """Ignore the attribute."""
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+class Tracer:
+    """Record nested spans of one run, all belonging to one trace.
+
+    Spans opened within another span on the same thread become its children. Spans of other
+    threads, e.g. concurrent API requests or mail workers, become children of the outermost span
+    open on the thread that created the tracer.
+
+    A disabled tracer records nothing, and its spans cost next to nothing, so that code can always
+    open spans. Code run per API request or email checks `enabled` first, so that it does not even
+    build the name and attributes of a span that is thrown away.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        """Create a tracer for a new trace.
+
+        Args:
+            enabled (bool, optional): If False, spans are not recorded. Defaults to True.
+        """
+        self.enabled = enabled
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._local.stack = self._main_stack = []
+
+    def _stack(self) -> list[Span]:
+        """Return the open spans of the current thread, innermost last."""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _open(self, span: Span) -> str:
+        """Push a span onto the stack of the current thread, and return the ID of its parent."""
+        stack = self._stack()
+        # Slice, as the thread of the tracer may close its outermost span meanwhile
+        parents = stack[-1:] or self._main_stack[:1]
+        stack.append(span)
+        return parents[0].span_id if parents else ""
+
+    def _close(self, span: Span) -> None:
+        """Pop a span from the stack of the current thread, and record it."""
+        self._stack().pop()
+        with self._lock:
+            self.spans.append(span)
+
+    def span(
+        self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: AttributeValue
+    ) -> Span | _DisabledSpan:
+        """Return a span to record the enclosed code with, when used as context manager.
+
+        Args:
+            name (str): Name of the operation.
+            kind (int, optional): OpenTelemetry span kind. Defaults to internal.
+            **attributes (str | int | float | bool): Details of the operation.
+
+        Returns:
+            Span: The span, to set more attributes or an error.
+        """
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return Span(self, name, kind=kind, attributes=attributes)
+
+    def to_otlp(self) -> dict:
+        """Return all finished spans in the OTLP JSON format of a trace export."""
+        with self._lock:
+            spans = [span.to_otlp(self.trace_id) for span in self.spans]
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [{"key": "service.name", "value": _otlp_value(SERVICE_NAME)}]
+                    },
+                    "scopeSpans": [{"scope": {"name": "auth_user_mgr"}, "spans": spans}],
+                }
+            ]
+        }
+
+    def write(self, path: str | Path) -> None:
+        """Write all finished spans to a file in OTLP JSON format."""
+        write_text_atomic(Path(path), json.dumps(self.to_otlp()) + "\n")
+
+
+@contextmanager
+def trace_to(path: str, name: str) -> Generator[Tracer, None, None]:
+    """Trace the enclosed code as a root span `name`, if a path is given, and write the spans.
+
+    Without a path, the yielded tracer is disabled, and nothing is written.
+
+    Args:
+        path (str): Path of the trace file, or an empty string to not trace.
+        name (str): Name of the root span, e.g. the command.
+
+    Yields:
+        Tracer: The tracer to record the spans of the run with.
+    """
+    tracer = Tracer(enabled=bool(path))
+    try:
+        with tracer.span(name):
+            yield tracer
+    finally:
+        if path:
+            tracer.write(path)
+            print(f"Trace with {len(tracer.spans)} spans written to {path}")
@@ -4,8 +4,82 @@
 
 """Classes and functions for users and groups."""
 
+import re
+import sys
+from array import array
+from collections.abc import Iterable
+from functools import lru_cache
+from typing import NamedTuple
+
 from slugify import PRE_TRANSLATIONS, slugify
 
+# Names consisting only of these characters pass slugify's transliteration, unicode
+# normalisation, entity, quote and number handling unchanged. For them, the slugs can be built
+# with the remaining plain string operations.
+_SIMPLE_NAME_PATTERN = re.compile(r"[A-Za-z0-9 .-]*")
+
+USERNAME_MAX_LENGTH = 150
+INVITE_SLUG_MAX_LENGTH = 50
+
+
+def _slugify_username(name: str) -> str:
+    """Convert a name to a username with slugify, see `User.user_name_to_username`."""
+    # Pre-process: replace hyphens (as name combiners) with 'HYPHENHERE' to avoid conflicts with
+    # slugify
+    name_with_hyphens = name.replace("-", "HYPHENHERE")
+    # Use slugify to create a username, replacing spaces and special chars with dots. Keep case
+    # to enable replacement of 'HYPHENHERE' later. Umlaut replacements are applied first.
+    name_sluggified = slugify(
+        name_with_hyphens,
+        separator=".",
+        max_length=USERNAME_MAX_LENGTH,
+        lowercase=False,
+        replacements=PRE_TRANSLATIONS,
+    )
+    # Post-process: replace 'HYPHENHERE' back to hyphens, and convert to lowercase
+    return name_sluggified.replace("HYPHENHERE", "-").lower()
+
+
+def _slugify_invite_slug(name: str) -> str:
+    """Convert a name to an invitation slug with slugify."""
+    return slugify("invite-" + name, separator="-", max_length=INVITE_SLUG_MAX_LENGTH)
+
+
+def _join_words(text: str, max_length: int) -> str:
+    """Join the words of a text with dashes and truncate it, as slugify does for simple names.
+
+    Dots and dashes count as word separators, like any character slugify does not allow.
+    """
+    joined = "-".join(text.replace("-", " ").replace(".", " ").split())
+    if len(joined) >= max_length:
+        joined = joined[:max_length].strip("-")
+    return joined
+
+
+@lru_cache(maxsize=65536)
+def name_to_username(name: str) -> str:
+    """Convert a name to a username, see `User.user_name_to_username`.
+
+    Results are cached, and names of plain ASCII letters, digits, spaces, dots and hyphens skip
+    slugify, with the same result.
+    """
+    if not _SIMPLE_NAME_PATTERN.fullmatch(name):
+        return _slugify_username(name)
+    words = _join_words(name.replace("-", "HYPHENHERE"), USERNAME_MAX_LENGTH)
+    return words.replace("-", ".").replace("HYPHENHERE", "-").lower()
+
+
+@lru_cache(maxsize=65536)
+def name_to_invite_slug(name: str) -> str:
+    """Convert a name to an invitation slug, see `User.user_name_to_invite_slug`.
+
+    Results are cached, and names of plain ASCII letters, digits, spaces, dots and hyphens skip
+    slugify, with the same result.
+    """
+    if not _SIMPLE_NAME_PATTERN.fullmatch(name):
+        return _slugify_invite_slug(name)
+    return _join_words("invite-" + name.lower(), INVITE_SLUG_MAX_LENGTH)
+
 
 class User:
     """Class for configured user.
@@ -20,6 +94,17 @@ class User:
         invite_slug (str): The invitation slug generated from the user's name.
     """
 
+    # No per-instance __dict__, as a sync creates one instance per configured user
+    __slots__ = (
+        "configured_groups",
+        "current_groups",
+        "email",
+        "id",
+        "invite_slug",
+        "name",
+        "username",
+    )
+
     def __init__(
         self, name: str, email: str, configured_groups: list[str], username: str = ""
     ) -> None:
@@ -57,20 +142,7 @@ class User:
             - "John-William Doe-Testerson" becomes "john-william.doe-testerson"
             - "Ärgölü Baß" becomes "aergoelue.bass"
         """
-        # Pre-process: replace hyphens (as name combiners) with 'HYPHENHERE' to avoid conflicts with
-        # slugify
-        name_with_hyphens = self.name.replace("-", "HYPHENHERE")
-        # Use slugify to create a username, replacing spaces and special chars with dots. Keep case
-        # to enable replacement of 'HYPHENHERE' later. Umlaut replacements are applied first.
-        name_sluggified = slugify(
-            name_with_hyphens,
-            separator=".",
-            max_length=150,
-            lowercase=False,
-            replacements=PRE_TRANSLATIONS,
-        )
-        # Post-process: replace 'HYPHENHERE' back to hyphens, and convert to lowercase
-        return name_sluggified.replace("HYPHENHERE", "-").lower()
+        return name_to_username(self.name)
 
     def user_name_to_invite_slug(self) -> str:
         """Convert user name to an invitation slug.
@@ -78,4 +150,84 @@ class User:
         Returns:
             str: The invitation slug created by converting the user's name.
         """
-        return slugify("invite-" + self.name, separator="-", max_length=50)
+        return name_to_invite_slug(self.name)
+
+
+class RemoteUser(NamedTuple):
+    """The fields of an Authentik user that a sync needs, instead of the full API response.
+
+    Attributes:
+        pk (int): The user's ID in Authentik.
+        email (str): The user's email address.
+        username (str): The user's username.
+        type (str): The user type, e.g. "internal" or "service_account".
+    """
+
+    pk: int
+    email: str
+    username: str = ""
+    type: str = ""
+
+    @classmethod
+    def from_api(cls, user_dict: dict) -> "RemoteUser":
+        """Create a remote user from a user dictionary returned by the Authentik API."""
+        return cls(
+            pk=user_dict.get("pk", 0),
+            email=user_dict.get("email") or "",
+            username=user_dict.get("username", ""),
+            type=sys.intern(user_dict.get("type", "")),
+        )
+
+
+class GroupMemberships:
+    """The current group memberships of Authentik users.
+
+    Every group name is interned and stored once, together with an array of the IDs of the
+    group's members. This takes a fraction of the memory of a list of group names per user. The
+    groups of a single user are looked up through an index by user ID, built on first use.
+
+    Attributes:
+        names (list[str]): The names of all groups added so far.
+        members (list[array]): The member IDs of each group, in the order of `names`.
+    """
+
+    __slots__ = ("_groups_of_user", "_name_index", "members", "names")
+
+    def __init__(self) -> None:
+        self.names: list[str] = []
+        self.members: list[array] = []
+        self._name_index: dict[str, int] = {}
+        self._groups_of_user: dict[int, list[int]] | None = None
+
+    def _index_of(self, group_name: str) -> int:
+        """Return the index of a group name, adding the name if it is new."""
+        index = self._name_index.get(group_name)
+        if index is None:
+            index = len(self.names)
+            self.names.append(sys.intern(group_name))
+            self.members.append(array("q"))
+            self._name_index[group_name] = index
+        return index
+
+    def add_group(self, group_name: str, user_ids: Iterable[int]) -> None:
+        """Add a group and the IDs of its members."""
+        self.members[self._index_of(group_name)].extend(user_ids)
+        self._groups_of_user = None
+
+    def add_user(self, user_id: int, group_names: Iterable[str]) -> None:
+        """Add a user as member of the given groups."""
+        for group_name in group_names:
+            self.members[self._index_of(group_name)].append(user_id)
+        self._groups_of_user = None
+
+    def get(self, user_id: int, default: list[str] | None = None) -> list[str]:
+        """Return the sorted group names of a user, or `default` (an empty list) if unknown."""
+        if self._groups_of_user is None:
+            self._groups_of_user = {}
+            for index, user_ids in enumerate(self.members):
+                for member_id in user_ids:
+                    self._groups_of_user.setdefault(member_id, []).append(index)
+        indices = self._groups_of_user.get(user_id)
+        if indices is None:
+            return [] if default is None else default
+        return sorted(self.names[index] for index in indices)
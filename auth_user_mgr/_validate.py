@@ -0,0 +1,89 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Validate a user inventory offline, without the app config or access to Authentik."""
+
+from typing import NamedTuple
+
+from ._git import get_changed_files
+from ._index import InventoryIndex
+
+
+class ValidationResult(NamedTuple):
+    """Result of an inventory validation.
+
+    Attributes:
+        files (int): Number of inventory files.
+        users (int): Number of user entries in all files.
+        errors (list[str]): All errors found, each prefixed with the file path.
+    """
+
+    files: int
+    users: int
+    errors: list[str]
+
+
+def _find_duplicates(index: InventoryIndex, scope: set[str] | None) -> list[str]:
+    """Report emails and usernames defined more than once in the inventory.
+
+    A duplicate is reported if at least one of its files is in `scope`, or always if `scope` is
+    None.
+    """
+    errors: list[str] = []
+    for column, label in ((0, "email"), (1, "username")):
+        first_seen: dict[str, tuple[str, int]] = {}
+        for rel_path, file_info in index.files.items():
+            for position, entry in enumerate(file_info["entries"], start=1):
+                if not (value := entry[column]):
+                    continue
+                if (first := first_seen.get(value)) is None:
+                    first_seen[value] = (rel_path, position)
+                    continue
+                if scope is None or rel_path in scope or first[0] in scope:
+                    errors.append(
+                        f"{index.base / rel_path}: entry {position}: duplicate {label} '{value}', "
+                        f"already defined in {index.base / first[0]} (entry {first[1]})"
+                    )
+    return errors
+
+
+def validate_inventory(
+    file_or_dir: str,
+    exclude: tuple[str, ...] | list[str] = (),
+    changed: bool = False,
+    since: str = "",
+    use_index: bool = False,
+) -> ValidationResult:
+    """Validate a user inventory file or directory, reporting all errors at once.
+
+    The inventory is discovered and parsed like for a sync, every user entry is validated against
+    the schema, and duplicate emails and usernames across all files are detected. With
+    `use_index`, parsing and schema validation results are cached per file in the persistent
+    inventory index, so only new and changed files are parsed again.
+
+    Args:
+        file_or_dir (str): Path to the user inventory file or directory.
+        exclude (tuple[str, ...] | list[str], optional): Glob patterns of inventory files or
+            directories to skip.
+        changed (bool, optional): If True, only report errors in files changed in the git
+            working tree, and duplicates involving them.
+        since (str, optional): Like `changed`, but for files changed since this git revision.
+        use_index (bool, optional): If True, use and update the persistent inventory index next
+            to the inventory. Otherwise, nothing is written.
+
+    Returns:
+        ValidationResult: The number of files and users, and all errors found.
+    """
+    index = InventoryIndex.open(file_or_dir, exclude=exclude, persist=use_index)
+    scope = get_changed_files(index.base, since=since) if changed or since else None
+
+    errors = [
+        f"{index.base / rel_path}: {error}"
+        for rel_path, file_info in index.files.items()
+        if scope is None or rel_path in scope
+        for error in file_info["errors"]
+    ]
+    errors.extend(_find_duplicates(index, scope))
+    users = sum(len(file_info["entries"]) for file_info in index.files.values())
+    return ValidationResult(files=len(index.files), users=users, errors=errors)
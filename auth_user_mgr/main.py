@@ -12,20 +12,34 @@ group membership synchronization, and provides a command-line interface for oper
 import argparse
 import logging
 import os
+import sys
+from collections.abc import Iterable
 from pathlib import Path
 
 from . import __version__
 from ._api import AuthentikAPI
+from ._artifact import compile_inventory, is_inventory_artifact, load_inventory_artifact
 from ._config import (
-    append_user_to_yaml_file,
-    get_yaml_file_paths,
-    parse_csv_users,
-    read_app_and_users_config,
-    update_user_groups_in_yaml_files,
+    CsvUserReader,
+    YamlUserIndex,
+    get_inventory_file_paths,
+    is_json_inventory_file,
+    read_app_config,
+    read_users_config,
 )
-from ._email import Mail
-from ._helpers import compare_two_lists
-from ._user import User
+from ._diff import MembershipChanges, diff_user_memberships
+from ._email import Mail, MailQueue
+from ._incremental import diff_inventory_since
+from ._index import InventoryIndex
+from ._logging import LOG_DATE_FORMAT, LOG_FORMAT, setup_handlers
+from ._metrics import write_metrics_file
+from ._profile import PhaseTimer, profile_to
+from ._prometheus import PrometheusTextfile
+from ._spool import MailSpool, SpoolResult
+from ._state import hash_local_state, is_unchanged, read_sync_state, write_sync_state
+from ._trace import Tracer, trace_to
+from ._user import GroupMemberships, RemoteUser, User
+from ._validate import validate_inventory
 
 # Main parser with root-level flags
 parser = argparse.ArgumentParser(description=__doc__)
@@ -38,6 +52,19 @@ subparsers = parser.add_subparsers(dest="command", help="Available commands", re
 common_flags = argparse.ArgumentParser(add_help=False)  # No automatic help to avoid duplication
 common_flags.add_argument("-v", "--verbose", action="store_true", help="Print INFO logging")
 common_flags.add_argument("-vv", "--debug", action="store_true", help="Print DEBUG logging")
+common_flags.add_argument("--log-json", action="store_true", help="Print the log as JSON lines")
+common_flags.add_argument(
+    "--log-queue",
+    action="store_true",
+    help="Write the log in a background thread, so that a slow log output does not slow down",
+)
+common_flags.add_argument(
+    "--log-max-length",
+    metavar="CHARS",
+    type=int,
+    default=0,
+    help="Shorten values in log messages, e.g. API payloads, to this number of characters",
+)
 
 # SYNC commands
 parser_sync = subparsers.add_parser(
@@ -45,7 +72,10 @@ parser_sync = subparsers.add_parser(
 )
 parser_sync.add_argument("-c", "--config", help="Path to app config file", required=True)
 parser_sync.add_argument(
-    "-u", "--users", help="Path to user inventory file or directory", required=True
+    "-u",
+    "--users",
+    help="Path to user inventory file or directory, or an inventory compiled with 'compile'",
+    required=True,
 )
 parser_sync.add_argument(
     "--dry",
@@ -53,6 +83,146 @@ parser_sync.add_argument(
     help="Run a dry sync which does not make any productive changes and does not send emails",
 )
 parser_sync.add_argument("--no-email", action="store_true", help="Do not send any emails")
+parser_sync.add_argument(
+    "--since",
+    metavar="REV",
+    default="",
+    help=(
+        "Incremental sync: only handle users added, changed or removed in the inventory since "
+        "this git revision. Run a full sync regularly as a safety net"
+    ),
+)
+parser_sync.add_argument(
+    "--exclude",
+    action="append",
+    default=[],
+    metavar="PATTERN",
+    help="Glob pattern of files or directories in the user inventory to skip. Can be repeated",
+)
+parser_sync.add_argument(
+    "--state-file",
+    metavar="FILE",
+    default="",
+    help=(
+        "Record the state of each applied sync in this file, and skip the next sync if neither "
+        "the inventory nor Authentik changed since"
+    ),
+)
+parser_sync.add_argument(
+    "--force",
+    action="store_true",
+    help="Run a full sync even if --state-file reports no changes, and record the new state",
+)
+parser_sync.add_argument(
+    "--mail-spool",
+    metavar="DIR",
+    default="",
+    help=(
+        "Write emails to this spool directory and deliver them after syncing. Emails which "
+        "cannot be delivered stay there for a later sync or 'flush-mail'"
+    ),
+)
+parser_sync.add_argument(
+    "--metrics-file",
+    metavar="FILE",
+    default="",
+    help="Write the API request numbers per endpoint and the phase timings to this JSON file",
+)
+parser_sync.add_argument(
+    "--prometheus-file",
+    metavar="FILE",
+    default="",
+    help=(
+        "Write the numbers of the run and the time of its success to this Prometheus textfile, "
+        "e.g. for the textfile collector of the node exporter"
+    ),
+)
+parser_sync.add_argument(
+    "--trace-file",
+    metavar="FILE",
+    default="",
+    help=(
+        "Write a trace with spans of each phase, user, API request and email to this file, as "
+        "OpenTelemetry JSON"
+    ),
+)
+parser_sync.add_argument(
+    "--profile",
+    metavar="FILE",
+    default="",
+    help=(
+        "Profile the command: write cProfile statistics to FILE and sampled stacks for flame "
+        "graphs to FILE.collapsed"
+    ),
+)
+
+# FLUSH-MAIL command
+parser_flush_mail = subparsers.add_parser(
+    "flush-mail",
+    parents=[common_flags],
+    help="Deliver the emails left in a mail spool by 'sync --mail-spool'",
+)
+parser_flush_mail.add_argument("-c", "--config", help="Path to app config file", required=True)
+parser_flush_mail.add_argument(
+    "--spool", metavar="DIR", help="Path to the mail spool directory", required=True
+)
+
+# COMPILE command
+parser_compile = subparsers.add_parser(
+    "compile",
+    parents=[common_flags],
+    help="Compile the user inventory into a single validated file that 'sync -u' loads quickly",
+)
+parser_compile.add_argument(
+    "-u", "--users", help="Path to user inventory file or directory", required=True
+)
+parser_compile.add_argument(
+    "-o", "--output", help="Path to the compiled inventory file to write", required=True
+)
+parser_compile.add_argument(
+    "--exclude",
+    action="append",
+    default=[],
+    metavar="PATTERN",
+    help="Glob pattern of files or directories in the user inventory to skip. Can be repeated",
+)
+
+# VALIDATE command
+parser_validate = subparsers.add_parser(
+    "validate",
+    parents=[common_flags],
+    help="Validate the user inventory offline, e.g. in a pre-commit hook",
+)
+parser_validate.add_argument(
+    "-u", "--users", help="Path to user inventory file or directory", required=True
+)
+parser_validate.add_argument(
+    "--exclude",
+    action="append",
+    default=[],
+    metavar="PATTERN",
+    help="Glob pattern of files or directories in the user inventory to skip. Can be repeated",
+)
+parser_validate_scope = parser_validate.add_mutually_exclusive_group()
+parser_validate_scope.add_argument(
+    "--changed",
+    action="store_true",
+    help="Only report errors in files changed in the git working tree, and duplicates with them",
+)
+parser_validate_scope.add_argument(
+    "--since",
+    metavar="REV",
+    default="",
+    help="Only report errors in files changed since this git revision, and duplicates with them",
+)
+parser_validate.add_argument(
+    "--index",
+    action="store_true",
+    help=(
+        "Use and maintain a persistent index of the user inventory next to it, so only new and "
+        "changed files are parsed"
+    ),
+)
 
 # IMPORT command
 parser_import = subparsers.add_parser(
@@ -77,9 +247,82 @@ parser_import.add_argument(
     action="store_true",
     help="Dry run: show what would be changed without writing files",
 )
+parser_import.add_argument(
+    "--exclude",
+    action="append",
+    default=[],
+    metavar="PATTERN",
+    help="Glob pattern of files or directories in the user inventory to skip. Can be repeated",
+)
+parser_import.add_argument(
+    "--stream",
+    action="store_true",
+    help=(
+        "Process the CSV file in chunks while reading it, and append new users after each chunk, "
+        "for very large files. Invalid rows are reported with their line number and skipped"
+    ),
+)
+parser_import.add_argument(
+    "--index",
+    action="store_true",
+    help=(
+        "Use and maintain a persistent index of the user inventory next to it, so only the files "
+        "of users in the CSV file are parsed"
+    ),
+)
+parser_import.add_argument(
+    "--prometheus-file",
+    metavar="FILE",
+    default="",
+    help=(
+        "Write the numbers of the run and the time of its success to this Prometheus textfile, "
+        "e.g. for the textfile collector of the node exporter"
+    ),
+)
+parser_import.add_argument(
+    "--profile",
+    metavar="FILE",
+    default="",
+    help=(
+        "Profile the command: write cProfile statistics to FILE and sampled stacks for flame "
+        "graphs to FILE.collapsed"
+    ),
+)
+
+# LOOKUP command
+parser_lookup = subparsers.add_parser(
+    "lookup",
+    parents=[common_flags],
+    help="Find the inventory file of users by email or username",
+)
+parser_lookup.add_argument(
+    "-u", "--users", help="Path to user inventory file or directory", required=True
+)
+parser_lookup.add_argument("key", nargs="+", help="Email address or username to look up")
+parser_lookup.add_argument(
+    "--index",
+    action="store_true",
+    help=(
+        "Use and maintain a persistent index of the user inventory next to it, so only new and "
+        "changed files are parsed"
+    ),
+)
+parser_lookup.add_argument(
+    "--exclude",
+    action="append",
+    default=[],
+    metavar="PATTERN",
+    help="Glob pattern of files or directories in the user inventory to skip. Can be repeated",
+)
 
 
-def configure_logger(verbose: bool = False, debug: bool = False) -> logging.Logger:
+def configure_logger(
+    verbose: bool = False,
+    debug: bool = False,
+    json_lines: bool = False,
+    queued: bool = False,
+    max_arg_length: int = 0,
+) -> logging.Logger:
     """
     Configure and return a logger with appropriate settings. If verbose or debug is False (default),
     logging level is WARNING.
@@ -87,15 +330,19 @@ def configure_logger(verbose: bool = False, debug: bool = False) -> logging.Logg
     Args:
         verbose (bool, optional): If True, sets log level to INFO. Defaults to False.
         debug (bool, optional): If True, sets log level to DEBUG. Defaults to False.
+        json_lines (bool, optional): If True, log each record as a line of JSON.
+        queued (bool, optional): If True, write the log in a background thread.
+        max_arg_length (int, optional): If positive, shorten longer log arguments, e.g. API
+            payloads, to this number of characters.
 
     Returns:
         logging.Logger: Configured logger instance.
     """
     log = logging.getLogger()
-    logging.basicConfig(
-        format="[%(asctime)s] %(levelname)s: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+    if json_lines or queued or max_arg_length > 0:
+        setup_handlers(json_lines=json_lines, queued=queued, max_arg_length=max_arg_length)
+    else:
+        logging.basicConfig(format=LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
     if debug:
         log.setLevel(logging.DEBUG)
     elif verbose:
@@ -108,39 +355,32 @@ def configure_logger(verbose: bool = False, debug: bool = False) -> logging.Logg
 
 def get_groups_of_users(
     api: AuthentikAPI,
-) -> tuple[dict[int, list[str]], dict[str, str]]:
-    """Build a mapping of user IDs to their current group memberships and a group name-to-UUID
-    cache.
+) -> tuple[GroupMemberships, dict[str, str]]:
+    """Build the current group memberships of all users and a group name-to-UUID cache.
+
+    Groups are requested page by page, so only one page of full group objects is held in
+    memory at a time.
 
     Args:
         api (AuthentikAPI): Authentik API client instance.
 
     Returns:
         tuple: A tuple containing:
-            - dict[int, list[str]]: A dictionary mapping user IDs to sorted lists of group names
-                that the user belongs to.
+            - GroupMemberships: The group memberships by user ID. `get` returns the sorted list
+                of group names that a user belongs to.
             - dict[str, str]: A dictionary mapping group names to their UUIDs.
     """
-    users_groups_mapping: dict[int, list[str]] = {}
+    users_groups_mapping = GroupMemberships()
     group_name_uuid_cache: dict[str, str] = {}
-    for group_dict in api.list_groups():
+    for group_dict in api.iter_groups():
         group_name = group_dict.get("name", "")
         group_uuid = str(group_dict.get("pk", ""))
         logging.debug("Processing screen of members of group %s", group_name)
         # Cache group name to UUID mapping
         if group_name and group_uuid:
             group_name_uuid_cache[group_name] = group_uuid
-        # Iterate all members of this group
-        for user_id in group_dict.get("users", []):
-            # Initialise list of group names if not present, otherwise add to it
-            if user_id not in users_groups_mapping:
-                users_groups_mapping[user_id] = [group_name]
-            else:
-                users_groups_mapping[user_id].append(group_name)
-
-    # Alphabetically sort the list of groups
-    for user_id, groups in users_groups_mapping.items():
-        users_groups_mapping[user_id] = sorted(groups)
+        # Record all members of this group
+        users_groups_mapping.add_group(group_name, group_dict.get("users", []))
 
     return users_groups_mapping, group_name_uuid_cache
 
@@ -151,11 +391,12 @@ class UserSync:
     def __init__(  # noqa: PLR0913
         self,
         api: AuthentikAPI,
-        mail: Mail,
-        all_users_by_email: dict[str, dict],
-        user_group_mapping: dict[int, list[str]],
+        mail: Mail | MailQueue | MailSpool,
+        all_users_by_email: dict[str, RemoteUser],
+        user_group_mapping: GroupMemberships,
         group_name_uuid_cache: dict[str, str],
         delete_unconfigured_users: bool = False,
+        timings: PhaseTimer | None = None,
     ) -> None:
         """Initialize UserSync with API clients, pre-fetched data, and empty stats."""
         self.api = api
@@ -170,7 +411,10 @@ class UserSync:
         self.users_changed: int = 0
         self.users_pending: int = 0
         self.users_deleted: int = 0
+        self.mails_sent: int = 0
+        self.mails_failed: int = 0
         self.detail_messages: list[str] = []
+        self.timings: PhaseTimer = timings or PhaseTimer()
 
     @staticmethod
     def _user_label(email: str, username: str) -> str:
@@ -185,13 +429,18 @@ class UserSync:
             invitation_template (str, optional): Path to a custom invitation template file.
                 Defaults to an empty string in which case the inbuilt template is used.
         """
-        if self.check_user_existence(user=user, invitation_template=invitation_template):
-            if self.check_group_memberships(user=user):
-                self.users_changed += 1
-            else:
-                self.users_unchanged += 1
+        with self.timings.tracer.span("Sync user", email=user.email) as span:
+            exists = self.check_user_existence(user=user, invitation_template=invitation_template)
+            span.set("exists", exists)
+            if not exists:
+                self.users_pending += 1
+                return
+            changed = self.check_group_memberships(user=user)
+            span.set("changed", changed)
+        if changed:
+            self.users_changed += 1
         else:
-            self.users_pending += 1
+            self.users_unchanged += 1
 
     def check_user_existence(self, user: User, invitation_template: str = "") -> bool:
         """Check if a user exists in Authentik and handle invitations accordingly.
@@ -212,7 +461,7 @@ class UserSync:
         # Check if user already exists
         if user_exists:
             # Add user ID
-            user.id = user_exists.get("pk", 0)
+            user.id = user_exists.pk
 
             logging.info("User %s already exists (ID: %s)", user.email, user.id)
 
@@ -256,6 +505,47 @@ class UserSync:
 
         return False
 
+    def create_missing_groups(self, users: list[User], all_groups_known: bool = True) -> None:
+        """Resolve all groups the users are configured for, creating missing ones in one batch.
+
+        This only has an effect if `create_missing_groups` is enabled in the API client. Then, the
+        groups are resolved before reconciling memberships, so that no user has to wait for a group
+        to be looked up or created.
+
+        Args:
+            users (list[User]): User objects to synchronize.
+            all_groups_known (bool, optional): If True, the group name-to-uuid cache contains all
+                groups of Authentik, so groups missing in it are created right away. Otherwise,
+                they are looked up first. Defaults to True.
+        """
+        if not self.api.create_missing_groups:
+            return
+        unknown = {g for user in users for g in user.configured_groups}.difference(
+            self.group_name_uuid_cache
+        )
+        if not unknown:
+            return
+        logging.info("Resolving %s groups not known yet: %s", len(unknown), sorted(unknown))
+        if all_groups_known:
+            self.group_name_uuid_cache.update(self.api.create_groups(unknown))
+        else:
+            self.group_name_uuid_cache.update(self.api.get_group_uuids_by_name(unknown))
+
+    def sync_users(self, users: list[User], invitation_template: str = "") -> None:
+        """Synchronize many users one after the other, see `sync_user`.
+
+        Each user is completely synchronized before the next one, so the detail messages of a
+        user stay together, in the order of `users`.
+
+        Args:
+            users (list[User]): User objects to synchronize.
+            invitation_template (str, optional): Path to a custom invitation template file.
+                Defaults to an empty string in which case the inbuilt template is used.
+        """
+        with self.timings.phase("Sync users"):
+            for user in users:
+                self.sync_user(user=user, invitation_template=invitation_template)
+
     def check_group_memberships(self, user: User) -> bool:
         """Compare and synchronize a user's configured and current group memberships.
 
@@ -268,28 +558,29 @@ class UserSync:
         Returns:
             bool: True if any group membership changes were made, False otherwise.
         """
-        # Compare configured group memberships with current status
         user.current_groups = self.user_group_mapping.get(user.id, [])
+        changes = diff_user_memberships(user.configured_groups, user.current_groups)
+        return self.apply_membership_changes(user, changes)
 
-        # Compare configured and current group memberships
-        delete_from_groups, in_sync, add_to_groups = compare_two_lists(
-            user.configured_groups, user.current_groups
-        )
-        logging.debug(
-            "User %s: %s",
-            user.email,
-            {
-                "delete_from_groups": delete_from_groups,
-                "in_sync": in_sync,
-                "add_to_groups": add_to_groups,
-            },
-        )
+    def apply_membership_changes(self, user: User, changes: MembershipChanges) -> bool:
+        """Add a user to and remove them from groups, in alphabetical order.
+
+        Args:
+            user (User): User object of an existing user, with `id` set.
+            changes (MembershipChanges): The groups to add the user to and remove them from.
 
-        # Track whether any changes were made
-        has_changes = bool(delete_from_groups or add_to_groups)
+        Returns:
+            bool: True if any group membership changes were made, False otherwise.
+        """
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(
+                "User %s: %s",
+                user.email,
+                {"delete_from_groups": changes.remove, "add_to_groups": changes.add},
+            )
 
         # Delete user from groups
-        for group in delete_from_groups:
+        for group in changes.remove:
             if group not in self.group_name_uuid_cache:
                 self.group_name_uuid_cache[group] = self.api.get_group_uuid_by_name(group)
             logging.info("User %s will be removed from group '%s'", user.email, group)
@@ -301,7 +592,7 @@ class UserSync:
             )
 
         # Add user to groups
-        for group in add_to_groups:
+        for group in changes.add:
             if group not in self.group_name_uuid_cache:
                 self.group_name_uuid_cache[group] = self.api.get_group_uuid_by_name(group)
             logging.info("User %s will be added to group '%s'", user.email, group)
@@ -312,7 +603,19 @@ class UserSync:
                 f"{self._user_label(user.email, user.username)}: added to group '{group}'"
             )
 
-        return has_changes
+        return bool(changes.remove or changes.add)
+
+    def report_mail_result(self, sent: int, failures: list[tuple[str, str]]) -> None:
+        """Count the delivered emails, and add those that could not be delivered to the details.
+
+        Args:
+            sent (int): Number of delivered emails.
+            failures (list[tuple[str, str]]): Recipient and error of each failed email.
+        """
+        self.mails_sent += sent
+        self.mails_failed += len(failures)
+        for recipient, error in failures:
+            self.detail_messages.append(f"{recipient}: failed to send email: {error}")
 
     def print_summary(self, total_users: int, dry_run: bool = False) -> None:
         """Print sync summary and detail messages.
@@ -326,12 +629,22 @@ class UserSync:
         print(f"  Changed:   {self.users_changed}")
         print(f"  Pending:   {self.users_pending}")
         print(f"  Deleted:   {self.users_deleted}")
+        if self.mails_failed:
+            print(f"  Failed emails: {self.mails_failed}")
         if dry_run:
             print("\n⚠️ Dry run: no productive changes and no emails sent")
         if self.detail_messages:
             print("\nDetails:")
             for msg in self.detail_messages:
                 print(f"  {msg}")
+        if self.timings.phases:
+            print("\nTimings:")
+            for line in self.timings.format_lines():
+                print(f"  {line}")
+        if len(self.api.metrics):
+            print(f"\nAPI requests: {len(self.api.metrics)}")
+            for line in self.api.metrics.format_table():
+                print(f"  {line}")
 
         self.write_github_step_summary(total_users=total_users, dry_run=dry_run)
 
@@ -355,6 +668,8 @@ class UserSync:
             f"- Pending: {self.users_pending}",
             f"- Deleted: {self.users_deleted}",
         ]
+        if self.mails_failed:
+            summary_lines.append(f"- Failed emails: {self.mails_failed}")
         if dry_run:
             summary_lines.extend(["", "⚠️ Dry run: no productive changes and no emails sent"])
 
@@ -369,6 +684,22 @@ class UserSync:
             summary_lines.extend([f"- {msg}" for msg in self.detail_messages])
             summary_lines.extend(["", "</details>"])
 
+        if self.timings.phases:
+            summary_lines.extend(["", "<details><summary>Timings</summary>", "", "```"])
+            summary_lines.extend(self.timings.format_lines())
+            summary_lines.extend(["```", "", "</details>"])
+        if len(self.api.metrics):
+            summary_lines.extend(
+                [
+                    "",
+                    f"<details><summary>API requests ({len(self.api.metrics)})</summary>",
+                    "",
+                    "```",
+                ]
+            )
+            summary_lines.extend(self.api.metrics.format_table())
+            summary_lines.extend(["```", "", "</details>"])
+
         try:
             with Path(summary_path).open(mode="a", encoding="utf-8") as summary_file:
                 summary_file.write("\n".join(summary_lines) + "\n")
@@ -387,46 +718,140 @@ class UserSync:
         if not self.delete_unconfigured_users:
             return
 
-        for email, user_dict in self.all_users_by_email.items():
+        for email, remote_user in self.all_users_by_email.items():
             if email in configured_emails:
                 continue
             # Only delete internal users, skip service accounts and other types
-            user_type = user_dict.get("type", "")
-            if user_type != "internal":
-                logging.info("Skipping deletion of user %s (type: %s)", email, user_type)
+            if remote_user.type != "internal":
+                logging.info("Skipping deletion of user %s (type: %s)", email, remote_user.type)
                 continue
-            user_id = user_dict.get("pk", 0)
-            username = user_dict.get("username", "")
-            logging.info("Deleting unconfigured user %s (ID: %s)", email, user_id)
-            self.api.delete_user(user_id=user_id)
+            logging.info("Deleting unconfigured user %s (ID: %s)", email, remote_user.pk)
+            self.api.delete_user(user_id=remote_user.pk)
             self.detail_messages.append(
-                f"{self._user_label(email, username)}: deleted (not in user inventory)"
+                f"{self._user_label(email, remote_user.username)}: deleted (not in user inventory)"
             )
             self.users_deleted += 1
 
 
-def run_sync(config: str, users: str, dry: bool, no_email: bool) -> None:
+def read_sync_users(users: str, exclude: list[str] | None = None) -> list[dict]:
+    """Read the user inventory, from YAML files or a compiled inventory.
+
+    Args:
+        users (str): Path to the user inventory YAML file or directory, or a compiled inventory.
+        exclude (list[str], optional): Glob patterns of inventory files or directories to skip.
+            Ignored for a compiled inventory, which uses the patterns it was compiled with.
+
+    Returns:
+        list[dict]: The validated users, sorted by email.
     """
-    Run the synchronization process: read configurations, initialize API and mail clients,
-    fetch current user and group data, and synchronize each user accordingly.
+    if is_inventory_artifact(users):
+        if exclude:
+            logging.warning("Ignoring --exclude for the compiled inventory %s", users)
+        return load_inventory_artifact(users)
+    return read_users_config(users, exclude=exclude or [])
+
+
+def read_sync_config(
+    config: str, users: str, exclude: list[str] | None = None
+) -> tuple[dict, list[dict]]:
+    """Read the app config and the user inventory, from YAML files or a compiled inventory.
 
     Args:
         config (str): Path to the application configuration YAML file.
-        users (str): Path to the user inventory YAML file or directory.
-        dry (bool): If True, run a dry sync without making changes or sending emails.
-        no_email (bool): If True, do not send any emails (overrides dry).
+        users (str): Path to the user inventory YAML file or directory, or a compiled inventory.
+        exclude (list[str], optional): Glob patterns of inventory files or directories to skip.
+            Ignored for a compiled inventory, which uses the patterns it was compiled with.
+
+    Returns:
+        tuple[dict, list[dict]]: The app config and the validated users, sorted by email.
     """
-    cfg_app, cfg_users = read_app_and_users_config(config, users)
+    return read_app_config(config), read_sync_users(users, exclude=exclude)
 
-    # Initiate classes
-    api = AuthentikAPI(
-        url=cfg_app.get("authentik_url", ""),
-        token=cfg_app.get("authentik_token", ""),
-        invitation_flow_slug=cfg_app.get("invitation_flow_slug", ""),
-        create_missing_groups=cfg_app.get("create_missing_groups", False),
-        invitation_expiry_days=cfg_app.get("invitation_expiry_days", 30),
-        dry=dry,
+
+def is_sync_unchanged(api: AuthentikAPI, state_file: str, local_state: str) -> bool:
+    """Check whether nothing changed since the last applied sync, and print a summary if so.
+
+    Args:
+        api (AuthentikAPI): Authentik API client instance.
+        state_file (str): Path of the file recording the state of the last sync.
+        local_state (str): Hash of the current app config and user inventory.
+
+    Returns:
+        bool: True if the local files and the fingerprint of Authentik match the recorded state.
+    """
+    stored_state = read_sync_state(state_file)
+    if stored_state is None or not is_unchanged(
+        stored_state, local_state, api.get_state_fingerprint()
+    ):
+        return False
+    print(
+        "Sync summary: inventory and Authentik unchanged since the last sync at "
+        f"{stored_state.get('synced_at', '')}, nothing to do"
     )
+    return True
+
+
+def record_sync_state(api: AuthentikAPI, state_file: str, local_state: str) -> None:
+    """Record the state reached by a sync, unless any of its API requests failed.
+
+    After failed requests, Authentik is not in the configured state. Recording it anyway would
+    make the next run skip the sync, and the failed changes would never be retried.
+
+    Args:
+        api (AuthentikAPI): Authentik API client instance, with the metrics of the sync.
+        state_file (str): Path of the file recording the state of the last sync.
+        local_state (str): Hash of the current app config and user inventory.
+    """
+    if failed := api.metrics.failures():
+        logging.warning("Not recording the sync state, as %d API requests failed", failed)
+        return
+    write_sync_state(state_file, local=local_state, remote=api.get_state_fingerprint())
+
+
+def get_remote_state_for_users(
+    api: AuthentikAPI, emails: list[str]
+) -> tuple[dict[str, RemoteUser], GroupMemberships, dict[str, str]]:
+    """Fetch the Authentik users with the given emails and their group memberships.
+
+    This is the counterpart of `get_groups_of_users` and `AuthentikAPI.list_users` for
+    incremental syncs, which only need the state of a few users instead of all of them.
+
+    Args:
+        api (AuthentikAPI): Authentik API client instance.
+        emails (list[str]): Email addresses of the users to fetch.
+
+    Returns:
+        tuple: A tuple containing:
+            - dict[str, RemoteUser]: The existing users by lowercased email.
+            - GroupMemberships: The group memberships of these users by user ID.
+            - dict[str, str]: A dictionary mapping the names of these groups to their UUIDs.
+    """
+    users_by_email: dict[str, RemoteUser] = {}
+    users_groups_mapping = GroupMemberships()
+    group_name_uuid_cache: dict[str, str] = {}
+    for email in emails:
+        for user_dict in api.get_users(email=email):
+            if (user_dict.get("email") or "").lower() != email.lower():
+                continue
+            remote_user = RemoteUser.from_api(user_dict)
+            users_by_email[email.lower()] = remote_user
+            groups = user_dict.get("groups_obj") or []
+            users_groups_mapping.add_user(remote_user.pk, (g["name"] for g in groups))
+            group_name_uuid_cache.update({g["name"]: str(g["pk"]) for g in groups})
+    return users_by_email, users_groups_mapping, group_name_uuid_cache
+
+
+def create_mail(cfg_app: dict, dry: bool, tracer: Tracer | None = None) -> Mail:
+    """Create the mail client for invitations from the app config.
+
+    Args:
+        cfg_app (dict): The app configuration.
+        dry (bool): If True, do not send any emails.
+        tracer (Tracer, optional): The tracer to record a span per sent email with.
+
+    Returns:
+        Mail: The configured mail client.
+    """
     mail = Mail(
         smtp_server=cfg_app.get("smtp_server", ""),
         smtp_port=cfg_app.get("smtp_port", ""),
@@ -434,119 +859,621 @@ def run_sync(config: str, users: str, dry: bool, no_email: bool) -> None:
         smtp_password=cfg_app.get("smtp_password", ""),
         smtp_starttls=cfg_app.get("smtp_starttls", False),
         smtp_from=cfg_app.get("smtp_from", ""),
-        dry=any([dry, no_email]),
+        dry=dry,
+        max_per_minute=cfg_app.get("smtp_max_per_minute", 0),
+        max_per_hour=cfg_app.get("smtp_max_per_hour", 0),
+        tracer=tracer,
     )
-    mail.create_copy_with_details(
+    return mail.create_copy_with_details(
         subject_suffix="Invitation to create account",
         instance_url=cfg_app.get("authentik_url", ""),
         instance_title=cfg_app.get("authentik_title", ""),
     )
 
+
+def create_mail_spool(mail: Mail, mail_spool_dir: str) -> MailSpool | None:
+    """Return the mail spool of the sync, if emails are sent and a spool directory is given.
+
+    Email rate limits are only enforced across runs by the deliveries recorded in the spool, so
+    they require one. Without it, every run would send up to the full limits again.
+
+    Args:
+        mail (Mail): The configured mail client.
+        mail_spool_dir (str): Path to the mail spool directory, or an empty string for none.
+
+    Returns:
+        MailSpool | None: The mail spool, or None if there is none or emails are not sent.
+
+    Raises:
+        ValueError: If the sending rate is limited, but no spool directory is given.
+    """
+    if mail.dry:
+        return None
+    if not mail_spool_dir:
+        if mail.rate_limiter is not None:
+            msg = "smtp_max_per_minute and smtp_max_per_hour require a mail spool (--mail-spool)."
+            raise ValueError(msg)
+        return None
+    return MailSpool(mail_spool_dir, mail)
+
+
+def create_mail_sender(mail: Mail, mail_spool: MailSpool | None) -> Mail | MailQueue | MailSpool:
+    """Return where the sync shall send its emails to, so that it does not wait for them.
+
+    Emails are written to the spool and delivered after syncing, if there is one. Otherwise, they
+    are delivered in the background while syncing. In dry runs and without emails, they are only
+    logged, which needs no background threads.
+
+    Args:
+        mail (Mail): The configured mail client.
+        mail_spool (MailSpool | None): The mail spool, if any.
+
+    Returns:
+        Mail | MailQueue | MailSpool: The mail spool, a new mail queue, or the dry mail client.
+    """
+    if mail_spool is not None:
+        return mail_spool
+    if mail.dry:
+        return mail
+    return MailQueue(mail)
+
+
+def print_spool_result(result: SpoolResult) -> None:
+    """Print the result of delivering the spooled emails."""
+    print(
+        f"Mail spool: {result.sent} sent, {len(result.failures)} failed, "
+        f"{result.pending} left for a later retry"
+    )
+    for recipient, error in result.failures:
+        print(f"  {recipient}: {error}")
+
+
+def read_incremental_sync_users(
+    users: str, since: str, state_file: str = "", exclude: list[str] | None = None
+) -> tuple[list[dict], list[str]]:
+    """Read the users added, changed or removed in the inventory since a git revision.
+
+    Args:
+        users (str): Path to the user inventory file or directory.
+        since (str): Git revision to compare the inventory with.
+        state_file (str, optional): The state file of the sync, which must not be set.
+        exclude (list[str], optional): Glob patterns of inventory files or directories to skip.
+
+    Returns:
+        tuple[list[dict], list[str]]: The added and changed users, and the emails of the removed
+        users.
+    """
+    if is_inventory_artifact(users):
+        msg = "An incremental sync needs the inventory files, not a compiled inventory."
+        raise ValueError(msg)
+    if state_file:
+        msg = "An incremental sync cannot be combined with --state-file."
+        raise ValueError(msg)
+    return diff_inventory_since(users, since, exclude=exclude or [])
+
+
+def get_remote_state(
+    api: AuthentikAPI, timings: PhaseTimer, emails: list[str] | None = None
+) -> tuple[dict[str, RemoteUser], GroupMemberships, dict[str, str]]:
+    """Fetch the Authentik users, their group memberships and the UUIDs of the groups.
+
+    Args:
+        api (AuthentikAPI): Authentik API client instance.
+        timings (PhaseTimer): Timer to record the fetching phases in.
+        emails (list[str], optional): Only fetch the users with these email addresses, and only
+            their groups. Defaults to fetching all users and groups.
+
+    Returns:
+        tuple: The users by lowercased email, their group memberships by user ID, and the group
+        name-to-uuid cache, as returned by `get_remote_state_for_users`.
+    """
+    if emails is not None:
+        with timings.phase("Fetch users"):
+            return get_remote_state_for_users(api=api, emails=emails)
+
     # Get all current groups and their users, plus group name-to-uuid cache
-    users_and_groups, group_name_uuid_cache = get_groups_of_users(api=api)
+    with timings.phase("Fetch groups"):
+        users_and_groups, group_name_uuid_cache = get_groups_of_users(api=api)
+
+    # Fetch all users from Authentik upfront and build email lookup, keeping only the fields
+    # needed for the sync
+    with timings.phase("Fetch users"):
+        all_users_by_email = {
+            u["email"].lower(): RemoteUser.from_api(u)
+            for u in api.iter_users()
+            if u.get("email")  # only include users with email
+        }
+    return all_users_by_email, users_and_groups, group_name_uuid_cache
+
+
+def write_sync_textfile(
+    path: str, timings: PhaseTimer, api: AuthentikAPI, sync: UserSync | None = None
+) -> None:
+    """Write the numbers of a sync as a Prometheus textfile.
+
+    Args:
+        path (str): Path of the textfile.
+        timings (PhaseTimer): The phase timings of the sync.
+        api (AuthentikAPI): The API client, with the metrics of its requests.
+        sync (UserSync, optional): The sync orchestrator with the user and email counters, or
+            None if the sync ended early because nothing changed.
+    """
+    textfile = PrometheusTextfile("sync")
+    textfile.add_timings(timings)
+    if sync is not None:
+        textfile.add_users(
+            unchanged=sync.users_unchanged,
+            changed=sync.users_changed,
+            pending=sync.users_pending,
+            deleted=sync.users_deleted,
+        )
+        textfile.gauge("emails", "Emails by their result", sync.mails_sent, result="sent")
+        textfile.gauge("emails", "Emails by their result", sync.mails_failed, result="failed")
+    textfile.add_api_metrics(api.metrics)
+    textfile.write(path)
+
+
+def end_unchanged_sync(
+    api: AuthentikAPI, timings: PhaseTimer, mail_spool: MailSpool | None, prometheus_file: str
+) -> None:
+    """End a sync early because nothing changed since the last one.
+
+    Emails left in the spool by earlier runs are still delivered, and the run is recorded as
+    successful in the Prometheus textfile.
+    """
+    if mail_spool is not None and len(mail_spool):
+        print_spool_result(mail_spool.flush())
+    if prometheus_file:
+        write_sync_textfile(prometheus_file, timings=timings, api=api)
 
-    # Fetch all users from Authentik upfront and build email lookup
-    all_users_by_email: dict[str, dict] = {
-        u["email"].lower(): u
-        for u in api.list_users()
-        if u.get("email")  # only include users with email
-    }
+
+def apply_sync(
+    sync: UserSync,
+    users: list[User],
+    mail_sender: Mail | MailQueue | MailSpool,
+    all_groups_known: bool,
+) -> None:
+    """Create missing groups, sync the users, delete unconfigured ones and send the emails.
+
+    If a step fails, the emails still waiting in a mail queue are dropped, so that the error is
+    reported right away instead of after sending them, which may take long with rate limits.
+
+    Args:
+        sync (UserSync): The sync orchestrator.
+        users (list[User]): The configured users to sync.
+        mail_sender (Mail | MailQueue | MailSpool): Where the sync sends its emails to.
+        all_groups_known (bool): True if the group cache contains all groups of Authentik.
+    """
+    try:
+        with sync.timings.phase("Create groups"):
+            sync.create_missing_groups(users=users, all_groups_known=all_groups_known)
+        sync.sync_users(users=users)
+
+        # Delete unconfigured users if enabled
+        with sync.timings.phase("Delete users"):
+            sync.handle_unconfigured_users(configured_emails={user.email.lower() for user in users})
+    except BaseException:
+        # Report the error right away, instead of after sending all queued emails
+        if isinstance(mail_sender, MailQueue):
+            mail_sender.abort()
+        raise
+    finally:
+        # Deliver all invitations, which closes the SMTP connections
+        with sync.timings.phase("Send emails"):
+            mail_sender.close()
+    if not isinstance(mail_sender, Mail):
+        sync.report_mail_result(sent=mail_sender.sent, failures=mail_sender.failures)
+
+
+def run_sync(  # noqa: PLR0913
+    config: str,
+    users: str,
+    dry: bool,
+    no_email: bool,
+    exclude: list[str] | None = None,
+    since: str = "",
+    state_file: str = "",
+    force: bool = False,
+    mail_spool_dir: str = "",
+    metrics_file: str = "",
+    prometheus_file: str = "",
+    tracer: Tracer | None = None,
+) -> None:
+    """
+    Run the synchronization process: read configurations, initialize API and mail clients,
+    fetch current user and group data, and synchronize each user accordingly.
+
+    With `since`, only users whose inventory entries were added, changed or removed since that
+    git revision are synchronised, and only their state is fetched from Authentik.
+
+    With `state_file`, the hash of the local files and a fingerprint of Authentik are recorded
+    after each applied sync. If both still match on the next run, it ends early without reading
+    the user inventory or fetching all users and groups.
+
+    Args:
+        config (str): Path to the application configuration YAML file.
+        users (str): Path to the user inventory YAML file or directory, or a compiled inventory.
+        dry (bool): If True, run a dry sync without making changes or sending emails.
+        no_email (bool): If True, do not send any emails (overrides dry).
+        exclude (list[str], optional): Glob patterns of inventory files or directories to skip.
+        since (str, optional): Git revision for an incremental sync.
+        state_file (str, optional): Path of the file recording the state of the last sync.
+        force (bool, optional): If True, sync even if the state has not changed.
+        mail_spool_dir (str, optional): Directory to spool emails in. They are delivered after
+            syncing, and kept for a later retry if that fails.
+        metrics_file (str, optional): Path of a JSON file to write the API metrics and phase
+            timings of the sync to.
+        prometheus_file (str, optional): Path of a Prometheus textfile to write the numbers of
+            the sync to, including the time of this successful run.
+        tracer (Tracer, optional): The tracer to record spans of the phases, users, API
+            requests and emails with. Defaults to a disabled tracer.
+    """
+    timings = PhaseTimer(tracer=tracer)
+    with timings.phase("Read config"):
+        cfg_app = read_app_config(config)
+        cfg_users: list[dict] | None = None
+        removed_emails: list[str] = []
+        if since:
+            cfg_users, removed_emails = read_incremental_sync_users(
+                users, since, state_file=state_file, exclude=exclude
+            )
+
+    # Initiate classes
+    with timings.phase("Connect"):
+        api = AuthentikAPI(
+            url=cfg_app.get("authentik_url", ""),
+            token=cfg_app.get("authentik_token", ""),
+            invitation_flow_slug=cfg_app.get("invitation_flow_slug", ""),
+            create_missing_groups=cfg_app.get("create_missing_groups", False),
+            invitation_expiry_days=cfg_app.get("invitation_expiry_days", 30),
+            dry=dry,
+            tracer=timings.tracer,
+        )
+        mail = create_mail(cfg_app, dry=any([dry, no_email]), tracer=timings.tracer)
+        mail_spool = create_mail_spool(mail, mail_spool_dir)
+
+    with timings.phase("Check state"):
+        local_state = hash_local_state(config, users, exclude=exclude or []) if state_file else ""
+        unchanged = bool(state_file) and not force
+        unchanged = unchanged and is_sync_unchanged(api, state_file, local_state)
+    if unchanged:
+        end_unchanged_sync(api, timings, mail_spool=mail_spool, prometheus_file=prometheus_file)
+        return
+    if cfg_users is None:
+        with timings.phase("Read inventory"):
+            cfg_users = read_sync_users(users, exclude=exclude)
+
+    emails = None
+    if since:
+        # Only fetch the changed users, and removed users if they shall be deleted
+        emails = [u["email"] for u in cfg_users]
+        if cfg_app.get("delete_unconfigured_users", False):
+            emails.extend(removed_emails)
+    all_users_by_email, users_and_groups, group_name_uuid_cache = get_remote_state(
+        api=api, timings=timings, emails=emails
+    )
 
     # Initialize sync orchestrator
+    mail_sender = create_mail_sender(mail, mail_spool)
     sync = UserSync(
         api=api,
-        mail=mail,
+        mail=mail_sender,
         all_users_by_email=all_users_by_email,
         user_group_mapping=users_and_groups,
         group_name_uuid_cache=group_name_uuid_cache,
         delete_unconfigured_users=cfg_app.get("delete_unconfigured_users", False),
+        timings=timings,
     )
 
-    # Iterate all configured users
-    configured_emails: set[str] = set()
-    for user_dict in cfg_users:
-        user = User(
+    # Synchronise all configured users
+    users_to_sync = [
+        User(
             name=user_dict.get("name", ""),
             email=user_dict.get("email", ""),
             configured_groups=user_dict.get("groups", []),
             username=user_dict.get("username", ""),
         )
-        configured_emails.add(user.email.lower())
-        sync.sync_user(user=user)
+        for user_dict in cfg_users
+    ]
+    apply_sync(sync, users_to_sync, mail_sender=mail_sender, all_groups_known=not since)
 
-    # Delete unconfigured users if enabled
-    sync.handle_unconfigured_users(configured_emails=configured_emails)
+    # Record the state reached by this sync, including its own changes in Authentik
+    if state_file and not dry:
+        with timings.phase("Record state"):
+            record_sync_state(api, state_file, local_state)
 
     sync.print_summary(total_users=len(cfg_users), dry_run=dry)
+    if metrics_file:
+        write_metrics_file(metrics_file, api=api.metrics, phases=timings.phases)
+    if prometheus_file:
+        write_sync_textfile(prometheus_file, timings=timings, api=api, sync=sync)
+
+
+def import_user(
+    index: YamlUserIndex, csv_user: dict, groups: list[str], output_path: Path, dry: bool
+) -> bool:
+    """Merge groups into an existing user, or add the user to the output file if not found.
+
+    Args:
+        index (YamlUserIndex): Index of the existing user inventory.
+        csv_user (dict): User dictionary from the CSV file, with name, email and optionally
+            username.
+        groups (list[str]): Groups to add to the user.
+        output_path (Path): Path to the output YAML file for new users.
+        dry (bool): If True, only log the changes that would be made.
 
+    Returns:
+        bool: True if an existing user was updated, False if a new user was added.
+    """
+    email = csv_user["email"]
+
+    # Try to find and update user in existing files
+    if index.merge_groups(email=email, groups_to_add=groups, dry=dry):
+        logging.info("Updated existing user: %s", email)
+        return True
+
+    # User not found — append to output file
+    user_dict: dict = {"name": csv_user["name"], "email": email}
+    if username := csv_user.get("username", ""):
+        user_dict["username"] = username
+    user_dict["groups"] = sorted(groups)
+
+    index.add_user(file_path=output_path, user_dict=user_dict, dry=dry)
+    logging.info("Added new user: %s", email)
+    return False
+
+
+def import_chunks(  # noqa: PLR0913
+    index: YamlUserIndex,
+    csv_chunks: Iterable[list[dict]],
+    groups: list[str],
+    output_path: Path,
+    dry: bool,
+    flush: bool = False,
+) -> tuple[int, int]:
+    """Import the users of all CSV chunks, see `import_user`.
 
-def run_import(input_file: str, groups_args: str, output: str, users: str, dry: bool) -> None:
+    Args:
+        index (YamlUserIndex): Index of the existing user inventory.
+        csv_chunks (Iterable[list[dict]]): Chunks of user dictionaries from the CSV file.
+        groups (list[str]): Groups to add to each user.
+        output_path (Path): Path to the output YAML file for new users.
+        dry (bool): If True, only log the changes that would be made.
+        flush (bool, optional): If True, write the new users after each chunk, so that they are
+            not held in memory until the end. Not done in a dry run.
+
+    Returns:
+        tuple[int, int]: The numbers of added and of updated users.
+    """
+    users_added = 0
+    users_updated = 0
+    for csv_chunk in csv_chunks:
+        for csv_user in csv_chunk:
+            if import_user(
+                index=index, csv_user=csv_user, groups=groups, output_path=output_path, dry=dry
+            ):
+                users_updated += 1
+            else:
+                users_added += 1
+        if flush and not dry:
+            index.flush_appended()
+    return users_added, users_updated
+
+
+def print_import_summary(  # noqa: PLR0913
+    csv_reader: CsvUserReader,
+    output_path: Path,
+    users_added: int,
+    users_updated: int,
+    dry: bool,
+    timings: PhaseTimer | None = None,
+) -> None:
+    """Print the summary of an import run."""
+    print(f"Import summary: {csv_reader.users_yielded} users processed")
+    print(f"  Added to {output_path}: {users_added}")
+    print(f"  Updated in existing files: {users_updated}")
+    if csv_reader.duplicates:
+        print(f"  Skipped duplicate rows: {csv_reader.duplicates}")
+    if csv_reader.invalid:
+        print(f"  Skipped invalid rows: {csv_reader.invalid}")
+        for msg in csv_reader.errors:
+            print(f"    {msg}")
+    if dry:
+        print("  (dry run — no files were modified)")
+    if timings is not None and timings.phases:
+        print("\nTimings:")
+        for line in timings.format_lines():
+            print(f"  {line}")
+
+
+def run_import(  # noqa: PLR0913
+    input_file: str,
+    groups_args: str,
+    output: str,
+    users: str,
+    dry: bool,
+    exclude: list[str] | None = None,
+    stream: bool = False,
+    use_index: bool = False,
+    prometheus_file: str = "",
+) -> None:
     """Run the import command: read users from CSV and add/update them in YAML files.
 
     For each user in the CSV:
     - If found in an existing YAML file under --users: merge the specified groups.
     - If not found: append to the --output YAML file with the specified groups.
 
+    All inventory files are parsed once into an email index up front, and every modified file is
+    written exactly once at the end, regardless of how many CSV rows touch it.
+
+    By default, the whole CSV file is read and validated before any user is processed, and an
+    invalid row aborts the import. In streaming mode, the CSV file is processed in chunks while
+    it is read, invalid rows are reported and skipped, and new users are appended to the output
+    file after each chunk.
+
     Args:
         input_file (str): Path to the input CSV file containing users to import.
         groups_args (str): Comma-separated list of groups to add to each imported user.
         output (str): Path to the output YAML file where new users will be appended.
         users (str): Path to existing user inventory file or directory to check for existing users.
         dry (bool): If True, run a dry import without writing changes to files.
+        exclude (list[str], optional): Glob patterns of inventory files or directories to skip.
+        stream (bool, optional): If True, process the CSV file in chunks while reading it.
+        use_index (bool, optional): If True, use the persistent inventory index to parse only
+            the files of users in the CSV file, and update the index afterwards.
+        prometheus_file (str, optional): Path of a Prometheus textfile to write the numbers of
+            the import to, including the time of this successful run.
     """
-    # Parse inputs
-    csv_users = parse_csv_users(input_file)
+    timings = PhaseTimer()
+    # Parse inputs. Without streaming, read and validate the whole file before touching anything
+    with timings.phase("Read CSV"):
+        csv_reader = CsvUserReader(input_file, strict=not stream)
+        csv_chunks = csv_reader if stream else [[u for chunk in csv_reader for u in chunk]]
     groups = [g.strip() for g in groups_args.split(",") if g.strip()]
     output_path = Path(output)
+    if is_json_inventory_file(output_path):
+        msg = f"Output file {output} must be a YAML file, JSON inventory files are not modified."
+        raise ValueError(msg)
 
-    # Resolve existing YAML file paths
-    try:
-        existing_file_paths = get_yaml_file_paths(users)
-    except ValueError:
-        existing_file_paths = []
+    with timings.phase("Read inventory"):
+        # Resolve existing YAML file paths
+        try:
+            existing_file_paths = get_inventory_file_paths(users, exclude=exclude or [])
+        except ValueError:
+            existing_file_paths = []
+
+        # Also include the output file in the search if it already exists
+        if output_path.is_file() and output_path not in existing_file_paths:
+            existing_file_paths.append(output_path)
+
+        # Parse existing files once and index their users by email. With the persistent index,
+        # files are only parsed when one of their users is looked up
+        inventory_index = None
+        if use_index and existing_file_paths:
+            inventory_index = InventoryIndex.open(users, exclude=exclude or [], persist=True)
+        index = YamlUserIndex(existing_file_paths, inventory_index=inventory_index)
+
+    # In streaming mode, this includes reading the CSV file
+    with timings.phase("Import users"):
+        users_added, users_updated = import_chunks(
+            index=index,
+            csv_chunks=csv_chunks,
+            groups=groups,
+            output_path=output_path,
+            dry=dry,
+            flush=stream,
+        )
 
-    # Also include the output file in the search if it already exists
-    if output_path.is_file() and output_path not in existing_file_paths:
-        existing_file_paths.append(output_path)
+    # Write every touched file exactly once, then re-index just these files
+    with timings.phase("Write files"):
+        index.save(dry=dry)
+        if inventory_index is not None and not dry:
+            inventory_index.refresh()
+            inventory_index.save()
+
+    print_import_summary(
+        csv_reader=csv_reader,
+        output_path=output_path,
+        users_added=users_added,
+        users_updated=users_updated,
+        dry=dry,
+        timings=timings,
+    )
+    if prometheus_file:
+        textfile = PrometheusTextfile("import")
+        textfile.add_timings(timings)
+        textfile.add_users(
+            added=users_added,
+            updated=users_updated,
+            duplicate=csv_reader.duplicates,
+            invalid=csv_reader.invalid,
+        )
+        textfile.write(prometheus_file)
 
-    users_added = 0
-    users_updated = 0
 
-    for csv_user in csv_users:
-        email = csv_user["email"]
-        name = csv_user["name"]
-        username = csv_user.get("username", "")
+def run_compile(users: str, output: str, exclude: list[str] | None = None) -> None:
+    """Run the compile command: write the validated user inventory into a single file.
 
-        # Try to find and update user in existing files
-        if update_user_groups_in_yaml_files(
-            file_paths=existing_file_paths,
-            email=email,
-            groups_to_add=groups,
-            dry=dry,
-        ):
-            users_updated += 1
-            logging.info("Updated existing user: %s", email)
+    Args:
+        users (str): Path to the user inventory file or directory.
+        output (str): Path of the compiled inventory to write.
+        exclude (list[str], optional): Glob patterns of inventory files or directories to skip.
+    """
+    users_config = compile_inventory(users, output, exclude=exclude or [])
+    print(f"Compiled {len(users_config)} users from {users} into {output}")
+
+
+def run_validate(
+    users: str,
+    exclude: list[str] | None = None,
+    changed: bool = False,
+    since: str = "",
+    use_index: bool = False,
+) -> int:
+    """Run the validate command: check the user inventory and print all errors.
+
+    Args:
+        users (str): Path to the user inventory file or directory.
+        exclude (list[str], optional): Glob patterns of inventory files or directories to skip.
+        changed (bool, optional): If True, only report errors in files changed in the git
+            working tree.
+        since (str, optional): Git revision. If given, only report errors in files changed
+            since then.
+        use_index (bool, optional): If True, cache the results per file in the persistent
+            inventory index.
+
+    Returns:
+        int: The number of errors found.
+    """
+    result = validate_inventory(
+        users, exclude=exclude or [], changed=changed, since=since, use_index=use_index
+    )
+    for error in result.errors:
+        print(error)
+    status = f"{len(result.errors)} errors" if result.errors else "no errors"
+    print(f"Validated {result.users} users in {result.files} files: {status}")
+    return len(result.errors)
+
+
+def run_lookup(
+    users: str, keys: list[str], exclude: list[str] | None = None, use_index: bool = False
+) -> int:
+    """Run the lookup command: print the inventory file and position of users.
+
+    Args:
+        users (str): Path to the user inventory file or directory.
+        keys (list[str]): Email addresses or usernames to look up.
+        exclude (list[str], optional): Glob patterns of inventory files or directories to skip.
+        use_index (bool, optional): If True, use and update the persistent inventory index.
+
+    Returns:
+        int: The number of keys that were not found.
+    """
+    index = InventoryIndex.open(users, exclude=exclude or [], persist=use_index)
+    missing = 0
+    for key in keys:
+        if (entry := index.lookup(key)) is None:
+            print(f"{key}: not found")
+            missing += 1
         else:
-            # User not found — append to output file
-            user_dict: dict = {"name": name, "email": email}
-            if username:
-                user_dict["username"] = username
-            user_dict["groups"] = sorted(groups)
-
-            append_user_to_yaml_file(
-                file_path=output_path,
-                user_dict=user_dict,
-                dry=dry,
-            )
-            users_added += 1
-            logging.info("Added new user: %s", email)
+            print(f"{key}: {entry.path} (entry {entry.position + 1})")
+    return missing
 
-    # Print summary
-    print(f"Import summary: {len(csv_users)} users processed")
-    print(f"  Added to {output_path}: {users_added}")
-    print(f"  Updated in existing files: {users_updated}")
-    if dry:
-        print("  (dry run — no files were modified)")
+
+def run_flush_mail(config: str, spool: str) -> bool:
+    """Deliver the due emails in a mail spool, e.g. after the mail server was unavailable.
+
+    Args:
+        config (str): Path to the application configuration YAML file.
+        spool (str): The mail spool directory.
+
+    Returns:
+        bool: True if any email could not be delivered.
+    """
+    mail_spool = MailSpool(spool, create_mail(read_app_config(config), dry=False))
+    result = mail_spool.flush()
+    print_spool_result(result)
+    return bool(result.failures)
 
 
 def cli() -> None:
@@ -560,19 +1487,64 @@ def cli() -> None:
         None
     """
     args = parser.parse_args()
-    configure_logger(verbose=args.verbose, debug=args.debug)
+    configure_logger(
+        verbose=args.verbose,
+        debug=args.debug,
+        json_lines=args.log_json,
+        queued=args.log_queue,
+        max_arg_length=args.log_max_length,
+    )
 
     if args.command == "sync":
-        run_sync(config=args.config, users=args.users, dry=args.dry, no_email=args.no_email)
+        with profile_to(args.profile), trace_to(args.trace_file, "sync") as tracer:
+            run_sync(
+                config=args.config,
+                users=args.users,
+                dry=args.dry,
+                no_email=args.no_email,
+                exclude=args.exclude,
+                since=args.since,
+                state_file=args.state_file,
+                force=args.force,
+                mail_spool_dir=args.mail_spool,
+                metrics_file=args.metrics_file,
+                prometheus_file=args.prometheus_file,
+                tracer=tracer,
+            )
+
+    elif args.command == "flush-mail" and run_flush_mail(config=args.config, spool=args.spool):
+        sys.exit(1)
+
+    elif args.command == "compile":
+        run_compile(users=args.users, output=args.output, exclude=args.exclude)
+
+    elif args.command == "validate" and run_validate(
+        users=args.users,
+        exclude=args.exclude,
+        changed=args.changed,
+        since=args.since,
+        use_index=args.index,
+    ):
+        sys.exit(1)
 
     elif args.command == "import":
-        run_import(
-            input_file=args.input,
-            groups_args=args.groups,
-            output=args.output,
-            users=args.users,
-            dry=args.dry,
-        )
+        with profile_to(args.profile):
+            run_import(
+                input_file=args.input,
+                groups_args=args.groups,
+                output=args.output,
+                users=args.users,
+                dry=args.dry,
+                exclude=args.exclude,
+                stream=args.stream,
+                use_index=args.index,
+                prometheus_file=args.prometheus_file,
+            )
+
+    elif args.command == "lookup" and run_lookup(
+        users=args.users, keys=args.key, exclude=args.exclude, use_index=args.index
+    ):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
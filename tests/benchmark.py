@@ -0,0 +1,670 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Micro-benchmarks for the performance-sensitive code paths of auth_user_mgr.
+
+Start with: python tests/benchmark.py [name ...]
+Without a name, all benchmarks are run. Results are printed as best/median wall time.
+"""
+
+import io
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Allow running the script directly from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from auth_user_mgr._api import AuthentikAPI
+from auth_user_mgr._artifact import compile_inventory, load_inventory_artifact
+from auth_user_mgr._config import (
+    CsvUserReader,
+    YamlUserIndex,
+    _get_yaml,
+    _prettify_yaml_formatting,
+    _update_user_groups_round_trip,
+    append_user_to_yaml_file,
+    append_users_to_yaml_file,
+    get_yaml_file_paths,
+    load_inventory_file,
+    parse_csv_users,
+    read_users_config,
+    update_user_groups_in_yaml_files,
+)
+from auth_user_mgr._diff import diff_user_memberships
+from auth_user_mgr._email import Mail, MailQueue
+from auth_user_mgr._index import InventoryIndex
+from auth_user_mgr._logging import setup_handlers, stop_queue
+from auth_user_mgr._profile import PhaseTimer
+from auth_user_mgr._trace import Tracer
+from auth_user_mgr._user import (
+    GroupMemberships,
+    RemoteUser,
+    User,
+    _slugify_invite_slug,
+    _slugify_username,
+    name_to_invite_slug,
+    name_to_username,
+)
+from auth_user_mgr._validate import validate_inventory
+from auth_user_mgr.main import UserSync, get_groups_of_users
+from tests.smtp_sink import SMTPSink
+
+BENCHMARKS: dict[str, Callable[[], None]] = {}
+
+
+def benchmark(func: Callable[[], None]) -> Callable[[], None]:
+    """Register a benchmark function under its name."""
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def measure(label: str, func: Callable[[], object], repeat: int = 5) -> float:
+    """Run `func` several times, print best and median wall time, and return the best time."""
+    timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    median = statistics.median(timings)
+    print(f"  {label:<45} best {best * 1000:9.2f} ms   median {median * 1000:9.2f} ms")
+    return best
+
+
+@benchmark
+def discovery() -> None:
+    """Discover 10k YAML files in a nested 3-level directory tree."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for i in range(10_000):
+            sub = root / f"dept{i % 10}" / f"team{i % 100}"
+            sub.mkdir(parents=True, exist_ok=True)
+            (sub / f"users{i}.yaml").write_text("[]\n", encoding="utf-8")
+
+        measure("Path.rglob (baseline)", lambda: sorted(root.rglob("*.yaml")))
+        measure(
+            "Path.rglob + stat (baseline)",
+            lambda: sorted((p, p.stat().st_mtime_ns) for p in root.rglob("*.yaml")),
+        )
+        measure("get_yaml_file_paths", lambda: get_yaml_file_paths(str(root)))
+
+
+def _write_inventory(root: Path, files: int, users_per_file: int) -> list[Path]:
+    """Write a synthetic inventory of `files` YAML files and return their paths."""
+    paths: list[Path] = []
+    for f in range(files):
+        path = root / f"team{f}.yaml"
+        entries = [
+            f"- name: User {f} {u}\n  email: user{f}.{u}@example.com\n  groups:\n    - Team {f}\n"
+            for u in range(users_per_file)
+        ]
+        path.write_text("\n".join(entries), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+@benchmark
+def import_index() -> None:
+    """Import 100 CSV users (half existing) into a 10-file, 200-user inventory."""
+    emails = [f"user{f}.{u}@example.com" for f in range(10) for u in range(0, 20, 4)]
+    emails += [f"new{i}@example.com" for i in range(len(emails))]
+
+    def per_row(root: Path) -> None:
+        paths = _write_inventory(root, files=10, users_per_file=20)
+        for email in emails:
+            if not update_user_groups_in_yaml_files(paths, email, ["Event"]):
+                append_user_to_yaml_file(root / "new.yaml", {"name": "New", "email": email})
+
+    def indexed(root: Path) -> None:
+        paths = _write_inventory(root, files=10, users_per_file=20)
+        index = YamlUserIndex(paths)
+        for email in emails:
+            if not index.merge_groups(email, ["Event"]):
+                index.add_user(root / "new.yaml", {"name": "New", "email": email})
+        index.save()
+
+    for label, func in (("per-row search and rewrite", per_row), ("YamlUserIndex", indexed)):
+        with tempfile.TemporaryDirectory() as tmp:
+            measure(label, lambda func=func, tmp=tmp: func(Path(tmp)), repeat=1)
+
+
+@benchmark
+def append_users() -> None:
+    """Grow an output file to 100 users."""
+    new_users = [
+        {"name": f"User {i}", "email": f"user{i}@example.com", "groups": ["Event"]}
+        for i in range(100)
+    ]
+
+    def redump_per_user(path: Path) -> None:
+        for user_dict in new_users:
+            yml = _get_yaml()
+            data = yml.load(path.read_text(encoding="utf-8")) if path.is_file() else []
+            data.append(user_dict)
+            with open(path, "w", encoding="utf-8") as f:
+                yml.dump(data, f, transform=_prettify_yaml_formatting)
+
+    def batched(path: Path) -> None:
+        append_users_to_yaml_file(path, new_users[:1])
+        append_users_to_yaml_file(path, new_users[1:])
+
+    for label, func in (
+        ("load and re-dump per user", redump_per_user),
+        ("batched append", batched),
+    ):
+        with tempfile.TemporaryDirectory() as tmp:
+            measure(label, lambda func=func, tmp=tmp: func(Path(tmp) / "out.yaml"), repeat=1)
+
+
+@benchmark
+def group_merge() -> None:
+    """Add one group to one user in a single 5k-user YAML file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        (path,) = _write_inventory(Path(tmp), files=1, users_per_file=5_000)
+        text = path.read_text(encoding="utf-8")
+        email = "user0.2500@example.com"
+
+        def round_trip() -> None:
+            path.write_text(text, encoding="utf-8")
+            _update_user_groups_round_trip(path, text, email, ["Event"], dry=False)
+
+        def spliced() -> None:
+            path.write_text(text, encoding="utf-8")
+            update_user_groups_in_yaml_files([path], email, ["Event"])
+
+        measure("full ruamel round-trip", round_trip, repeat=3)
+        measure("update_user_groups_in_yaml_files (spliced)", spliced)
+
+
+@benchmark
+def index_lookup() -> None:
+    """Merge groups of 50 users in a 200-file, 10k-user inventory, with and without index."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        paths = _write_inventory(root, files=200, users_per_file=50)
+        emails = [f"user{f}.7@example.com" for f in range(0, 200, 4)]
+
+        def scan() -> None:
+            for email in emails:
+                update_user_groups_in_yaml_files(paths, email, ["Team 0"], dry=True)
+
+        def indexed() -> None:
+            index = InventoryIndex.open(root, persist=True)
+            for email in emails:
+                update_user_groups_in_yaml_files(paths, email, ["Team 0"], dry=True, index=index)
+
+        def batch(inventory_index: InventoryIndex | None) -> None:
+            index = YamlUserIndex(paths, inventory_index=inventory_index)
+            for email in emails:
+                index.merge_groups(email, ["Team 0"], dry=True)
+
+        measure("substring scan of every file", scan, repeat=3)
+        measure("InventoryIndex (cold, builds index)", indexed, repeat=1)
+        measure("InventoryIndex (warm)", indexed, repeat=3)
+        measure("YamlUserIndex, all files parsed", lambda: batch(None), repeat=1)
+        measure(
+            "YamlUserIndex, lazy via InventoryIndex",
+            lambda: batch(InventoryIndex.open(root, persist=True)),
+        )
+
+
+@benchmark
+def compiled_inventory() -> None:
+    """Load a 200-file, 10k-user inventory from YAML vs. from a compiled artifact."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "users"
+        root.mkdir()
+        _write_inventory(root, files=200, users_per_file=50)
+        artifact = Path(tmp) / "users.aum"
+        compile_inventory(str(root), artifact)
+
+        measure("read_users_config (YAML)", lambda: read_users_config(str(root)), repeat=1)
+        measure("load_inventory_artifact", lambda: load_inventory_artifact(artifact))
+
+
+@benchmark
+def inventory_formats() -> None:
+    """Parse throughput of a 10k-user inventory file as YAML, JSON and JSON Lines."""
+    count = 10_000
+    users = [
+        {"name": f"User {i}", "email": f"user{i}@example.com", "groups": ["Team A", "Team B"]}
+        for i in range(count)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        yaml_path = Path(tmp) / "users.yaml"
+        yaml_path.write_text(
+            "\n".join(
+                f"- name: {u['name']}\n  email: {u['email']}\n  groups:\n    - Team A\n"
+                "    - Team B\n"
+                for u in users
+            ),
+            encoding="utf-8",
+        )
+        json_path = Path(tmp) / "users.json"
+        json_path.write_text(json.dumps(users), encoding="utf-8")
+        jsonl_path = Path(tmp) / "users.jsonl"
+        jsonl_path.write_text("".join(json.dumps(u) + "\n" for u in users), encoding="utf-8")
+
+        for label, path, repeat in (
+            ("YAML", yaml_path, 1),
+            ("JSON", json_path, 5),
+            ("JSON Lines", jsonl_path, 5),
+        ):
+            best = measure(
+                f"load_inventory_file ({label})",
+                lambda path=path: load_inventory_file(path),
+                repeat=repeat,
+            )
+            print(f"  {'':<45} {count / best:12,.0f} users/s")
+
+
+@benchmark
+def validate() -> None:
+    """Validate a 400-file, 4k-user inventory, cold and with cached per-file results."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        paths = _write_inventory(root, files=400, users_per_file=10)
+
+        def touch_one() -> None:
+            paths[0].write_text(paths[0].read_text(encoding="utf-8") + "\n", encoding="utf-8")
+            validate_inventory(str(root), use_index=True)
+
+        measure("read_users_config (as in sync --dry)", lambda: read_users_config(str(root)), 1)
+        measure("validate_inventory (without index)", lambda: validate_inventory(str(root)))
+        measure(
+            "validate_inventory (cold index)",
+            lambda: validate_inventory(str(root), use_index=True),
+            repeat=1,
+        )
+        measure(
+            "validate_inventory (cached)", lambda: validate_inventory(str(root), use_index=True)
+        )
+        measure("validate_inventory (one file changed)", touch_one)
+
+
+@benchmark
+def user_slugs() -> None:
+    """Create 60k users, generating usernames and invite slugs with slugify vs. cached."""
+    names = [f"Firstname{i} Lastname-{i % 977}" for i in range(60_000)]
+    accented = [f"Jürgen{i} Müller" for i in range(60_000)]
+
+    def with_slugify(names: list[str]) -> None:
+        for name in names:
+            _slugify_username(name)
+            _slugify_invite_slug(name)
+
+    def cold(names: list[str]) -> None:
+        name_to_username.cache_clear()
+        name_to_invite_slug.cache_clear()
+        for name in names:
+            User(name=name, email="user@example.com", configured_groups=[])
+
+    def warm(names: list[str]) -> None:
+        for name in names:
+            User(name=name, email="user@example.com", configured_groups=[])
+
+    measure("slugify (ASCII names)", lambda: with_slugify(names), repeat=1)
+    measure("User, cold cache (ASCII names)", lambda: cold(names), repeat=3)
+    measure("User, warm cache (ASCII names)", lambda: warm(names), repeat=3)
+    measure("slugify (accented names)", lambda: with_slugify(accented), repeat=1)
+    measure("User, cold cache (accented names)", lambda: cold(accented), repeat=1)
+
+
+def measure_peak_memory(label: str, func: Callable[[], object]) -> int:
+    """Run `func` once, print its peak traced memory allocation and return it in bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    print(f"  {label:<45} peak {peak / 1024 / 1024:9.2f} MiB")
+    return peak
+
+
+class _FakeTenantAPI:
+    """Serve the users and groups of a large tenant page by page, like the Authentik API.
+
+    Every page consists of new dictionaries, as if freshly parsed from a JSON response.
+    """
+
+    def __init__(self, users: int, groups: int, groups_per_user: int) -> None:
+        self.users = users
+        self.groups = groups
+        # Every user is a member of `groups_per_user` groups
+        step = groups // groups_per_user
+        self.members = {group: list(range(group % step, users, step)) for group in range(groups)}
+
+    @staticmethod
+    def _pages(make: Callable[[int], dict], count: int) -> Iterator[list[dict]]:
+        for start in range(0, count, 500):
+            yield [make(i) for i in range(start, min(start + 500, count))]
+
+    def _user(self, i: int) -> dict:
+        return {
+            "pk": i,
+            "username": f"user.{i}",
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "type": "internal",
+            "is_active": True,
+            "last_login": "2025-06-11T07:23:30.298437Z",
+            "date_joined": "2025-05-20T15:18:31.842545Z",
+            "groups": [f"{g:08d}-0000-0000-0000-000000000000" for g in range(i % 10)],
+            "avatar": "data:image/svg+xml;base64," + "A" * 400,
+            "attributes": {},
+            "uid": f"{i:064x}",
+            "path": "users",
+        }
+
+    def _group(self, i: int) -> dict:
+        return {
+            "pk": f"{i:08d}-0000-0000-0000-000000000000",
+            "name": f"Group {i}",
+            "users": list(self.members[i]),
+            "attributes": {},
+        }
+
+    def iter_users(self) -> Iterator[dict]:
+        for page in self._pages(self._user, self.users):
+            yield from page
+
+    def iter_groups(self) -> Iterator[dict]:
+        for page in self._pages(self._group, self.groups):
+            yield from page
+
+    def list_users(self) -> list[dict]:
+        return list(self.iter_users())
+
+    def list_groups(self) -> list[dict]:
+        return list(self.iter_groups())
+
+
+@benchmark
+def remote_state_memory() -> None:
+    """Peak memory of the remote state of a 100k-user, 5k-group tenant, full dicts vs. compact."""
+    api = _FakeTenantAPI(users=100_000, groups=5_000, groups_per_user=10)
+    kept: list[object] = []
+
+    def full_dicts() -> None:
+        # The representation before: full API dicts and a list of group names per user
+        users_by_email = {u["email"].lower(): u for u in api.list_users() if u.get("email")}
+        mapping: dict[int, list[str]] = {}
+        for group_dict in api.list_groups():
+            for user_id in group_dict.get("users", []):
+                mapping.setdefault(user_id, []).append(group_dict["name"])
+        for user_id, groups in mapping.items():
+            mapping[user_id] = sorted(groups)
+        kept.append((users_by_email, mapping))
+
+    def compact() -> None:
+        users_by_email = {
+            u["email"].lower(): RemoteUser.from_api(u) for u in api.iter_users() if u.get("email")
+        }
+        kept.append((users_by_email, get_groups_of_users(api)))
+
+    measure_peak_memory("full API dicts, group name lists", full_dicts)
+    kept.clear()
+    measure_peak_memory("RemoteUser, GroupMemberships", compact)
+    kept.clear()
+
+
+@benchmark
+def membership_diff() -> None:
+    """Diff 100k users' groups against a 5k-group tenant, group name lists vs. GroupMemberships."""
+    api = _FakeTenantAPI(users=100_000, groups=5_000, groups_per_user=10)
+    groups = api.list_groups()
+    memberships, _ = get_groups_of_users(api)
+    current = {user_id: memberships.get(user_id) for user_id in range(100_000)}
+    scenarios = {
+        # 1% of the users leave one group and join another
+        "1% changed": {
+            user_id: [*names[1:], "Group 0"] if user_id % 100 == 0 else names
+            for user_id, names in current.items()
+        },
+        # Every user leaves one group and joins another, all with different groups
+        "all changed": {
+            user_id: [*names[1:], f"Group {user_id % 5_000}"] for user_id, names in current.items()
+        },
+    }
+
+    def per_user_loop(configured: dict[int, list[str]]) -> None:
+        # The approach before: sorted group name lists per remote user, compared user by user
+        mapping: dict[int, list[str]] = {}
+        for group_dict in groups:
+            for user_id in group_dict["users"]:
+                mapping.setdefault(user_id, []).append(group_dict["name"])
+        for user_id, names in mapping.items():
+            mapping[user_id] = sorted(names)
+        for user_id, configured_groups in configured.items():
+            set1, set2 = set(configured_groups), set(mapping.get(user_id, []))
+            _ = (list(set2 - set1), list(set1 & set2), list(set1 - set2))
+
+    def compact(configured: dict[int, list[str]]) -> None:
+        # The sync now: compact group memberships, compared user by user
+        current = GroupMemberships()
+        for group_dict in groups:
+            current.add_group(group_dict["name"], group_dict["users"])
+        for user_id, configured_groups in configured.items():
+            diff_user_memberships(configured_groups, current.get(user_id))
+
+    for label, configured in scenarios.items():
+        measure(f"group name lists ({label})", lambda c=configured: per_user_loop(c), repeat=3)
+        measure(f"GroupMemberships ({label})", lambda c=configured: compact(c), repeat=3)
+
+
+@benchmark
+def csv_stream() -> None:
+    """Read and validate a 100k-row CSV file, fully vs. streamed in chunks."""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "users.csv"
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("name,email,username\n")
+            f.writelines(f"User {i},user{i}@example.com,user.{i}\n" for i in range(100_000))
+
+        def streamed() -> None:
+            for _ in CsvUserReader(str(csv_path), strict=False):
+                pass
+
+        measure("parse_csv_users", lambda: parse_csv_users(str(csv_path)), repeat=1)
+        measure("CsvUserReader (streamed)", streamed, repeat=1)
+        measure_peak_memory("parse_csv_users", lambda: parse_csv_users(str(csv_path)))
+        measure_peak_memory("CsvUserReader (streamed)", streamed)
+
+
+def _make_mail(port: int = 0, dry: bool = False, max_messages_per_connection: int = 100) -> Mail:
+    """Create a Mail instance sending to a local SMTP sink."""
+    return Mail(
+        smtp_server="127.0.0.1",
+        smtp_port=port,
+        smtp_user="user",
+        smtp_password="password",  # noqa: S106
+        smtp_starttls=False,
+        smtp_from="auth@example.com",
+        dry=dry,
+        max_messages_per_connection=max_messages_per_connection,
+    ).create_copy_with_details("Invitation", "https://auth.example.com", "Auth")
+
+
+@benchmark
+def mail_render() -> None:
+    """Render 10k invitations in a dry run, compiling the template per mail vs. once."""
+    mail = _make_mail(dry=True)
+
+    def render(compile_each: bool) -> None:
+        for i in range(10_000):
+            if compile_each:
+                mail._templates.clear()  # noqa: SLF001
+            mail.send_email(
+                message="invitation",
+                recipient=f"user{i}@example.com",
+                link=f"https://auth.example.com/invite/{i}",
+                invitation_expiry_days=30,
+            )
+
+    measure("template compiled per mail", lambda: render(compile_each=True), repeat=1)
+    measure("template compiled once", lambda: render(compile_each=False), repeat=3)
+
+
+@benchmark
+def mail_throughput() -> None:
+    """Send 1000 invitations to a local SMTP sink, with a new vs. a reused connection."""
+    messages = 1000
+
+    def send(sink: SMTPSink, max_messages_per_connection: int) -> None:
+        mail = _make_mail(sink.port, max_messages_per_connection=max_messages_per_connection)
+        for i in range(messages):
+            mail.send_email(
+                message="invitation",
+                recipient=f"user{i}@example.com",
+                link=f"https://auth.example.com/invite/{i}",
+                invitation_expiry_days=30,
+            )
+        mail.close()
+
+    # Locally, and with 5 ms per login as a rough stand-in for TLS and authentication at a relay
+    for login_delay in (0.0, 0.005):
+        sink = SMTPSink(login_delay=login_delay).start()
+        label = f"login {login_delay * 1000:.0f} ms"
+        try:
+            for per_connection, name in ((1, "connection per mail"), (100, "reused connection")):
+                best = measure(f"{name} ({label})", lambda s=sink, n=per_connection: send(s, n), 3)
+                print(f"  {'':<45} {messages / best:9.0f} mails/s")
+        finally:
+            sink.stop()
+
+
+@benchmark
+def mail_queue() -> None:
+    """Sync 300 new users with 3 ms API latency and 10 ms per mail, inline vs. queued mails."""
+
+    def sync(sink: SMTPSink, queued: bool) -> None:
+        mail = _make_mail(sink.port)
+        sender = MailQueue(mail) if queued else mail
+        for i in range(300):
+            time.sleep(0.003)  # Creating the invitation in Authentik
+            sender.send_email(
+                message="invitation",
+                recipient=f"user{i}@example.com",
+                link=f"https://auth.example.com/invite/{i}",
+                invitation_expiry_days=30,
+            )
+        sender.close()
+
+    sink = SMTPSink(message_delay=0.01).start()
+    try:
+        measure("send inline", lambda: sync(sink, queued=False), repeat=3)
+        measure("MailQueue (2 workers)", lambda: sync(sink, queued=True), repeat=3)
+    finally:
+        sink.stop()
+
+
+@benchmark
+def tracing_overhead() -> None:
+    """Sync 1000 users into one group each, untraced vs. traced, with 0 and 1 ms API latency."""
+    users = 1000
+
+    def sync(latency: float, traced: bool) -> None:
+        def post(*_args: object, **_kwargs: object) -> MagicMock:
+            time.sleep(latency)
+            return MagicMock(status_code=204, content=b"", text="")
+
+        with patch("auth_user_mgr._api.AuthentikAPI.get_flows", return_value=[{"pk": "flow"}]):
+            api = AuthentikAPI(url="https://auth.example.com", token="", invitation_flow_slug="")
+        api.open_invitations = []
+        tracer = Tracer(enabled=traced)
+        api.tracer = tracer
+        sync = UserSync(
+            api=api,
+            mail=MagicMock(),
+            all_users_by_email={
+                f"user{i}@example.com": RemoteUser(pk=i, email=f"user{i}@example.com")
+                for i in range(users)
+            },
+            user_group_mapping=GroupMemberships(),
+            group_name_uuid_cache={"Group": "uuid-group"},
+            timings=PhaseTimer(tracer=tracer),
+        )
+        with patch("auth_user_mgr._api.requests.post", post), tracer.span("sync"):
+            sync.sync_users(
+                [
+                    User(
+                        name=f"User {i}", email=f"user{i}@example.com", configured_groups=["Group"]
+                    )
+                    for i in range(users)
+                ]
+            )
+        if traced:
+            with tempfile.TemporaryDirectory() as tmp:
+                tracer.write(Path(tmp) / "trace.json")
+
+    for latency in (0.0, 0.001):
+        label = f"{latency * 1000:.0f} ms latency"
+        untraced = measure(f"untraced ({label})", lambda la=latency: sync(la, traced=False))
+        traced = measure(f"traced ({label})", lambda la=latency: sync(la, traced=True))
+        print(f"  {'':<45} overhead {traced / untraced - 1:9.1%}")
+
+
+class _SlowStream(io.StringIO):
+    """A log output that takes 20 us per write, like a busy terminal or CI log pipe."""
+
+    def write(self, text: str) -> int:
+        time.sleep(0.00002)
+        return super().write(text)
+
+
+@benchmark
+def logging_overhead() -> None:
+    """Log 5000 API calls with 2 kB payloads at INFO, to a slow stream, inline vs. queued."""
+    payload = {"users": [{"pk": i, "email": f"user{i}@example.com"} for i in range(50)]}
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+
+    def log(queued: bool, max_arg_length: int) -> tuple[float, float]:
+        with patch("sys.stderr", _SlowStream()):
+            setup_handlers(queued=queued, max_arg_length=max_arg_length)
+            root.setLevel(logging.INFO)
+            start = time.perf_counter()
+            for i in range(5000):
+                logging.info("API call: %s %s with data %s", "POST", f"/core/users/{i}/", payload)
+            logged = time.perf_counter()
+            stop_queue()
+        return logged - start, time.perf_counter() - start
+
+    try:
+        for label, queued, max_arg_length in (
+            ("inline", False, 0),
+            ("queued", True, 0),
+            ("queued, truncated to 200 characters", True, 200),
+        ):
+            calling, total = min(log(queued, max_arg_length) for _ in range(3))
+            print(
+                f"  {label:<45} calling thread {calling * 1000:9.2f} ms   "
+                f"until written {total * 1000:9.2f} ms"
+            )
+    finally:
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+
+def main() -> None:
+    """Run the benchmarks given on the command line, or all of them."""
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            sys.exit(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+        print(f"{name}: {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
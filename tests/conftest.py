@@ -8,6 +8,9 @@ configurations and create User objects for testing purposes.
 """
 
 import os
+import shutil
+import subprocess
+from collections.abc import Callable, Iterator
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
@@ -17,8 +20,9 @@ from auth_user_mgr import _api
 from auth_user_mgr._api import AuthentikAPI
 from auth_user_mgr._config import read_app_and_users_config
 from auth_user_mgr._email import Mail
-from auth_user_mgr._user import User
+from auth_user_mgr._user import GroupMemberships, RemoteUser, User
 from auth_user_mgr.main import UserSync
+from tests.smtp_sink import SMTPSink
 
 
 def pytest_configure() -> None:
@@ -160,13 +164,11 @@ def fixture_mock_mail() -> MagicMock:
 def fixture_sample_sync(sample_api: AuthentikAPI, mock_mail: MagicMock) -> UserSync:
     """Fixture to create a UserSync instance with pre-populated data."""
     all_users_by_email = {
-        "tester@example.com": {"pk": 1, "email": "tester@example.com"},
-        "jane@example.com": {"pk": 2, "email": "jane@example.com"},
-    }
-    user_group_mapping = {
-        1: ["Group 1", "Group 2"],
-        2: [],
+        "tester@example.com": RemoteUser(pk=1, email="tester@example.com"),
+        "jane@example.com": RemoteUser(pk=2, email="jane@example.com"),
     }
+    user_group_mapping = GroupMemberships()
+    user_group_mapping.add_user(1, ["Group 1", "Group 2"])
     group_name_uuid_cache = {
         "Group 1": "uuid-group-1",
         "Group 2": "uuid-group-2",
@@ -179,3 +181,28 @@ def fixture_sample_sync(sample_api: AuthentikAPI, mock_mail: MagicMock) -> UserS
         user_group_mapping=user_group_mapping,
         group_name_uuid_cache=group_name_uuid_cache,
     )
+
+
+@pytest.fixture(name="run_git")
+def fixture_run_git() -> Callable[..., None]:
+    """Fixture to run git commands in a test repository, skipping the test if git is missing."""
+    if shutil.which("git") is None:
+        pytest.skip("git is not installed")
+
+    def _run(repo: Path, *args: str) -> None:
+        subprocess.run(  # noqa: S603
+            ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],  # noqa: S607
+            cwd=repo,
+            check=True,
+            capture_output=True,
+        )
+
+    return _run
+
+
+@pytest.fixture(name="smtp_sink")
+def fixture_smtp_sink() -> Iterator[SMTPSink]:
+    """Fixture to run a local SMTP server which accepts all mails."""
+    sink = SMTPSink().start()
+    yield sink
+    sink.stop()
@@ -0,0 +1,139 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Minimal SMTP server that accepts and counts all mails, for tests and benchmarks.
+
+Start with: python tests/smtp_sink.py [port]
+Default port: 18925
+"""
+
+import socketserver
+import sys
+import threading
+import time
+
+PORT = 18925
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Accept any login and mail, keeping only counters of connections, logins and messages.
+
+    Attributes:
+        max_messages_per_connection (int): If set, the connection is closed with a 421 reply
+            when a client tries to send more messages, like relays with a message limit.
+        login_delay (float): Seconds each login takes, to simulate the TLS handshake and
+            authentication of a remote relay.
+        message_delay (float): Seconds each message takes to be accepted, to simulate a remote
+            relay.
+        connections (int): Number of accepted connections.
+        logins (int): Number of successful logins.
+        messages (int): Number of accepted messages.
+        recipients (list[str]): Recipients of all accepted messages, in order.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        max_messages_per_connection: int = 0,
+        login_delay: float = 0.0,
+        message_delay: float = 0.0,
+    ) -> None:
+        """Bind to a local port, a free one by default. Call `start` to serve."""
+        super().__init__(("127.0.0.1", port), SMTPSinkHandler)
+        self.max_messages_per_connection = max_messages_per_connection
+        self.login_delay = login_delay
+        self.message_delay = message_delay
+        self.connections = 0
+        self.logins = 0
+        self.messages = 0
+        self.recipients: list[str] = []
+        self.lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        """The port the server listens on."""
+        return self.server_address[1]
+
+    def start(self) -> "SMTPSink":
+        """Serve in a background thread."""
+        threading.Thread(target=self.serve_forever, args=(0.01,), daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Speak just enough SMTP for smtplib: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    server: SMTPSink
+
+    def reply(self, line: str) -> None:
+        """Send a reply line."""
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self) -> None:
+        """Handle one client connection."""
+        with self.server.lock:
+            self.server.connections += 1
+        self.sent = 0
+        self.recipient = ""
+        self.reply("220 smtp-sink ready")
+        for raw in self.rfile:
+            command = raw.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-smtp-sink\r\n250 AUTH PLAIN LOGIN\r\n")
+            elif verb == "AUTH":
+                time.sleep(self.server.login_delay)
+                with self.server.lock:
+                    self.server.logins += 1
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL" and not self.accept_mail():
+                return
+            elif verb == "RCPT":
+                self.recipient = command.partition(":")[2].strip("<> ")
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.receive_data()
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb != "MAIL":
+                self.reply("502 Command not implemented")
+
+    def accept_mail(self) -> bool:
+        """Accept a new message, unless the limit of messages per connection is reached."""
+        limit = self.server.max_messages_per_connection
+        if limit and self.sent >= limit:
+            self.reply("421 Too many messages, closing connection")
+            return False
+        self.reply("250 OK")
+        return True
+
+    def receive_data(self) -> None:
+        """Read and discard the message content, and count the message."""
+        self.reply("354 End data with <CR><LF>.<CR><LF>")
+        for data_line in self.rfile:
+            if data_line == b".\r\n":
+                break
+        time.sleep(self.server.message_delay)
+        self.sent += 1
+        with self.server.lock:
+            self.server.messages += 1
+            self.server.recipients.append(self.recipient)
+        self.reply("250 OK")
+
+
+if __name__ == "__main__":
+    sink = SMTPSink(int(sys.argv[1]) if len(sys.argv) > 1 else PORT)
+    print(f"SMTP sink listening on port {sink.port}")
+    sink.serve_forever()
@@ -4,6 +4,11 @@
 
 """Tests for _api.py."""
 
+from unittest.mock import MagicMock
+
+import pytest
+
+from auth_user_mgr import _api
 from auth_user_mgr._api import AuthentikAPI
 from auth_user_mgr._user import User
 
@@ -95,3 +100,32 @@ def test_create_invitation(sample_api: AuthentikAPI, mock_api_call: callable) ->
     data = mock_post.call_args[1]["json"]
     assert data["fixed_data"]["email"] == "alice@example.com"
     assert data["flow"] == "fake-flow-uuid"
+
+
+def test_create_groups(
+    sample_api: AuthentikAPI, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+) -> None:
+    """Test create_groups creates each group once and announces them in alphabetical order."""
+
+    def fake_post(url: str, json: dict, **_kwargs: object) -> MagicMock:  # noqa: ARG001
+        response = MagicMock(status_code=201)
+        response.text = f'{{"pk": "uuid-{json["name"]}"}}'
+        return response
+
+    mock_post = MagicMock(side_effect=fake_post)
+    monkeypatch.setattr(_api.requests, "post", mock_post)
+
+    group_uuids = sample_api.create_groups(["Team B", "Team A", "Team B", "Team C"])
+
+    assert group_uuids == {
+        "Team A": "uuid-Team A",
+        "Team B": "uuid-Team B",
+        "Team C": "uuid-Team C",
+    }
+    assert mock_post.call_count == 3
+    assert capsys.readouterr().out.splitlines() == [
+        "Group created: Team A",
+        "Group created: Team B",
+        "Group created: Team C",
+    ]
+    assert sample_api.create_groups([]) == {}
@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _artifact.py."""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from auth_user_mgr._artifact import (
+    compile_inventory,
+    is_inventory_artifact,
+    load_inventory_artifact,
+)
+from auth_user_mgr._config import read_users_config
+from auth_user_mgr.main import read_sync_config
+from tests.conftest import CONFIG_APP_SAMPLE, CONFIG_USERS_DIR_SAMPLE
+
+
+@pytest.fixture(name="inventory")
+def fixture_inventory(tmp_path: Path) -> Path:
+    """Copy the sample inventory directory into a temporary directory."""
+    return Path(shutil.copytree(CONFIG_USERS_DIR_SAMPLE, tmp_path / "users"))
+
+
+def test_compile_and_load(inventory: Path) -> None:
+    """Test that a compiled inventory loads the same users as the YAML files."""
+    artifact = inventory.parent / "users.aum"
+
+    compiled = compile_inventory(str(inventory), artifact)
+
+    assert is_inventory_artifact(artifact)
+    assert not is_inventory_artifact(inventory)
+    assert compiled == read_users_config(str(inventory))
+    assert load_inventory_artifact(artifact) == compiled
+
+
+def test_load_detects_changed_source(inventory: Path) -> None:
+    """Test that an artifact no longer matching its source files is rejected."""
+    artifact = inventory.parent / "users.aum"
+    compile_inventory(str(inventory), artifact)
+    changed = min(inventory.glob("*.yaml"))
+    changed.write_text(changed.read_text() + "\n# changed\n")
+
+    with pytest.raises(ValueError, match=changed.name):
+        load_inventory_artifact(artifact)
+
+
+def test_load_without_source(inventory: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Test that an artifact is loaded with a warning if its source inventory is gone."""
+    artifact = inventory.parent / "users.aum"
+    compiled = compile_inventory(str(inventory), artifact)
+    shutil.rmtree(inventory)
+
+    assert load_inventory_artifact(artifact) == compiled
+    assert "cannot check it is up to date" in caplog.text
+
+
+@pytest.mark.parametrize("content", [b"AUMI\x00\x02rest", b"AUMI\x00\x01not zlib", b"AU"])
+def test_load_invalid_artifact(tmp_path: Path, content: bytes) -> None:
+    """Test that artifacts of other versions or with corrupt content are rejected."""
+    artifact = tmp_path / "users.aum"
+    artifact.write_bytes(content)
+
+    with pytest.raises(ValueError, match="Invalid inventory artifact"):
+        load_inventory_artifact(artifact)
+
+
+def test_read_sync_config_accepts_artifact(inventory: Path) -> None:
+    """Test that the sync reads the users from a compiled inventory."""
+    artifact = inventory.parent / "users.aum"
+    compile_inventory(str(inventory), artifact)
+
+    from_yaml = read_sync_config(CONFIG_APP_SAMPLE, str(inventory))
+    from_artifact = read_sync_config(CONFIG_APP_SAMPLE, str(artifact))
+
+    assert from_artifact == from_yaml
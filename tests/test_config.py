@@ -5,8 +5,17 @@
 """Test _config.py."""
 
 import pytest
-
-from auth_user_mgr._config import read_app_and_users_config
+from ruamel.yaml import YAML, YAMLError
+
+from auth_user_mgr._config import (
+    _get_yaml,
+    _splice_groups_into_yaml_text,
+    get_yaml_file_paths,
+    parse_yaml_string_scalar,
+    read_app_and_users_config,
+    scan_inventory_files,
+)
+from auth_user_mgr._index import _load_canonical_yaml
 from tests.conftest import CONFIG_APP_SAMPLE
 
 CONFIG_USERS_DIR_SAMPLE = "tests/data/sample/users.sample"
@@ -125,3 +134,136 @@ def test_users_config_duplicates_case_insensitive(tmp_path) -> None:
     )
     with pytest.raises(ValueError):
         read_app_and_users_config(CONFIG_APP_SAMPLE, str(users_file))
+
+
+def test_get_yaml_file_paths_recursive_and_sorted(tmp_path) -> None:
+    """Test that nested YAML files are discovered in a deterministic, path-sorted order."""
+    for rel in ("b.yaml", "a/z.yml", "a/b/c.yaml", "a/notes.txt", ".hidden/x.yaml"):
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text("[]\n")
+
+    paths = get_yaml_file_paths(str(tmp_path))
+
+    assert [p.relative_to(tmp_path).as_posix() for p in paths] == [
+        "a/b/c.yaml",
+        "a/z.yml",
+        "b.yaml",
+    ]
+    assert [p.name for p in get_yaml_file_paths(str(tmp_path), recursive=False)] == ["b.yaml"]
+
+
+def test_get_yaml_file_paths_exclude(tmp_path) -> None:
+    """Test that exclude patterns skip matching files and prune matching directories."""
+    for rel in ("keep.yaml", "draft.yaml", "archive/old.yaml", "team/archive/old.yaml"):
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text("[]\n")
+
+    paths = get_yaml_file_paths(str(tmp_path), exclude=["archive", "draft.*"])
+
+    assert [p.relative_to(tmp_path).as_posix() for p in paths] == ["keep.yaml"]
+
+
+def test_scan_inventory_files_fingerprint_changes(tmp_path) -> None:
+    """Test that a file's fingerprint changes when its content changes."""
+    users_file = tmp_path / "users.yaml"
+    users_file.write_text("[]\n")
+    (before,) = scan_inventory_files(tmp_path)
+
+    users_file.write_text("- name: Alice\n  email: alice@example.com\n")
+    (after,) = scan_inventory_files(tmp_path)
+
+    assert before.path == after.path == users_file
+    assert before.fingerprint != after.fingerprint
+
+
+def _write_mixed_inventory(root) -> None:
+    """Write an inventory directory with one YAML, one JSON and one JSON Lines file."""
+    (root / "team.yaml").write_text("- name: Alice\n  email: alice@example.com\n")
+    (root / "hr.json").write_text('[{"name": "Bob", "email": "bob@example.com"}]')
+    (root / "hr" / "export.jsonl").parent.mkdir()
+    (root / "hr" / "export.jsonl").write_text(
+        '{"name": "Carol", "email": "carol@example.com", "groups": ["HR"]}\n'
+        "\n"
+        '{"name": "Dave", "email": "dave@example.com"}\n'
+    )
+
+
+def test_mixed_yaml_and_json_inventory(tmp_path) -> None:
+    """Test that JSON and JSON Lines files are read alongside YAML files."""
+    _write_mixed_inventory(tmp_path)
+
+    _, users_config = read_app_and_users_config(CONFIG_APP_SAMPLE, str(tmp_path))
+
+    assert [u["email"] for u in users_config] == [
+        "alice@example.com",
+        "bob@example.com",
+        "carol@example.com",
+        "dave@example.com",
+    ]
+    assert users_config[2]["groups"] == ["HR"]
+    assert [p.name for p in get_yaml_file_paths(str(tmp_path))] == ["team.yaml"]
+
+
+def test_json_inventory_duplicates_across_formats(tmp_path) -> None:
+    """Test that duplicate emails are detected across YAML and JSON Lines files."""
+    _write_mixed_inventory(tmp_path)
+    (tmp_path / "more.jsonl").write_text('{"name": "Alice 2", "email": "Alice@example.com"}\n')
+
+    with pytest.raises(ValueError, match="already been seen"):
+        read_app_and_users_config(CONFIG_APP_SAMPLE, str(tmp_path))
+
+
+def test_json_lines_inventory_errors(tmp_path) -> None:
+    """Test that invalid JSON Lines report their line number and entries are schema-validated."""
+    users_file = tmp_path / "users.jsonl"
+    users_file.write_text('{"name": "Alice", "email": "alice@example.com"}\n{"name": \n')
+    with pytest.raises(RuntimeError, match="line 2"):
+        read_app_and_users_config(CONFIG_APP_SAMPLE, str(users_file))
+
+    users_file.write_text('{"name": "Alice", "email": "alice@example.com", "groups": "x"}\n')
+    with pytest.raises(ValueError):
+        read_app_and_users_config(CONFIG_APP_SAMPLE, str(users_file))
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "Team A",
+        "Team  A   # comment",
+        "Jürgen O'Brien",
+        "'it''s'",
+        "'quoted'  # comment",
+        '"double"',
+        '"escaped\\tab"',
+        "''",
+        "yes",
+        "True",
+        "null",
+        "2024-01-01",
+        "42",
+        "C#",
+        "a #b",
+        "'a'#b",
+        "x: y",
+        "[a, b]",
+        "~",
+    ],
+)
+def test_parse_yaml_string_scalar_agrees_with_ruamel(value: str) -> None:
+    """Test that the scalar parser and both of its callers read values exactly like ruamel."""
+    try:
+        expected = YAML(typ="safe").load(f"- {value}\n")[0]
+        assert _get_yaml().load(f"- {value}\n")[0] == expected
+    except YAMLError:
+        expected = None
+
+    parsed = parse_yaml_string_scalar(value)
+    assert parsed is None or parsed == expected
+
+    text = f"- email: jane@example.com\n  groups:\n    - {value}\n"
+    loaded = _load_canonical_yaml(text)
+    assert loaded is None or loaded == [{"email": "jane@example.com", "groups": [expected]}]
+    spliced = _splice_groups_into_yaml_text(text, "jane@example.com", [])
+    assert spliced is None or spliced[1] == [expected]
+    # Strings in the canonical layout take the fast paths
+    assert (loaded is not None) == (spliced is not None) == (parsed is not None)
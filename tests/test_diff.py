@@ -0,0 +1,14 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _diff.py."""
+
+from auth_user_mgr._diff import diff_user_memberships
+
+
+def test_diff_user_memberships() -> None:
+    """Test comparing the groups of a single user."""
+    assert diff_user_memberships(["b", "a", "c"], ["d", "c", "e"]) == (["a", "b"], ["d", "e"])
+    assert diff_user_memberships([], []) == ([], [])
+    assert diff_user_memberships(["a"], ["a"]) == ([], [])
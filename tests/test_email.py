@@ -0,0 +1,216 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _email.py."""
+
+import os
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from auth_user_mgr._email import Mail, MailQueue
+from auth_user_mgr._spool import MailSpool
+from auth_user_mgr.main import UserSync, apply_sync, create_mail_sender
+from tests.smtp_sink import SMTPSink
+
+
+def make_mail(port: int, dry: bool = False, **kwargs: int) -> Mail:
+    """Create a Mail instance sending to a local SMTP server."""
+    return Mail(
+        smtp_server="127.0.0.1",
+        smtp_port=port,
+        smtp_user="user",
+        smtp_password="password",  # noqa: S106
+        smtp_starttls=False,
+        smtp_from="auth@example.com",
+        dry=dry,
+        **kwargs,
+    ).create_copy_with_details(
+        subject_suffix="Invitation", instance_url="https://auth.example.com", instance_title="Auth"
+    )
+
+
+def send_invitations(mail: Mail | MailQueue | MailSpool, count: int) -> None:
+    """Send `count` invitations to numbered recipients."""
+    for number in range(count):
+        mail.send_email(
+            message="invitation",
+            recipient=f"user{number}@example.com",
+            link="https://auth.example.com/invite",
+            invitation_expiry_days=30,
+        )
+
+
+def test_send_email_reuses_connection(smtp_sink: SMTPSink) -> None:
+    """Test that all emails are sent over one authenticated connection."""
+    mail = make_mail(smtp_sink.port)
+
+    send_invitations(mail, 5)
+    mail.close()
+
+    assert (smtp_sink.connections, smtp_sink.logins, smtp_sink.messages) == (1, 1, 5)
+    assert smtp_sink.recipients == [f"user{number}@example.com" for number in range(5)]
+
+
+def test_send_email_reconnects_after_client_limit(smtp_sink: SMTPSink) -> None:
+    """Test that the connection is re-opened after the configured number of messages."""
+    mail = make_mail(smtp_sink.port, max_messages_per_connection=2)
+
+    send_invitations(mail, 5)
+    mail.close()
+
+    assert (smtp_sink.connections, smtp_sink.logins, smtp_sink.messages) == (3, 3, 5)
+
+
+@pytest.mark.parametrize("server_limit", [1, 3])
+def test_send_email_reconnects_after_server_limit(server_limit: int) -> None:
+    """Test that no email is lost if the server closes the connection on a message limit."""
+    sink = SMTPSink(max_messages_per_connection=server_limit).start()
+    try:
+        mail = make_mail(sink.port)
+        send_invitations(mail, 6)
+        mail.close()
+    finally:
+        sink.stop()
+
+    assert sink.messages == 6
+    assert sink.connections == 6 // server_limit
+
+
+def test_send_email_dry(smtp_sink: SMTPSink) -> None:
+    """Test that a dry run neither connects nor sends."""
+    mail = make_mail(smtp_sink.port, dry=True)
+
+    send_invitations(mail, 2)
+    mail.close()
+
+    assert (smtp_sink.connections, smtp_sink.messages) == (0, 0)
+
+
+def test_template_compiled_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a template is read and compiled once, and again only after it changed."""
+    template_file = tmp_path / "invitation.html.j2"
+    template_file.write_text("Join {{ instance_title }}: {{ link }}")
+    mail = make_mail(0, dry=True)
+    read_template = MagicMock(wraps=mail.read_template)
+    monkeypatch.setattr(mail, "read_template", read_template)
+
+    first = mail.get_template("invitation", str(template_file))
+    assert mail.get_template("invitation", str(template_file)) is first
+    assert first.render(instance_title="Auth", link="x") == "Join Auth: x"
+    assert read_template.call_count == 1
+
+    template_file.write_text("Welcome to {{ instance_title }}")
+    os.utime(template_file, ns=(0, template_file.stat().st_mtime_ns + 1_000_000_000))
+    assert mail.get_template("invitation", str(template_file)).render(instance_title="Auth") == (
+        "Welcome to Auth"
+    )
+    assert read_template.call_count == 2
+
+
+def test_send_email_serialises_once(smtp_sink: SMTPSink, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a message is serialised once when sent, and not at all in a dry run."""
+    calls: list[MIMEMultipart] = []
+    original = MIMEMultipart.as_string
+
+    def as_string(msg: MIMEMultipart) -> str:
+        calls.append(msg)
+        return original(msg)
+
+    monkeypatch.setattr(MIMEMultipart, "as_string", as_string)
+
+    send_invitations(make_mail(smtp_sink.port, dry=True), 1)
+    assert len(calls) == 0
+
+    mail = make_mail(smtp_sink.port)
+    send_invitations(mail, 1)
+    mail.close()
+    assert len(calls) == 1
+    assert smtp_sink.messages == 1
+
+
+def test_mail_queue_delivers_in_background(smtp_sink: SMTPSink) -> None:
+    """Test that queued emails are all delivered by the workers, each with one connection."""
+    mail_queue = MailQueue(make_mail(smtp_sink.port), workers=2, maxsize=3)
+
+    send_invitations(mail_queue, 20)
+    mail_queue.close()
+
+    assert (mail_queue.sent, mail_queue.failures) == (20, [])
+    assert smtp_sink.messages == 20
+    assert sorted(smtp_sink.recipients) == sorted(f"user{n}@example.com" for n in range(20))
+    assert smtp_sink.connections <= 2
+    with pytest.raises(RuntimeError, match="closed"):
+        send_invitations(mail_queue, 1)
+
+
+def test_mail_queue_starts_workers_on_first_email() -> None:
+    """Test that no worker threads are started while there is nothing to send."""
+    before = threading.active_count()
+    mail_queue = MailQueue(make_mail(1), workers=2)
+
+    assert threading.active_count() == before
+    mail_queue.close()
+    assert (mail_queue.sent, mail_queue.failures) == (0, [])
+    with pytest.raises(RuntimeError, match="closed"):
+        send_invitations(mail_queue, 1)
+
+
+def test_mail_queue_abort_drops_queued_emails() -> None:
+    """Test that an aborted queue only waits for the email being sent, and drops the others."""
+    sink = SMTPSink(message_delay=0.2).start()
+    try:
+        mail_queue = MailQueue(make_mail(sink.port), workers=1, maxsize=0)
+        send_invitations(mail_queue, 10)
+        start = time.perf_counter()
+
+        mail_queue.abort()
+        mail_queue.close()
+
+        assert time.perf_counter() - start < 1
+    finally:
+        sink.stop()
+    assert mail_queue.sent <= 1
+    assert mail_queue.sent + len(mail_queue.failures) == 10
+    assert mail_queue.failures[-1] == ("user9@example.com", "Not sent, the run failed")
+
+
+def test_apply_sync_aborts_mail_queue_on_error(sample_sync: UserSync) -> None:
+    """Test that a failing sync drops the queued emails instead of waiting for them."""
+    mail_queue = MagicMock(spec=MailQueue)
+    sample_sync.sync_users = MagicMock(side_effect=ConnectionError("Authentik unreachable"))
+
+    with pytest.raises(ConnectionError):
+        apply_sync(sample_sync, [], mail_sender=mail_queue, all_groups_known=True)
+
+    assert [call[0] for call in mail_queue.method_calls] == ["abort", "close"]
+
+
+def test_create_mail_sender_dry() -> None:
+    """Test that dry runs and runs without emails log the emails without a queue."""
+    mail = make_mail(1, dry=True)
+
+    assert create_mail_sender(mail, mail_spool=None) is mail
+    assert isinstance(create_mail_sender(make_mail(1), mail_spool=None), MailQueue)
+
+
+def test_mail_queue_counts_failures() -> None:
+    """Test that emails which cannot be delivered are recorded as failures."""
+    sink = SMTPSink()
+    port = sink.port
+    sink.server_close()
+    mail_queue = MailQueue(make_mail(port), workers=1)
+
+    send_invitations(mail_queue, 2)
+    mail_queue.close()
+
+    assert mail_queue.sent == 0
+    assert [recipient for recipient, _ in mail_queue.failures] == [
+        "user0@example.com",
+        "user1@example.com",
+    ]
@@ -5,7 +5,6 @@
 """Tests for _helpers.py."""
 
 from auth_user_mgr._helpers import (
-    compare_two_lists,
     convert_dict_to_json,
     make_url,
     remove_path_from_url,
@@ -42,20 +41,3 @@ def test_make_url_with_empty_path_segments() -> None:
     """Test creating a URL with empty path segments."""
     url = make_url("https://example.com", "", "v1", "", "users")
     assert url == "https://example.com/v1/users"
-
-
-def test_compare_two_lists_basic() -> None:
-    """Test comparing two lists with some common and missing elements."""
-    list1 = ["a", "b"]
-    list2 = ["b", "c"]
-    missing_in_list1, common, missing_in_list2 = compare_two_lists(list1, list2)
-    assert sorted(missing_in_list1) == ["c"]
-    assert sorted(common) == ["b"]
-    assert sorted(missing_in_list2) == ["a"]
-
-
-def test_compare_two_lists_empty() -> None:
-    """Test comparing two empty lists."""
-    assert compare_two_lists([], []) == ([], [], [])
-    assert compare_two_lists(["a"], []) == ([], [], ["a"])
-    assert compare_two_lists([], ["b"]) == (["b"], [], [])
@@ -4,16 +4,26 @@
 
 """Test import functionality: CSV parsing, YAML updating, and CLI integration."""
 
+import io
 import textwrap
 from pathlib import Path
 
 import pytest
 
 from auth_user_mgr._config import (
+    CsvUserReader,
+    YamlUserIndex,
+    _get_yaml,
+    _prettify_yaml_formatting,
+    _splice_groups_into_yaml_text,
+    _update_user_groups_round_trip,
     append_user_to_yaml_file,
+    append_users_to_yaml_file,
+    load_yaml_file,
     parse_csv_users,
     update_user_groups_in_yaml_files,
 )
+from auth_user_mgr.main import run_import
 
 CSV_FIXTURE = "tests/data/users.import.csv"
 
@@ -85,6 +95,36 @@ class TestParseCsvUsers:
         assert "username" not in users[0]
 
 
+class TestCsvUserReader:
+    """Tests for the streaming CsvUserReader."""
+
+    def test_chunks_and_deduplication(self, tmp_path: Path) -> None:
+        """Test that rows are yielded in chunks and repeated emails are skipped."""
+        csv_file = tmp_path / "users.csv"
+        rows = [f"User {i}, user{i}@example.com" for i in range(5)]
+        csv_file.write_text("name, email\n" + "\n".join([*rows, "Again, USER0@example.com"]))
+
+        reader = CsvUserReader(str(csv_file), chunk_size=2)
+        chunks = list(reader)
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert reader.rows_read == 6
+        assert reader.users_yielded == 5
+        assert reader.duplicates == 1
+
+    def test_lenient_mode_reports_line_numbers(self, tmp_path: Path) -> None:
+        """Test that invalid rows are skipped and recorded with their line number."""
+        csv_file = tmp_path / "users.csv"
+        csv_file.write_text("name, email\nAlice, alice@x.com\nBob, bad\nCarol, carol@x.com\n")
+
+        reader = CsvUserReader(str(csv_file), chunk_size=10, strict=False)
+        users = [user for chunk in reader for user in chunk]
+
+        assert [u["name"] for u in users] == ["Alice", "Carol"]
+        assert reader.invalid == 1
+        assert "line 3" in reader.errors[0]
+
+
 # --- Tests for update_user_groups_in_yaml_files ---
 
 
@@ -364,6 +404,85 @@ class TestUpdateUserGroupsInYamlFiles:
         assert "Group 3" not in file1.read_text()
 
 
+class TestSpliceGroupsIntoYamlText:
+    """Tests for the text-level group merge used by update_user_groups_in_yaml_files."""
+
+    CANONICAL = (
+        "# Users\n"
+        "- name: Alice\n"
+        "  email: alice@example.com\n"
+        "  groups:\n"
+        "    - Group 1\n"
+        "\n"
+        "# Section Two\n"
+        "- name: Bob\n"
+        "  email: bob@example.com\n"
+        "\n"
+        "- name: Carol\n"
+        "  email: carol@example.com\n"
+        "  groups:\n"
+        "    - Group 2\n"
+    )
+
+    @pytest.mark.parametrize("email", ["alice@example.com", "carol@example.com"])
+    def test_matches_round_trip(self, tmp_path: Path, email: str) -> None:
+        """Test that splicing gives the same result as a full round-trip on canonical files."""
+        round_trip_file = tmp_path / "round_trip.yaml"
+        round_trip_file.write_text(self.CANONICAL)
+        _update_user_groups_round_trip(
+            round_trip_file, self.CANONICAL, email, ["Group 3", "Group 0"], dry=False
+        )
+
+        spliced = _splice_groups_into_yaml_text(self.CANONICAL, email, ["Group 3", "Group 0"])
+
+        assert spliced is not None
+        assert spliced[0] == round_trip_file.read_text()
+
+    def test_missing_groups_key_added(self) -> None:
+        """Test that a groups key is added at the end of the user, before the blank line."""
+        spliced = _splice_groups_into_yaml_text(self.CANONICAL, "bob@example.com", ["Group 3"])
+
+        assert spliced is not None
+        assert "  email: bob@example.com\n  groups:\n    - Group 3\n\n- name: Carol\n" in spliced[0]
+
+    def test_other_lines_untouched(self, tmp_path: Path) -> None:
+        """Test that only the new group lines are added, leaving odd formatting elsewhere."""
+        yaml_file = tmp_path / "users.yaml"
+        original = (
+            "- name:   'Alice'   # odd spacing\n"
+            '  email: "alice@example.com"\n'
+            "  groups:\n"
+            "  - Group 1  # comment\n"
+            "- {name: Bob, email: bob@example.com}\n"
+        )
+        yaml_file.write_text(original)
+
+        assert update_user_groups_in_yaml_files([yaml_file], "ALICE@example.com", ["Group 2"])
+
+        assert yaml_file.read_text() == original.replace(
+            "  - Group 1  # comment\n", "  - Group 1  # comment\n  - Group 2\n"
+        )
+        assert list(tmp_path.iterdir()) == [yaml_file]  # no temporary files left
+
+    def test_special_group_names_are_quoted(self) -> None:
+        """Test that group names needing quotes in YAML are rendered as strings."""
+        spliced = _splice_groups_into_yaml_text(self.CANONICAL, "bob@example.com", ["yes", "a: b"])
+
+        assert spliced is not None
+        data = _get_yaml().load(spliced[0])
+        assert list(data[1]["groups"]) == ["a: b", "yes"]
+
+    def test_flow_style_falls_back(self, tmp_path: Path) -> None:
+        """Test that flow-style groups cannot be spliced but are updated via round-trip."""
+        text = "- name: Alice\n  email: alice@example.com\n  groups: [Group 1]\n"
+        assert _splice_groups_into_yaml_text(text, "alice@example.com", ["Group 2"]) is None
+
+        yaml_file = tmp_path / "users.yaml"
+        yaml_file.write_text(text)
+        assert update_user_groups_in_yaml_files([yaml_file], "alice@example.com", ["Group 2"])
+        assert list(load_yaml_file(yaml_file)[0]["groups"]) == ["Group 1", "Group 2"]
+
+
 # --- Tests for append_user_to_yaml_file ---
 
 
@@ -454,6 +573,188 @@ class TestAppendUserToYamlFile:
         assert "\n\n- name: Bob\n" in content
 
 
+class TestAppendUsersToYamlFile:
+    """Tests for the batched append_users_to_yaml_file function."""
+
+    @staticmethod
+    def _full_redump(path: Path, user_dicts: list[dict]) -> str:
+        """Return the content a full load, append and dump of the file would produce."""
+        yml = _get_yaml()
+        data = yml.load(path.read_text())
+        data.extend(user_dicts)
+        stream = io.StringIO()
+        yml.dump(data, stream, transform=_prettify_yaml_formatting)
+        return stream.getvalue()
+
+    @pytest.mark.parametrize(
+        "existing",
+        [
+            "- name: Alice\n  email: alice@example.com\n  groups:\n    - Event\n",
+            "# Participants\n- name: Alice\n  email: alice@example.com\n",
+            "- name: Alice\n  email: alice@example.com\n\n- name: Carol\n  email: c@example.com\n",
+        ],
+    )
+    def test_text_append_matches_full_redump(self, tmp_path: Path, existing: str) -> None:
+        """Test that appending as text gives the same content as a full re-dump."""
+        yaml_file = tmp_path / "users.yaml"
+        yaml_file.write_text(existing)
+        new_users = [
+            {"name": "Bob", "email": "bob@example.com", "groups": ["Board", "Event"]},
+            {"name": "Dan", "email": "dan@example.com", "username": "dan.custom"},
+        ]
+        expected = self._full_redump(yaml_file, new_users)
+
+        append_users_to_yaml_file(file_path=yaml_file, user_dicts=new_users)
+
+        assert yaml_file.read_text() == expected
+
+    def test_irregular_file_falls_back_to_redump(self, tmp_path: Path) -> None:
+        """Test that a flow-style document is re-dumped instead of appended to as text."""
+        yaml_file = tmp_path / "users.yaml"
+        yaml_file.write_text("[{name: Alice, email: alice@example.com}]\n")
+
+        append_users_to_yaml_file(
+            file_path=yaml_file, user_dicts=[{"name": "Bob", "email": "bob@example.com"}]
+        )
+
+        data = load_yaml_file(yaml_file)
+        assert [u["email"] for u in data] == ["alice@example.com", "bob@example.com"]
+
+    def test_crlf_line_endings_kept(self, tmp_path: Path) -> None:
+        """Test that users appended to a file with Windows line endings get them as well."""
+        yaml_file = tmp_path / "users.yaml"
+        yaml_file.write_bytes(b"- name: Alice\r\n  email: alice@example.com\r\n")
+
+        append_users_to_yaml_file(
+            file_path=yaml_file, user_dicts=[{"name": "Bob", "email": "bob@example.com"}]
+        )
+
+        content = yaml_file.read_bytes()
+        assert content == (
+            b"- name: Alice\r\n  email: alice@example.com\r\n"
+            b"\r\n- name: Bob\r\n  email: bob@example.com\r\n"
+        )
+
+
+# --- Tests for YamlUserIndex ---
+
+
+class TestYamlUserIndex:
+    """Tests for the YamlUserIndex batch editor."""
+
+    def test_each_file_written_once(self, tmp_path: Path) -> None:
+        """Test that several merges into one file result in a single write of that file."""
+        file1 = tmp_path / "group1.yaml"
+        file2 = tmp_path / "group2.yaml"
+        file1.write_text(
+            "# Team 1\n"
+            "- name: Alice\n"
+            "  email: alice@example.com\n"
+            "  groups:\n"
+            "    - Group 1\n"
+            "\n"
+            "- name: Bob\n"
+            "  email: bob@example.com\n"
+        )
+        file2.write_text("- name: Carol\n  email: carol@example.com\n")
+        untouched = file2.read_text()
+
+        index = YamlUserIndex([file1, file2])
+        assert index.merge_groups("alice@example.com", ["Group 2"])
+        assert index.merge_groups("BOB@example.com", ["Group 2"])
+        assert not index.merge_groups("dave@example.com", ["Group 2"])
+
+        assert index.save() == [file1]
+        content = file1.read_text()
+        assert content.startswith("# Team 1\n")
+        assert "    - Group 1\n    - Group 2\n" in content
+        assert "\n\n- name: Bob\n" in content
+        assert file2.read_text() == untouched
+
+    def test_added_user_is_indexed(self, tmp_path: Path) -> None:
+        """Test that a newly added user is found by later merges and written once."""
+        output = tmp_path / "new.yaml"
+        index = YamlUserIndex([])
+
+        index.add_user(output, {"name": "Bob", "email": "bob@example.com", "groups": ["Event"]})
+        assert index.merge_groups("bob@example.com", ["Event", "Board"])
+
+        assert index.save() == [output]
+        content = output.read_text()
+        assert content.count("bob@example.com") == 1
+        assert "    - Event\n    - Board\n" in content
+
+    def test_existing_output_only_appended(self, tmp_path: Path) -> None:
+        """Test that a file only receiving new users keeps its existing text untouched."""
+        output = tmp_path / "event.yaml"
+        # Quoting style that a full ruamel round-trip would not necessarily keep byte-identical
+        original = "- name: 'Alice'   # first participant\n  email: alice@example.com\n"
+        output.write_text(original)
+
+        index = YamlUserIndex([output])
+        index.add_user(output, {"name": "Bob", "email": "bob@example.com", "groups": ["Event"]})
+        index.save()
+
+        content = output.read_text()
+        assert content.startswith(original)
+        assert content.endswith("\n- name: Bob\n  email: bob@example.com\n  groups:\n    - Event\n")
+
+    def test_flush_appended_releases_new_users(self, tmp_path: Path) -> None:
+        """Test that flushed new users are written and released, and still found afterwards."""
+        output = tmp_path / "event.yaml"
+        output.write_text("- name: Alice\n  email: alice@example.com\n")
+        index = YamlUserIndex([output])
+        index.add_user(output, {"name": "Bob", "email": "bob@example.com", "groups": ["Event"]})
+
+        assert index.flush_appended() == [output]
+
+        assert index.documents[output][1] == [{"name": "Alice", "email": "alice@example.com"}]
+        assert "bob@example.com" not in index.entries_by_email
+        assert "- name: Bob\n" in output.read_text()
+        assert index.merge_groups("bob@example.com", ["Board"])
+        assert index.merge_groups("alice@example.com", ["Board"])
+        index.add_user(output, {"name": "Carol", "email": "carol@example.com"})
+        assert index.flush_appended() == []
+
+        assert index.save() == [output]
+        data = load_yaml_file(output)
+        assert [u["email"] for u in data] == [
+            "alice@example.com",
+            "bob@example.com",
+            "carol@example.com",
+        ]
+        assert data[0]["groups"] == ["Board"]
+        assert data[1]["groups"] == ["Event", "Board"]
+
+    def test_crlf_line_endings_kept(self, tmp_path: Path) -> None:
+        """Test that merged groups keep the Windows line endings of a file."""
+        yaml_file = tmp_path / "users.yaml"
+        yaml_file.write_bytes(b"- name: Alice\r\n  email: alice@example.com\r\n")
+
+        index = YamlUserIndex([yaml_file])
+        index.merge_groups("alice@example.com", ["Group 1"])
+        index.save()
+
+        content = yaml_file.read_bytes()
+        assert b"  groups:\r\n    - Group 1\r\n" in content
+        assert b"\n" not in content.replace(b"\r\n", b"")
+
+    def test_dry_run_does_not_write(self, tmp_path: Path) -> None:
+        """Test that saving in dry mode reports but does not write files."""
+        yaml_file = tmp_path / "users.yaml"
+        yaml_file.write_text("- name: Alice\n  email: alice@example.com\n")
+        original = yaml_file.read_text()
+        output = tmp_path / "new.yaml"
+
+        index = YamlUserIndex([yaml_file])
+        index.merge_groups("alice@example.com", ["Group 1"], dry=True)
+        index.add_user(output, {"name": "Bob", "email": "bob@example.com"}, dry=True)
+
+        assert index.save(dry=True) == [yaml_file, output]
+        assert yaml_file.read_text() == original
+        assert not output.exists()
+
+
 # --- Integration test for run_import ---
 
 
@@ -515,3 +816,105 @@ class TestRunImport:
         assert "Group B" in output_content
         # Existing user should NOT be in output file
         assert "tester@example.com" not in output_content
+
+    def test_run_import_duplicate_csv_rows(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture
+    ) -> None:
+        """Test run_import end to end, including a new user listed twice in the CSV."""
+        users_dir = tmp_path / "users"
+        users_dir.mkdir()
+        existing_file = users_dir / "existing.yaml"
+        existing_file.write_text(
+            "- name: Tester Testerson\n  email: tester@example.com\n  groups:\n    - Old Group\n"
+        )
+        csv_file = tmp_path / "import.csv"
+        csv_file.write_text(
+            "name, email\n"
+            "Tester Testerson, tester@example.com\n"
+            "New User, new@example.com\n"
+            "New User, NEW@example.com\n"
+        )
+        output_file = users_dir / "event.yaml"
+
+        run_import(
+            input_file=str(csv_file),
+            groups_args="Group A, Group B",
+            output=str(output_file),
+            users=str(users_dir),
+            dry=False,
+        )
+
+        assert "    - Old Group\n    - Group A\n    - Group B\n" in existing_file.read_text()
+        assert output_file.read_text().count("new@example.com") == 1
+        captured = capsys.readouterr()
+        assert "Added to" in captured.out
+        assert "Updated in existing files: 1" in captured.out
+        assert "Skipped duplicate rows: 1" in captured.out
+
+    def test_run_import_stream_skips_invalid_rows(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture
+    ) -> None:
+        """Test that streaming mode reports invalid rows with line numbers and imports the rest."""
+        csv_file = tmp_path / "import.csv"
+        csv_file.write_text(
+            "name, email\nAlice, alice@example.com\nBroken, not-an-email\nBob, bob@example.com\n"
+        )
+        output_file = tmp_path / "event.yaml"
+
+        run_import(
+            input_file=str(csv_file),
+            groups_args="Event",
+            output=str(output_file),
+            users=str(tmp_path / "missing"),
+            dry=False,
+            stream=True,
+        )
+
+        content = output_file.read_text()
+        assert "alice@example.com" in content
+        assert "bob@example.com" in content
+        assert "not-an-email" not in content
+        captured = capsys.readouterr()
+        assert "Skipped invalid rows: 1" in captured.out
+        assert "line 3" in captured.out
+
+    def test_run_import_without_stream_aborts_on_invalid_row(self, tmp_path: Path) -> None:
+        """Test that the default mode validates the whole CSV before writing anything."""
+        csv_file = tmp_path / "import.csv"
+        csv_file.write_text("name, email\nAlice, alice@example.com\nBroken, not-an-email\n")
+        output_file = tmp_path / "event.yaml"
+
+        with pytest.raises(ValueError, match="line 3"):
+            run_import(
+                input_file=str(csv_file),
+                groups_args="Event",
+                output=str(output_file),
+                users=str(tmp_path / "missing"),
+                dry=False,
+            )
+        assert not output_file.exists()
+
+    def test_run_import_json_inventory_not_modified(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Test that users in generated JSON Lines files are found, but the file is untouched."""
+        users_dir = tmp_path / "users"
+        users_dir.mkdir()
+        export = users_dir / "hr.jsonl"
+        export.write_text('{"name": "Alice", "email": "alice@example.com"}\n')
+        csv_file = tmp_path / "import.csv"
+        csv_file.write_text("name, email\nAlice, alice@example.com\nBob, bob@example.com\n")
+        output_file = users_dir / "event.yaml"
+
+        run_import(
+            input_file=str(csv_file),
+            groups_args="Event",
+            output=str(output_file),
+            users=str(users_dir),
+            dry=False,
+        )
+
+        assert export.read_text() == '{"name": "Alice", "email": "alice@example.com"}\n'
+        assert "alice@example.com" not in output_file.read_text()
+        assert "Updated in existing files: 1" in capsys.readouterr().out
+        assert "is not modified" in caplog.text
@@ -0,0 +1,115 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _incremental.py and the incremental sync."""
+
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from auth_user_mgr._api import AuthentikAPI
+from auth_user_mgr._incremental import diff_inventory_since
+from auth_user_mgr._user import RemoteUser
+from auth_user_mgr.main import get_remote_state_for_users
+
+ALICE = "- name: Alice\n  email: alice@example.com\n  groups:\n    - Team A\n"
+BOB = "- name: Bob\n  email: bob@example.com\n"
+CAROL = "- name: Carol\n  email: carol@example.com\n"
+
+
+@pytest.fixture(name="repo")
+def fixture_repo(tmp_path: Path, run_git: Callable[..., None]) -> Path:
+    """Create a git repository with a committed inventory of three users in two files."""
+    (tmp_path / "a.yaml").write_text(f"{ALICE}\n{BOB}")
+    (tmp_path / "c.yaml").write_text(CAROL)
+    run_git(tmp_path, "init", "-q")
+    run_git(tmp_path, "add", ".")
+    run_git(tmp_path, "commit", "-q", "-m", "initial")
+    return tmp_path
+
+
+def test_no_changes(repo: Path) -> None:
+    """Test that an unchanged inventory yields no users to sync."""
+    assert diff_inventory_since(str(repo), "HEAD") == ([], [])
+
+
+def test_checkout_untouched(repo: Path) -> None:
+    """Test that comparing the inventory writes nothing into the checkout, e.g. an index."""
+    (repo / "c.yaml").write_text(CAROL.replace("Carol", "Caroline"))
+
+    diff_inventory_since(str(repo), "HEAD")
+
+    assert sorted(p.name for p in repo.iterdir()) == [".git", "a.yaml", "c.yaml"]
+
+
+def test_added_changed_and_removed_users(repo: Path) -> None:
+    """Test that added, changed and removed users are detected, and unchanged ones skipped."""
+    (repo / "a.yaml").write_text(f"{ALICE}    - Team B\n")
+    (repo / "d.jsonl").write_text('{"name": "Dave", "email": "dave@example.com"}\n')
+
+    changed, removed = diff_inventory_since(str(repo), "HEAD")
+
+    assert [user["email"] for user in changed] == ["alice@example.com", "dave@example.com"]
+    assert changed[0]["groups"] == ["Team A", "Team B"]
+    assert removed == ["bob@example.com"]
+
+
+def test_moved_user_not_reported(repo: Path, run_git: Callable[..., None]) -> None:
+    """Test that a user moved unchanged to another file is not synchronised again."""
+    (repo / "a.yaml").write_text(ALICE)
+    (repo / "c.yaml").write_text(f"{CAROL}\n{BOB}")
+    run_git(repo, "commit", "-q", "-am", "move Bob")
+
+    assert diff_inventory_since(str(repo), "HEAD~1") == ([], [])
+
+
+def test_deleted_file(repo: Path) -> None:
+    """Test that all users of a deleted inventory file are reported as removed."""
+    (repo / "c.yaml").unlink()
+
+    assert diff_inventory_since(str(repo), "HEAD") == ([], ["carol@example.com"])
+
+
+def test_ignores_hidden_and_excluded_files(repo: Path) -> None:
+    """Test that changes outside of the inventory do not count."""
+    (repo / ".hidden.yaml").write_text(BOB.replace("Bob", "Hidden"))
+    (repo / "skip").mkdir()
+    (repo / "skip" / "e.yaml").write_text(BOB.replace("bob", "eve"))
+    (repo / "notes.txt").write_text("not an inventory")
+
+    assert diff_inventory_since(str(repo), "HEAD", exclude=["skip"]) == ([], [])
+
+
+def test_invalid_inventory_rejected(repo: Path) -> None:
+    """Test that an incremental sync refuses to run on an invalid inventory."""
+    (repo / "c.yaml").write_text(f"{CAROL}\n{BOB}")
+
+    with pytest.raises(ValueError, match="1 errors"):
+        diff_inventory_since(str(repo), "HEAD")
+
+
+def test_unknown_revision(repo: Path) -> None:
+    """Test that an unknown revision is reported as a ValueError."""
+    with pytest.raises(ValueError, match="no-such-rev"):
+        diff_inventory_since(str(repo), "no-such-rev")
+
+
+def test_get_remote_state_for_users(sample_api: AuthentikAPI, mock_api_call: callable) -> None:
+    """Test that the remote state is fetched by email for the given users only."""
+    mock_get = mock_api_call("GET", "core-users-GET-filter.json")
+
+    users_by_email, users_groups, group_cache = get_remote_state_for_users(
+        sample_api, ["Tester@Example.com"]
+    )
+
+    assert users_by_email == {
+        "tester@example.com": RemoteUser(1, "tester@example.com", "tester.testerson", "internal")
+    }
+    assert users_groups.get(1) == ["Group 1", "Group 2"]
+    assert group_cache == {
+        "Group 1": "6e981209-8621-4484-993d-dc9882a8747c",
+        "Group 2": "ba911f0c-236f-420c-82d0-76503500061a",
+    }
+    assert mock_get.call_args[1]["params"]["email"] == "Tester@Example.com"
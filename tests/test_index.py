@@ -0,0 +1,212 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _index.py."""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+from ruamel.yaml import YAML
+
+from auth_user_mgr._config import YamlUserIndex, update_user_groups_in_yaml_files
+from auth_user_mgr._index import (
+    INDEX_FILE_NAME,
+    INDEX_VERSION,
+    InventoryIndex,
+    _load_canonical_yaml,
+    index_path_for,
+)
+from auth_user_mgr.main import run_import, run_lookup
+
+ALICE = "- name: Alice\n  email: Alice@Example.com\n  username: alice\n  groups:\n    - Team A\n"
+BOB = "- name: Bob\n  email: bob@example.com\n"
+CAROL = "- name: Carol\n  email: carol@example.com\n  groups:\n    - Team C\n"
+
+
+@pytest.fixture(name="inventory")
+def fixture_inventory(tmp_path: Path) -> Path:
+    """Create an inventory directory with two nested files."""
+    (tmp_path / "team").mkdir()
+    (tmp_path / "a.yaml").write_text(f"{ALICE}\n{BOB}")
+    (tmp_path / "team" / "c.yaml").write_text(CAROL)
+    return tmp_path
+
+
+def _bump_mtime(path: Path) -> None:
+    """Move a file's modification time forward, so its fingerprint changes."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_lookup_by_email_and_username(inventory: Path) -> None:
+    """Test that users are found case-insensitively by email or username."""
+    index = InventoryIndex.open(inventory, persist=True)
+
+    assert index_path_for(inventory) == inventory / INDEX_FILE_NAME
+    assert index.index_path.is_file()
+    entry = index.lookup("alice@example.COM")
+    assert entry is not None
+    assert (entry.path, entry.position) == (inventory / "a.yaml", 0)
+    assert index.lookup("ALICE") == entry
+    assert index.lookup("carol@example.com").path == inventory / "team" / "c.yaml"
+    assert index.lookup("bob@example.com").position == 1
+    assert index.lookup("nobody@example.com") is None
+
+
+def test_incremental_rebuild(inventory: Path) -> None:
+    """Test that only changed files are parsed again when the index is reopened."""
+    InventoryIndex.open(inventory, persist=True)
+
+    # Unchanged content with a new mtime is re-hashed, but not parsed again
+    _bump_mtime(inventory / "a.yaml")
+    (inventory / "team" / "c.yaml").write_text(CAROL.replace("Team C", "Team D"))
+    index = InventoryIndex.open(inventory, persist=True)
+
+    assert index.reparsed == [inventory / "team" / "c.yaml"]
+    assert index.lookup("alice") is not None
+
+    # Nothing changed: the index file is not rewritten
+    mtime = index.index_path.stat().st_mtime_ns
+    assert InventoryIndex.open(inventory, persist=True).reparsed == []
+    assert index.index_path.stat().st_mtime_ns == mtime
+
+
+def test_content_hash_changes_with_entry(inventory: Path) -> None:
+    """Test that an entry's content hash changes only if the entry itself changes."""
+    index = InventoryIndex.open(inventory)
+    alice, bob = index.lookup("alice"), index.lookup("bob@example.com")
+    (inventory / "a.yaml").write_text(f"{ALICE}\n{BOB}  groups:\n    - Team B\n")
+    index = InventoryIndex.open(inventory)
+
+    assert index.lookup("alice").content_hash == alice.content_hash
+    assert index.lookup("bob@example.com").content_hash != bob.content_hash
+
+
+@pytest.mark.parametrize(
+    "stored",
+    ["{not json", json.dumps({"version": 0, "files": {}}), json.dumps(["unexpected"])],
+)
+def test_invalid_index_file_is_rebuilt(inventory: Path, stored: str) -> None:
+    """Test that a corrupt or outdated index file is discarded and rebuilt."""
+    index_path_for(inventory).write_text(stored)
+
+    index = InventoryIndex.open(inventory, persist=True)
+
+    assert len(index.reparsed) == 2
+    assert json.loads(index.index_path.read_text())["version"] == INDEX_VERSION
+
+
+def test_lookup_detects_changed_file(inventory: Path) -> None:
+    """Test that a lookup into a file changed after refreshing triggers a refresh."""
+    index = InventoryIndex.open(inventory)
+    (inventory / "a.yaml").write_text(f"{BOB}\n{ALICE}")
+    _bump_mtime(inventory / "a.yaml")
+
+    assert index.lookup("alice@example.com").position == 1
+
+
+def test_update_groups_only_touches_indexed_file(inventory: Path) -> None:
+    """Test that group merges with an index skip files not containing the user."""
+    # A file mentioning the email in a comment, which the plain substring check would parse
+    other = inventory / "b.yaml"
+    other.write_text("# Formerly carol@example.com\n- name: Dave\n  email: dave@example.com\n")
+    index = InventoryIndex.open(inventory)
+    paths = [inventory / "a.yaml", other, inventory / "team" / "c.yaml"]
+
+    assert update_user_groups_in_yaml_files(paths, "carol@example.com", ["Event"], index=index)
+    assert "    - Event\n" in (inventory / "team" / "c.yaml").read_text()
+    assert not update_user_groups_in_yaml_files(paths, "nobody@example.com", ["X"], index=index)
+
+
+def test_yaml_user_index_loads_files_lazily(inventory: Path) -> None:
+    """Test that the batch index only parses files of users that are looked up."""
+    paths = [inventory / "a.yaml", inventory / "team" / "c.yaml"]
+    index = YamlUserIndex(paths, inventory_index=InventoryIndex.open(inventory))
+
+    assert index.documents == {}
+    assert index.merge_groups("carol@example.com", ["Event"])
+    assert list(index.documents) == [inventory / "team" / "c.yaml"]
+    assert not index.merge_groups("nobody@example.com", ["Event"])
+
+
+def test_run_import_with_index(inventory: Path, capsys: pytest.CaptureFixture) -> None:
+    """Test that an import with --index updates users and keeps the index current."""
+    csv_file = inventory / "import.csv"
+    csv_file.write_text("name,email\nBob,bob@example.com\nNew,new@example.com\n")
+    output = inventory / "new.yaml"
+
+    run_import(str(csv_file), "Event", str(output), str(inventory), dry=False, use_index=True)
+
+    assert "bob@example.com\n  groups:\n    - Event\n" in (inventory / "a.yaml").read_text()
+    assert "Updated in existing files: 1" in capsys.readouterr().out
+    index = InventoryIndex.open(inventory, persist=True)
+    assert index.reparsed == []
+    assert index.lookup("new@example.com").path == output
+
+
+def test_run_lookup(inventory: Path, capsys: pytest.CaptureFixture) -> None:
+    """Test the lookup command output and its count of unknown keys."""
+    assert run_lookup(str(inventory), ["carol@example.com", "nobody"]) == 1
+
+    out = capsys.readouterr().out
+    assert f"carol@example.com: {inventory / 'team' / 'c.yaml'} (entry 1)" in out
+    assert "nobody: not found" in out
+
+
+def test_run_lookup_leaves_inventory_untouched(inventory: Path) -> None:
+    """Test that a lookup without --index writes nothing into the inventory directory."""
+    before = sorted(inventory.rglob("*"))
+
+    assert run_lookup(str(inventory), ["alice"]) == 0
+
+    assert sorted(inventory.rglob("*")) == before
+
+
+def test_run_lookup_with_index(inventory: Path) -> None:
+    """Test that a lookup with --index creates the persistent index."""
+    assert run_lookup(str(inventory), ["alice"], use_index=True) == 0
+
+    assert index_path_for(inventory).is_file()
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        f"# Team\n{ALICE}\n{BOB}",
+        "- name: 'yes'\n  email: \"b@example.com\"\n  groups:\n\n    # Board\n    - Board\n",
+        "- name: Jürgen O'Brien\n  groups:\n- name: ''\n",
+        "- name: Alice  # comment\n  groups:\n    - 'it''s'  # quoted\n",
+    ],
+)
+def test_load_canonical_yaml(text: str) -> None:
+    """Test that files in the canonical layout are read exactly like a YAML parser does."""
+    assert _load_canonical_yaml(text) == YAML(typ="safe").load(text)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "- name: yes\n",  # A boolean in YAML 1.1
+        "- name: 2024-01-01\n",
+        "- name: Alice\n  groups:\n  - Team A\n",
+        "- name: Alice\n  name: Bob\n",
+        "---\n- name: Alice\n",
+        "[]\n",
+    ],
+)
+def test_load_canonical_yaml_other_layouts(text: str) -> None:
+    """Test that anything beyond the canonical layout is left to the YAML parser."""
+    assert _load_canonical_yaml(text) is None
+
+
+def test_open_without_persisting(inventory: Path) -> None:
+    """Test that an index opened without persisting neither reads nor writes the index file."""
+    index_path_for(inventory).write_text("not json")
+
+    index = InventoryIndex.open(inventory)
+
+    assert index.lookup("bob@example.com") is not None
+    assert index_path_for(inventory).read_text() == "not json"
@@ -0,0 +1,121 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _logging.py."""
+
+import json
+import logging
+import sys
+from collections.abc import Iterator
+
+import pytest
+
+from auth_user_mgr._logging import (
+    JsonFormatter,
+    TruncatingFilter,
+    setup_handlers,
+    stop_queue,
+    truncate_arg,
+)
+from auth_user_mgr.main import configure_logger
+
+
+@pytest.fixture(name="restore_logging")
+def fixture_restore_logging() -> Iterator[None]:
+    """Restore the handlers and level of the root logger after a test."""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    stop_queue()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def make_record(msg: str, *args: object) -> logging.LogRecord:
+    """Create a log record as logging.info would."""
+    return logging.LogRecord("root", logging.INFO, __file__, 1, msg, args, None)
+
+
+def fail(exc: Exception) -> None:
+    """Raise the given exception, to log it while it is handled."""
+    raise exc
+
+
+def test_truncate_arg() -> None:
+    """Test that only long values are shortened, and numbers are kept."""
+    payload = {"name": "x" * 100}
+
+    assert truncate_arg(payload, 200) is payload
+    assert truncate_arg(payload, 20) == "{'name': 'xxxxxxxxxx... (112 characters)"
+    assert truncate_arg(10**30, 5) == 10**30
+
+
+def test_truncating_filter() -> None:
+    """Test that the arguments of a record are shortened, but not its message template."""
+    record = make_record(
+        "API call: %s %s with data %s", "POST", "https://auth.example.com", "y" * 50
+    )
+
+    assert TruncatingFilter(10).filter(record)
+
+    assert record.getMessage() == (
+        "API call: POST https://au... (24 characters) with data yyyyyyyyyy... (50 characters)"
+    )
+
+
+def test_truncating_filter_mapping() -> None:
+    """Test that the values of a single mapping argument are shortened."""
+    record = make_record("User %s", {"add_to_groups": "g" * 50})
+
+    TruncatingFilter(10).filter(record)
+
+    assert record.args == {"add_to_groups": "gggggggggg... (50 characters)"}
+
+
+def test_json_formatter() -> None:
+    """Test that a record becomes a line of JSON, with the traceback apart from the message."""
+    try:
+        fail(ValueError("boom"))
+    except ValueError:
+        record = logging.LogRecord(
+            "root", logging.ERROR, __file__, 1, "Failed: %s", ("sync",), sys.exc_info()
+        )
+
+    line = JsonFormatter().format(record)
+
+    assert "\n" not in line
+    data = json.loads(line)
+    assert data["level"] == "ERROR"
+    assert data["message"] == "Failed: sync"
+    assert data["exception"].endswith("ValueError: boom")
+
+
+@pytest.mark.usefixtures("restore_logging")
+def test_queued_json_logging(capsys: pytest.CaptureFixture) -> None:
+    """Test that queued records are written as JSON lines once the queue is stopped."""
+    setup_handlers(json_lines=True, queued=True, max_arg_length=10)
+    logging.getLogger().setLevel(logging.INFO)
+
+    logging.info("API call with data %s", {"pk": "1" * 50})
+    try:
+        fail(ConnectionError("unreachable"))
+    except ConnectionError:
+        logging.exception("Request failed")
+    stop_queue()
+
+    lines = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert lines[0]["message"] == "API call with data {'pk': '1111111111... (50 characters)'}"
+    assert lines[1]["message"] == "Request failed"
+    assert lines[1]["exception"].endswith("ConnectionError: unreachable")
+
+
+@pytest.mark.usefixtures("restore_logging")
+def test_configure_logger_plain_text(capsys: pytest.CaptureFixture) -> None:
+    """Test that the plain format is kept with a queue."""
+    configure_logger(verbose=True, queued=True)
+
+    logging.info("Email sent to %s", "new@example.com")
+    stop_queue()
+
+    assert capsys.readouterr().err.endswith("] INFO: Email sent to new@example.com\n")
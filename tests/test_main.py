@@ -5,12 +5,12 @@
 """Tests for main.py."""
 
 from pathlib import Path
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call
 
 import pytest
 
 from auth_user_mgr._api import AuthentikAPI
-from auth_user_mgr._user import User
+from auth_user_mgr._user import RemoteUser, User
 from auth_user_mgr.main import UserSync, get_groups_of_users
 
 
@@ -191,6 +191,75 @@ def test_sync_user_pending(sample_sync: UserSync) -> None:
     assert sample_sync.users_pending == 1
 
 
+def test_sync_users(sample_sync: UserSync) -> None:
+    """Test sync_users syncs user by user, keeping the detail messages of each user together."""
+    sample_sync.api.get_pending_invitation_uuid_for_email = MagicMock(return_value="")
+    sample_sync.api.get_pending_invitation_url_for_email = MagicMock(
+        return_value="https://auth.example.com/invite"
+    )
+    sample_sync.api.add_user_to_group = MagicMock()
+    sample_sync.api.delete_user_from_group = MagicMock()
+    users = [
+        User(name="Tester Testerson", email="tester@example.com", configured_groups=["Group 1"]),
+        User(name="New User", email="new@example.com", configured_groups=[]),
+        User(name="Jane Doe", email="jane@example.com", configured_groups=["Group 3", "Group 1"]),
+    ]
+
+    sample_sync.sync_users(users=users)
+
+    assert (sample_sync.users_changed, sample_sync.users_unchanged) == (2, 0)
+    assert sample_sync.users_pending == 1
+    sample_sync.api.delete_user_from_group.assert_called_once_with(
+        user_id=1, group_uuid="uuid-group-2"
+    )
+    assert sample_sync.api.add_user_to_group.call_args_list == [
+        call(user_id=2, group_uuid="uuid-group-1"),
+        call(user_id=2, group_uuid="uuid-group-3"),
+    ]
+    assert [msg.split(": ", 1)[1] for msg in sample_sync.detail_messages] == [
+        "removed from group 'Group 2'",
+        "pending invitation: https://auth.example.com/invite",
+        "added to group 'Group 1'",
+        "added to group 'Group 3'",
+    ]
+
+
+def test_create_missing_groups(sample_sync: UserSync) -> None:
+    """Test create_missing_groups creates the groups unknown to the cache in one batch."""
+    sample_sync.api.create_groups = MagicMock(return_value={"Group 4": "uuid-group-4"})
+    sample_sync.api.get_group_uuids_by_name = MagicMock()
+    users = [
+        User(name="Tester Testerson", email="tester@example.com", configured_groups=["Group 4"]),
+        User(name="Jane Doe", email="jane@example.com", configured_groups=["Group 1", "Group 4"]),
+    ]
+
+    # Disabled: nothing is resolved up front
+    sample_sync.create_missing_groups(users=users)
+    sample_sync.api.create_groups.assert_not_called()
+
+    sample_sync.api.create_missing_groups = True
+    sample_sync.create_missing_groups(users=users)
+    sample_sync.api.create_groups.assert_called_once_with({"Group 4"})
+    assert sample_sync.group_name_uuid_cache["Group 4"] == "uuid-group-4"
+
+    # All groups known now, no further requests
+    sample_sync.create_missing_groups(users=users, all_groups_known=False)
+    sample_sync.api.create_groups.assert_called_once()
+    sample_sync.api.get_group_uuids_by_name.assert_not_called()
+
+
+def test_create_missing_groups_partial_cache(sample_sync: UserSync) -> None:
+    """Test create_missing_groups looks up unknown groups if the cache is incomplete."""
+    sample_sync.api.create_missing_groups = True
+    sample_sync.api.get_group_uuids_by_name = MagicMock(return_value={"Group 5": "uuid-group-5"})
+    users = [User(name="Jane Doe", email="jane@example.com", configured_groups=["Group 5"])]
+
+    sample_sync.create_missing_groups(users=users, all_groups_known=False)
+
+    sample_sync.api.get_group_uuids_by_name.assert_called_once_with({"Group 5"})
+    assert sample_sync.group_name_uuid_cache["Group 5"] == "uuid-group-5"
+
+
 def test_print_summary_no_details(sample_sync: UserSync, capsys: pytest.CaptureFixture) -> None:
     """Test print_summary with no detail messages."""
     sample_sync.users_unchanged = 5
@@ -332,8 +401,8 @@ def test_get_groups_of_users(sample_api: AuthentikAPI, mock_api_call: callable)
     """Test get_groups_of_users returns both user-group mapping and group UUID cache."""
     mock_api_call("GET", "core-users-GET.json")
 
-    # Mock list_groups to return groups with users and UUIDs
-    sample_api.list_groups = MagicMock(
+    # Mock iter_groups to return groups with users and UUIDs
+    sample_api.iter_groups = MagicMock(
         return_value=[
             {"pk": "uuid-g1", "name": "Group 1", "users": [1, 3]},
             {"pk": "uuid-g2", "name": "Group 2", "users": [1]},
@@ -342,8 +411,8 @@ def test_get_groups_of_users(sample_api: AuthentikAPI, mock_api_call: callable)
 
     user_mapping, group_cache = get_groups_of_users(api=sample_api)
 
-    assert user_mapping[1] == ["Group 1", "Group 2"]
-    assert user_mapping[3] == ["Group 1"]
+    assert user_mapping.get(1) == ["Group 1", "Group 2"]
+    assert user_mapping.get(3) == ["Group 1"]
     assert group_cache == {"Group 1": "uuid-g1", "Group 2": "uuid-g2"}
 
 
@@ -362,13 +431,10 @@ def test_handle_unconfigured_users_deletes_internal(sample_sync: UserSync) -> No
     """Test handle_unconfigured_users deletes internal users not in config."""
     sample_sync.delete_unconfigured_users = True
     sample_sync.all_users_by_email = {
-        "configured@example.com": {"pk": 1, "email": "configured@example.com", "type": "internal"},
-        "extra@example.com": {
-            "pk": 2,
-            "email": "extra@example.com",
-            "type": "internal",
-            "username": "extra.user",
-        },
+        "configured@example.com": RemoteUser(pk=1, email="configured@example.com", type="internal"),
+        "extra@example.com": RemoteUser(
+            pk=2, email="extra@example.com", username="extra.user", type="internal"
+        ),
     }
     sample_sync.api.delete_user = MagicMock()
 
@@ -385,21 +451,13 @@ def test_handle_unconfigured_users_skips_service_accounts(sample_sync: UserSync)
     """Test handle_unconfigured_users skips non-internal user types."""
     sample_sync.delete_unconfigured_users = True
     sample_sync.all_users_by_email = {
-        "service@example.com": {
-            "pk": 10,
-            "email": "service@example.com",
-            "type": "service_account",
-        },
-        "admin@example.com": {
-            "pk": 11,
-            "email": "admin@example.com",
-            "type": "internal_service_account",
-        },
-        "external@example.com": {
-            "pk": 12,
-            "email": "external@example.com",
-            "type": "external",
-        },
+        "service@example.com": RemoteUser(
+            pk=10, email="service@example.com", type="service_account"
+        ),
+        "admin@example.com": RemoteUser(
+            pk=11, email="admin@example.com", type="internal_service_account"
+        ),
+        "external@example.com": RemoteUser(pk=12, email="external@example.com", type="external"),
     }
     sample_sync.api.delete_user = MagicMock()
 
@@ -413,9 +471,9 @@ def test_handle_unconfigured_users_mixed(sample_sync: UserSync) -> None:
     """Test handle_unconfigured_users with a mix of types and configured users."""
     sample_sync.delete_unconfigured_users = True
     sample_sync.all_users_by_email = {
-        "keep@example.com": {"pk": 1, "email": "keep@example.com", "type": "internal"},
-        "delete@example.com": {"pk": 2, "email": "delete@example.com", "type": "internal"},
-        "svc@example.com": {"pk": 3, "email": "svc@example.com", "type": "service_account"},
+        "keep@example.com": RemoteUser(pk=1, email="keep@example.com", type="internal"),
+        "delete@example.com": RemoteUser(pk=2, email="delete@example.com", type="internal"),
+        "svc@example.com": RemoteUser(pk=3, email="svc@example.com", type="service_account"),
     }
     sample_sync.api.delete_user = MagicMock()
 
@@ -425,6 +483,19 @@ def test_handle_unconfigured_users_mixed(sample_sync: UserSync) -> None:
     assert sample_sync.users_deleted == 1
 
 
+def test_print_summary_includes_failed_emails(
+    sample_sync: UserSync, capsys: pytest.CaptureFixture
+) -> None:
+    """Test print_summary includes emails which could not be delivered."""
+    sample_sync.report_mail_result(sent=0, failures=[("new@example.com", "Connection refused")])
+
+    sample_sync.print_summary(total_users=1)
+
+    output = capsys.readouterr().out
+    assert "  Failed emails: 1" in output
+    assert "  new@example.com: failed to send email: Connection refused" in output
+
+
 def test_print_summary_includes_deleted(
     sample_sync: UserSync, capsys: pytest.CaptureFixture
 ) -> None:
@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _metrics.py."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from auth_user_mgr._api import AuthentikAPI
+from auth_user_mgr._metrics import (
+    LATENCY_BUCKETS,
+    ApiMetrics,
+    normalize_endpoint,
+    percentile,
+    write_metrics_file,
+)
+from auth_user_mgr.main import UserSync
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    [
+        ("/core/users/", "/core/users/"),
+        ("/core/users/42/", "/core/users/{id}/"),
+        (
+            "/core/groups/6e981209-8621-4484-993d-dc9882a8747c/add_user/",
+            "/core/groups/{id}/add_user/",
+        ),
+        ("/api/v3/core/users/7", "/api/v3/core/users/{id}"),
+    ],
+)
+def test_normalize_endpoint(path: str, expected: str) -> None:
+    """Test that IDs and UUIDs are replaced, but version segments like v3 are kept."""
+    assert normalize_endpoint(path) == expected
+
+
+def test_percentile() -> None:
+    """Test that percentiles are interpolated within their bucket, and capped by the maximum."""
+    # 10 values up to 5 ms, 10 up to 10 ms, 1 above 10 s
+    buckets = [10, 10] + [0] * (len(LATENCY_BUCKETS) - 2) + [1]
+
+    assert percentile(buckets, 0.50, 30.0) == pytest.approx(0.00525)
+    assert percentile(buckets, 0.99, 30.0) == 30.0
+    assert percentile([1] + [0] * len(LATENCY_BUCKETS), 0.5, 0.001) == 0.001
+    assert percentile([0] * (len(LATENCY_BUCKETS) + 1), 0.5, 0.0) == 0.0
+
+
+def test_api_metrics() -> None:
+    """Test that requests are grouped by method and endpoint, the slowest endpoint first."""
+    metrics = ApiMetrics()
+    for pk in range(1, 5):
+        metrics.record("GET", f"/core/users/{pk}/", 200, 0.01 * pk, 100)
+    metrics.record("GET", "/core/users/5/", 404, 0.5, 20)
+    metrics.record("POST", "/core/users/", 201, 0.02, 300)
+
+    assert len(metrics) == 6
+    slowest, fastest = metrics.endpoints()
+    assert slowest.method == "GET"
+    assert slowest.endpoint == "/core/users/{id}/"
+    assert slowest.count == 5
+    assert slowest.statuses == {200: 4, 404: 1}
+    assert slowest.bytes == 420
+    assert slowest.buckets[:7] == [0, 1, 1, 2, 0, 0, 1]
+    assert slowest.seconds == pytest.approx(0.6)
+    assert slowest.p50 == pytest.approx(0.03125)
+    assert slowest.max == 0.5
+    assert fastest.method == "POST"
+
+    data = metrics.to_dict()
+    assert data["requests"] == 6
+    assert data["bytes"] == 720
+    assert data["endpoints"][0]["statuses"] == {"200": 4, "404": 1}
+
+    table = metrics.format_table()
+    assert table[0].split()[:4] == ["Method", "Endpoint", "Calls", "Status"]
+    assert table[1].split()[:4] == ["GET", "/core/users/{id}/", "5", "200:4"]
+
+
+def test_api_records_requests(sample_api: AuthentikAPI, mock_api_call: callable) -> None:
+    """Test that the API client records its requests."""
+    mock_api_call("GET", "core-users-GET.json")
+    sample_api.list_users()
+
+    (stats,) = sample_api.metrics.endpoints()
+    assert stats.method == "GET"
+    assert stats.endpoint == "/core/users/"
+    assert stats.statuses == {200: 1}
+
+
+def test_api_dry_run_skips_recording(sample_api: AuthentikAPI, mock_api_call: callable) -> None:
+    """Test that write calls skipped in a dry run are not recorded."""
+    sample_api.dry = True
+    mock_post = mock_api_call("POST", "stages-invitatation-invitations-POST.json")
+    sample_api.create_group("New group")
+
+    mock_post.assert_not_called()
+    assert not len(sample_api.metrics)
+
+
+def test_print_summary_with_api_metrics(
+    sample_sync: UserSync, capsys: pytest.CaptureFixture
+) -> None:
+    """Test print_summary lists the API requests if there are any."""
+    sample_sync.api.metrics.record("GET", "/core/users/", 200, 0.1, 2048)
+
+    sample_sync.print_summary(total_users=0)
+
+    output = capsys.readouterr().out
+    assert "\nAPI requests: 1\n  Method  Endpoint" in output
+    assert "  GET     /core/users/" in output
+
+
+def test_write_metrics_file(tmp_path: Path) -> None:
+    """Test that the metrics file contains the API numbers and the phase timings."""
+    metrics = ApiMetrics()
+    metrics.record("GET", "/core/users/", 200, 0.1, 2048)
+    metrics_file = tmp_path / "metrics.json"
+
+    write_metrics_file(metrics_file, api=metrics, phases={"Fetch users": 0.2})
+
+    data = json.loads(metrics_file.read_text(encoding="utf-8"))
+    assert data["api"]["requests"] == 1
+    assert data["api"]["endpoints"][0]["endpoint"] == "/core/users/"
+    assert data["phases"] == {"Fetch users": 0.2}
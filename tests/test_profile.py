@@ -0,0 +1,90 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _profile.py."""
+
+import pstats
+import time
+from pathlib import Path
+
+import pytest
+
+from auth_user_mgr._profile import PhaseTimer, profile_to
+from auth_user_mgr.main import UserSync
+
+
+def busy_wait(seconds: float) -> None:
+    """Keep the CPU busy for some time, so that the stack sampler sees this function."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_phase_timer() -> None:
+    """Test that phases are recorded in order, and repeated phases accumulate."""
+    timings = PhaseTimer()
+    for _ in range(2):
+        with timings.phase("Fetch users"):
+            busy_wait(0.01)
+    with timings.phase("Sync"):
+        pass
+
+    assert list(timings.phases) == ["Fetch users", "Sync"]
+    assert timings.phases["Fetch users"] >= 0.02
+    lines = timings.format_lines()
+    assert lines[0].startswith("Fetch users:")
+    assert lines[1].startswith("Sync:       ")
+    assert lines[2].startswith("Total:")
+
+
+def test_phase_timer_records_failed_phase() -> None:
+    """Test that a phase is recorded even if it raised an exception."""
+    timings = PhaseTimer()
+
+    def fail() -> None:
+        with timings.phase("Broken"):
+            msg = "boom"
+            raise ValueError(msg)
+
+    with pytest.raises(ValueError, match="boom"):
+        fail()
+
+    assert "Broken" in timings.phases
+
+
+def test_profile_to(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    """Test that profiling writes cProfile statistics and collapsed stacks."""
+    stats_file = tmp_path / "sync.prof"
+
+    with profile_to(str(stats_file)):
+        busy_wait(0.1)
+
+    stats = pstats.Stats(str(stats_file))
+    assert any(func[2] == "busy_wait" for func in stats.stats)
+    collapsed = (tmp_path / "sync.prof.collapsed").read_text(encoding="utf-8").splitlines()
+    assert collapsed
+    stack, count = collapsed[0].rsplit(" ", 1)
+    assert stack.endswith("tests.test_profile:busy_wait")
+    assert int(count) > 0
+    assert "Profile written to" in capsys.readouterr().out
+
+
+def test_profile_to_disabled(tmp_path: Path) -> None:
+    """Test that nothing is written without a path."""
+    with profile_to(""):
+        pass
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_print_summary_with_timings(sample_sync: UserSync, capsys: pytest.CaptureFixture) -> None:
+    """Test print_summary lists the phase timings if there are any."""
+    with sample_sync.timings.phase("Fetch users"):
+        pass
+
+    sample_sync.print_summary(total_users=0)
+
+    output = capsys.readouterr().out
+    assert "\nTimings:\n  Fetch users:" in output
+    assert "  Total:" in output
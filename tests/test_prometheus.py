@@ -0,0 +1,118 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _prometheus.py."""
+
+from pathlib import Path
+
+from auth_user_mgr._metrics import ApiMetrics
+from auth_user_mgr._profile import PhaseTimer
+from auth_user_mgr._prometheus import PrometheusTextfile
+from auth_user_mgr.main import UserSync, run_import, write_sync_textfile
+
+
+def test_render() -> None:
+    """Test that samples of a metric are grouped below one HELP and TYPE line."""
+    textfile = PrometheusTextfile("sync")
+    textfile.add_users(changed=2, deleted=0)
+    textfile.gauge("emails", "Emails by their result", 1, result="sent")
+
+    assert textfile.render() == (
+        "# HELP auth_user_mgr_users Users by their state in the run\n"
+        "# TYPE auth_user_mgr_users gauge\n"
+        'auth_user_mgr_users{command="sync",state="changed"} 2.0\n'
+        'auth_user_mgr_users{command="sync",state="deleted"} 0.0\n'
+        "# HELP auth_user_mgr_emails Emails by their result\n"
+        "# TYPE auth_user_mgr_emails gauge\n"
+        'auth_user_mgr_emails{command="sync",result="sent"} 1.0\n'
+    )
+
+
+def test_render_escapes_label_values() -> None:
+    """Test that backslashes, quotes and newlines in label values are escaped."""
+    textfile = PrometheusTextfile("sync")
+    textfile.gauge("phase_duration_seconds", "Duration", 1, phase='a "b"\\c\nd')
+
+    assert 'phase="a \\"b\\"\\\\c\\nd"' in textfile.render()
+
+
+def test_add_api_metrics() -> None:
+    """Test that requests are counted by status and as latency histogram, errors apart."""
+    metrics = ApiMetrics()
+    metrics.record("GET", "/core/users/1/", 200, 0.25, 10)
+    metrics.record("GET", "/core/users/2/", 404, 0.25, 10)
+    textfile = PrometheusTextfile("sync")
+
+    textfile.add_api_metrics(metrics)
+
+    lines = textfile.render().splitlines()
+    endpoint = 'method="GET",endpoint="/core/users/{id}/"'
+    assert f'auth_user_mgr_api_requests{{command="sync",status="200",{endpoint}}} 1.0' in lines
+    assert f'auth_user_mgr_api_requests{{command="sync",status="404",{endpoint}}} 1.0' in lines
+    assert f'auth_user_mgr_api_errors{{command="sync",{endpoint}}} 1.0' in lines
+    assert "# TYPE auth_user_mgr_api_duration_seconds histogram" in lines
+    duration = "auth_user_mgr_api_duration_seconds"
+    assert f'{duration}_bucket{{command="sync",{endpoint},le="0.1"}} 0.0' in lines
+    assert f'{duration}_bucket{{command="sync",{endpoint},le="0.25"}} 2.0' in lines
+    assert f'{duration}_bucket{{command="sync",{endpoint},le="+Inf"}} 2.0' in lines
+    assert f'{duration}_sum{{command="sync",{endpoint}}} 0.5' in lines
+    assert f'{duration}_count{{command="sync",{endpoint}}} 2.0' in lines
+
+
+def test_write(tmp_path: Path) -> None:
+    """Test that the file ends with the time of the success, and is readable by all."""
+    textfile = PrometheusTextfile("sync")
+    textfile.add_timings(PhaseTimer())
+    prom_file = tmp_path / "auth_user_mgr.prom"
+
+    textfile.write(prom_file, now=1700000000.0)
+
+    content = prom_file.read_text(encoding="utf-8")
+    assert 'auth_user_mgr_duration_seconds{command="sync"}' in content
+    assert content.endswith(
+        'auth_user_mgr_last_success_timestamp_seconds{command="sync"} 1700000000.0\n'
+    )
+    assert prom_file.stat().st_mode & 0o777 == 0o644
+    assert [p.name for p in tmp_path.iterdir()] == ["auth_user_mgr.prom"]
+
+
+def test_write_sync_textfile(sample_sync: UserSync, tmp_path: Path) -> None:
+    """Test that the textfile of a sync contains the user and email counters."""
+    sample_sync.users_changed = 3
+    sample_sync.report_mail_result(sent=2, failures=[("new@example.com", "Connection refused")])
+    prom_file = tmp_path / "sync.prom"
+
+    write_sync_textfile(
+        str(prom_file), timings=sample_sync.timings, api=sample_sync.api, sync=sample_sync
+    )
+
+    lines = prom_file.read_text(encoding="utf-8").splitlines()
+    assert 'auth_user_mgr_users{command="sync",state="changed"} 3.0' in lines
+    assert 'auth_user_mgr_users{command="sync",state="pending"} 0.0' in lines
+    assert 'auth_user_mgr_emails{command="sync",result="sent"} 2.0' in lines
+    assert 'auth_user_mgr_emails{command="sync",result="failed"} 1.0' in lines
+
+
+def test_run_import_writes_textfile(tmp_path: Path) -> None:
+    """Test that an import writes its users and phases to the textfile."""
+    csv_file = tmp_path / "import.csv"
+    csv_file.write_text("name, email\nAlice, alice@example.com\nAlice, alice@example.com\n")
+    prom_file = tmp_path / "import.prom"
+
+    run_import(
+        input_file=str(csv_file),
+        groups_args="Event",
+        output=str(tmp_path / "event.yaml"),
+        users=str(tmp_path / "missing"),
+        dry=False,
+        prometheus_file=str(prom_file),
+    )
+
+    lines = prom_file.read_text(encoding="utf-8").splitlines()
+    assert 'auth_user_mgr_users{command="import",state="added"} 1.0' in lines
+    assert 'auth_user_mgr_users{command="import",state="duplicate"} 1.0' in lines
+    assert any(
+        line.startswith('auth_user_mgr_phase_duration_seconds{command="import",phase="Read CSV"}')
+        for line in lines
+    )
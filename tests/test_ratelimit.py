@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _ratelimit.py and rate-limited emails."""
+
+import logging
+from pathlib import Path
+
+import pytest
+
+from auth_user_mgr._email import MailQueue
+from auth_user_mgr._ratelimit import RateLimiter
+from auth_user_mgr._spool import MailSpool
+from auth_user_mgr.main import create_mail_spool
+from tests.smtp_sink import SMTPSink
+from tests.test_email import make_mail, send_invitations
+
+
+class FakeClock:
+    """A clock which only advances when sleeping."""
+
+    def __init__(self) -> None:
+        """Start at an arbitrary time."""
+        self.now = 1000.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        """Advance the clock instead of sleeping."""
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_limiter(limits: list[tuple[int, float]]) -> tuple[RateLimiter, FakeClock]:
+    """Create a rate limiter with a fake clock."""
+    clock = FakeClock()
+    return RateLimiter(limits, clock=clock, sleep=clock.sleep), clock
+
+
+def test_burst_then_spread() -> None:
+    """Test that a full bucket allows a burst, after which operations are spread evenly."""
+    limiter, clock = make_limiter([(3, 60)])
+
+    waits = [limiter.acquire() for _ in range(5)]
+
+    assert waits == [0, 0, 0, pytest.approx(20), pytest.approx(20)]
+    assert clock.now == pytest.approx(1040)
+
+
+def test_multiple_limits() -> None:
+    """Test that the strictest limit applies."""
+    limiter, clock = make_limiter([(10, 60), (12, 3600)])
+
+    for _ in range(12):
+        limiter.acquire()
+    assert clock.now == pytest.approx(1012)  # 10 at once, then 2 after 6 seconds each
+
+    # The hourly limit is exhausted now, one more is allowed every 300 seconds. 12 of them have
+    # passed since the start already
+    assert limiter.acquire() == pytest.approx(300 - 12)
+
+
+def test_projected_duration(caplog: pytest.LogCaptureFixture) -> None:
+    """Test the projected duration of further operations, and that it is logged."""
+    limiter, _clock = make_limiter([(30, 60)])
+
+    assert limiter.projected_duration(0) == 0
+    assert limiter.projected_duration(30) == 0
+    assert limiter.projected_duration(90) == pytest.approx(120)
+
+    with caplog.at_level(logging.INFO):
+        limiter.log_projection(30)
+        assert not caplog.records
+        limiter.log_projection(90)
+    assert "sending 90 emails will take about 0:02:00" in caplog.text
+
+
+def test_mail_rate_limited(smtp_sink: SMTPSink) -> None:
+    """Test that rate-limited emails wait, over the same connection, and none is dropped."""
+    mail = make_mail(smtp_sink.port, max_per_minute=2, max_per_hour=100)
+    assert mail.rate_limiter is not None
+    assert [bucket.capacity for bucket in mail.rate_limiter.buckets] == [2, 100]
+    mail.rate_limiter, clock = make_limiter([(2, 60)])
+
+    send_invitations(mail, 4)
+    mail.close()
+
+    assert clock.sleeps == [pytest.approx(30), pytest.approx(30)]
+    assert (smtp_sink.connections, smtp_sink.messages) == (1, 4)
+
+
+def test_mail_queue_shares_rate_limit(smtp_sink: SMTPSink) -> None:
+    """Test that all workers of a mail queue share one rate limit."""
+    mail = make_mail(smtp_sink.port)
+    mail.rate_limiter, clock = make_limiter([(2, 60)])
+    mail_queue = MailQueue(mail, workers=3, maxsize=0)
+
+    send_invitations(mail_queue, 5)
+    mail_queue.close()
+
+    assert clock.now == pytest.approx(1090)
+    assert smtp_sink.messages == 5
+    assert make_mail(smtp_sink.port).rate_limiter is None
+
+
+def test_rate_limit_requires_mail_spool(smtp_sink: SMTPSink, tmp_path: Path) -> None:
+    """Test that rate-limited emails need a spool, which carries the limits across runs."""
+    mail = make_mail(smtp_sink.port, max_per_hour=100)
+    with pytest.raises(ValueError, match="--mail-spool"):
+        create_mail_spool(mail, "")
+    assert isinstance(create_mail_spool(mail, str(tmp_path)), MailSpool)
+    assert create_mail_spool(make_mail(smtp_sink.port), "") is None
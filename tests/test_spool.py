@@ -0,0 +1,150 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _spool.py and the flush-mail command."""
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from auth_user_mgr._ratelimit import RateLimiter
+from auth_user_mgr._spool import RETRY_DELAY, TMP_MAX_AGE, MailSpool
+from auth_user_mgr.main import run_flush_mail
+from tests.conftest import CONFIG_APP_SAMPLE
+from tests.smtp_sink import SMTPSink
+from tests.test_email import make_mail, send_invitations
+
+
+def spooled_names(spool: MailSpool) -> list[str]:
+    """Return the file names of the spooled messages, in order."""
+    return sorted(path.name for path in (spool.directory / "new").iterdir())
+
+
+def test_spool_and_flush(tmp_path: Path, smtp_sink: SMTPSink) -> None:
+    """Test that spooled emails are written without connecting, and delivered in order."""
+    spool = MailSpool(tmp_path / "spool", make_mail(smtp_sink.port))
+
+    send_invitations(spool, 3)
+
+    assert len(spool) == 3
+    assert smtp_sink.connections == 0
+    assert not list((spool.directory / "tmp").iterdir())
+
+    result = spool.flush()
+
+    assert (result.sent, result.failures, result.pending) == (3, [], 0)
+    assert smtp_sink.recipients == [f"user{number}@example.com" for number in range(3)]
+    assert smtp_sink.connections == 1
+
+
+def test_flush_keeps_messages_if_server_down(tmp_path: Path) -> None:
+    """Test that undelivered emails stay in the spool and are retried after a delay."""
+    sink = SMTPSink()
+    port = sink.port
+    sink.server_close()
+    spool = MailSpool(tmp_path / "spool", make_mail(port))
+    send_invitations(spool, 3)
+
+    # Server down: stop after the first failure, counting an attempt only for that one
+    now = time.time()
+    result = spool.flush(now=now)
+    assert (result.sent, result.pending) == (0, 3)
+    assert [recipient for recipient, _ in result.failures] == ["user0@example.com"]
+    assert [name.rpartition(".")[2] for name in spooled_names(spool)] == ["1", "0", "0"]
+
+    # Server back: the failed message waits for its retry delay, the others are sent
+    sink = SMTPSink(port).start()
+    try:
+        assert spool.flush(now=now + 1)[:2] == (2, [])
+        assert spool.flush(now=now + RETRY_DELAY + 1)[:2] == (1, [])
+    finally:
+        sink.stop()
+    assert len(spool) == 0
+    assert sink.recipients == ["user1@example.com", "user2@example.com", "user0@example.com"]
+
+
+def test_flush_continues_after_message_error(tmp_path: Path, smtp_sink: SMTPSink) -> None:
+    """Test that an unexpected error with one message defers it, and the next is delivered."""
+    spool = MailSpool(tmp_path / "spool", make_mail(smtp_sink.port))
+    spool.add("To: broken@example.com\n\n").write_bytes(b"To: \xff\n\n")
+    send_invitations(spool, 1)
+
+    now = time.time()
+    result = spool.flush(now=now)
+
+    assert result.sent == 1
+    assert len(result.failures) == 1
+    assert "UnicodeDecodeError" in result.failures[0][1]
+    assert smtp_sink.recipients == ["user0@example.com"]
+    # Deferred with backoff, so later flushes are not blocked by it
+    assert [name.rpartition(".")[2] for name in spooled_names(spool)] == ["1"]
+    assert spool.flush(now=now + 1)[:2] == (0, [])
+
+
+def test_spool_records_render_errors(tmp_path: Path, smtp_sink: SMTPSink) -> None:
+    """Test that an email which cannot be rendered is a failure, not an error of the sync."""
+    spool = MailSpool(tmp_path / "spool", make_mail(smtp_sink.port))
+
+    spool.send_email(message="invitation", recipient="user0@example.com", template_file="missing")
+
+    assert len(spool) == 0
+    assert [recipient for recipient, _ in spool.failures] == ["user0@example.com"]
+
+
+def test_flush_respects_rate_limits_across_runs(
+    tmp_path: Path, smtp_sink: SMTPSink, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a flush sends only what the limits allow after earlier flushes, without waiting."""
+    monkeypatch.setattr(RateLimiter, "acquire", lambda _: pytest.fail("waited for the limits"))
+    directory = tmp_path / "spool"
+    send_invitations(MailSpool(directory, make_mail(smtp_sink.port, max_per_hour=2)), 3)
+    now = time.time()
+
+    # Each flush with a new spool and mail, as in separate cron runs
+    def flush(at: float) -> tuple:
+        return MailSpool(directory, make_mail(smtp_sink.port, max_per_hour=2)).flush(now=at)
+
+    assert flush(now)[::2] == (2, 1)
+    assert flush(now + 60)[::2] == (0, 1)
+    assert flush(now + 3601)[::2] == (1, 0)
+    assert smtp_sink.recipients == [f"user{number}@example.com" for number in range(3)]
+    # Deliveries are recorded without their content
+    assert all(path.stat().st_size == 0 for path in (directory / "sent").iterdir())
+
+
+def test_flush_removes_stale_tmp_files(tmp_path: Path, smtp_sink: SMTPSink) -> None:
+    """Test that incomplete messages left behind by a crash are removed, fresh ones are kept."""
+    spool = MailSpool(tmp_path / "spool", make_mail(smtp_sink.port))
+    stale, fresh = spool.directory / "tmp" / "stale", spool.directory / "tmp" / "fresh"
+    stale.write_text("To: partial")
+    fresh.write_text("To: in progress")
+    old = time.time() - TMP_MAX_AGE - 1
+    os.utime(stale, (old, old))
+
+    spool.flush()
+
+    assert not stale.exists()
+    assert fresh.exists()
+    assert smtp_sink.messages == 0
+
+
+def test_run_flush_mail(tmp_path: Path, smtp_sink: SMTPSink, capsys: pytest.CaptureFixture) -> None:
+    """Test that the flush-mail command delivers the spool with the SMTP settings of the config."""
+    config = tmp_path / "app.yaml"
+    config.write_text(
+        Path(CONFIG_APP_SAMPLE)
+        .read_text(encoding="utf-8")
+        .replace("smtp.example.com", "127.0.0.1")
+        .replace("smtp_port: 587", f"smtp_port: {smtp_sink.port}")
+        .replace("smtp_starttls: true", "smtp_starttls: false")
+    )
+    spool_dir = tmp_path / "spool"
+    send_invitations(MailSpool(spool_dir, make_mail(smtp_sink.port)), 2)
+
+    assert run_flush_mail(config=str(config), spool=str(spool_dir)) is False
+
+    assert smtp_sink.messages == 2
+    assert "Mail spool: 2 sent, 0 failed, 0 left for a later retry" in capsys.readouterr().out
@@ -0,0 +1,212 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _state.py and skipping unchanged syncs."""
+
+import json
+import shutil
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from auth_user_mgr import _api, main
+from auth_user_mgr._api import AuthentikAPI
+from auth_user_mgr._metrics import ApiMetrics
+from auth_user_mgr._state import (
+    STATE_VERSION,
+    hash_local_state,
+    read_sync_state,
+    write_sync_state,
+)
+from auth_user_mgr.main import run_sync
+from tests.conftest import CONFIG_APP_SAMPLE, CONFIG_USERS_DIR_SAMPLE
+
+REMOTE = {
+    "users": 2,
+    "active_users": 2,
+    "last_updated": "2025-05-20T15:18:31Z",
+    "groups": 1,
+    "group_members": "0" * 64,
+    "invitations": 0,
+}
+
+
+@pytest.fixture(name="inventory")
+def fixture_inventory(tmp_path: Path) -> Path:
+    """Copy the sample inventory directory into a temporary directory."""
+    return Path(shutil.copytree(CONFIG_USERS_DIR_SAMPLE, tmp_path / "users"))
+
+
+def test_hash_local_state(inventory: Path) -> None:
+    """Test that the local hash only changes with the content of the files."""
+    before = hash_local_state(CONFIG_APP_SAMPLE, str(inventory))
+    changed = min(inventory.glob("*.yaml"))
+    changed.write_text(changed.read_text())
+
+    assert hash_local_state(CONFIG_APP_SAMPLE, str(inventory)) == before
+    assert hash_local_state(CONFIG_APP_SAMPLE, str(inventory), exclude=["x"]) != before
+
+    changed.write_text(changed.read_text() + "\n# changed\n")
+    assert hash_local_state(CONFIG_APP_SAMPLE, str(inventory)) != before
+
+
+def test_read_and_write_state(tmp_path: Path) -> None:
+    """Test that a recorded state is read back."""
+    state_file = tmp_path / "state.json"
+    assert read_sync_state(state_file) is None
+
+    write_sync_state(state_file, local="abc", remote=REMOTE)
+
+    stored = read_sync_state(state_file)
+    assert stored is not None
+    assert (stored["local"], stored["remote"]) == ("abc", REMOTE)
+
+
+@pytest.mark.parametrize(
+    "stored", ["{not json", json.dumps({"version": STATE_VERSION + 1}), json.dumps([])]
+)
+def test_read_invalid_state(tmp_path: Path, stored: str) -> None:
+    """Test that a corrupt or outdated state file is ignored."""
+    state_file = tmp_path / "state.json"
+    state_file.write_text(stored)
+
+    assert read_sync_state(state_file) is None
+
+
+def test_get_state_fingerprint(sample_api: AuthentikAPI, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the remote fingerprint only needs small requests, and notices edits."""
+    groups = [{"pk": "g1", "name": "Group 1", "users": [2, 1]}]
+
+    def fake_get(url: str, params: dict, **_kwargs: object) -> MagicMock:
+        endpoint = url.removeprefix(sample_api.url)
+        if endpoint == "/core/groups/":
+            assert params["include_users"] == "false"
+            body = {"pagination": {"count": len(groups), "total_pages": 1}, "results": groups}
+        else:
+            assert params["page_size"] == 1
+            count = 2 if endpoint == "/core/users/" else 0
+            newest = {"pk": 2, "last_updated": REMOTE["last_updated"]}
+            oldest = {"pk": 1, "last_updated": "2025-01-01T00:00:00Z"}
+            first = oldest if params.get("ordering") == "last_updated" else newest
+            body = {"pagination": {"count": count}, "results": [first] if count else []}
+        response = MagicMock(status_code=200)
+        response.text = json.dumps(body)
+        return response
+
+    mock_get = MagicMock(side_effect=fake_get)
+    monkeypatch.setattr(_api.requests, "get", mock_get)
+
+    fingerprint = sample_api.get_state_fingerprint()
+    assert {**fingerprint, "group_members": REMOTE["group_members"]} == REMOTE
+    assert mock_get.call_count == 5
+    assert mock_get.call_args_list[0].kwargs["params"]["ordering"] == "-last_updated"
+
+    # A membership edited by hand changes the fingerprint
+    groups[0]["users"] = [1]
+    assert sample_api.get_state_fingerprint()["group_members"] != fingerprint["group_members"]
+
+
+def test_get_state_fingerprint_without_ordering(
+    sample_api: AuthentikAPI, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that all users are hashed if the server ignores the ordering by last update."""
+    users = [{"pk": 1, "name": "Alice", "last_login": "a"}, {"pk": 2, "name": "Bob"}]
+
+    def fake_get(url: str, params: dict, **_kwargs: object) -> MagicMock:
+        is_users = url.removeprefix(sample_api.url) == "/core/users/"
+        results = users[: params["page_size"]] if is_users else []
+        body = {"pagination": {"count": len(users), "total_pages": 1}, "results": results}
+        response = MagicMock(status_code=200)
+        response.text = json.dumps(body)
+        return response
+
+    monkeypatch.setattr(_api.requests, "get", MagicMock(side_effect=fake_get))
+
+    fingerprint = sample_api.get_state_fingerprint()
+    assert len(fingerprint["last_updated"]) == 64
+
+    # Logins do not change the hash, edits do
+    users[0]["last_login"] = "b"
+    assert sample_api.get_state_fingerprint() == fingerprint
+    users[1]["name"] = "Robert"
+    assert sample_api.get_state_fingerprint()["last_updated"] != fingerprint["last_updated"]
+
+
+def test_run_sync_skips_unchanged_state(
+    inventory: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a sync is skipped if neither the inventory nor Authentik changed."""
+    api = MagicMock(metrics=ApiMetrics())
+    api.get_state_fingerprint.return_value = REMOTE
+    monkeypatch.setattr(main, "AuthentikAPI", MagicMock(return_value=api))
+    state_file = tmp_path / "state.json"
+
+    def sync(**kwargs: object) -> None:
+        run_sync(
+            CONFIG_APP_SAMPLE, str(inventory), False, True, state_file=str(state_file), **kwargs
+        )
+
+    # First run: no recorded state, full sync
+    sync()
+    assert api.iter_users.call_count == 1
+    assert read_sync_state(state_file)["remote"] == REMOTE
+
+    # Nothing changed: skipped, unless forced
+    sync()
+    assert api.iter_users.call_count == 1
+    sync(force=True)
+    assert api.iter_users.call_count == 2
+
+    # Authentik or the inventory changed
+    api.get_state_fingerprint.return_value = {**REMOTE, "users": 3}
+    sync()
+    assert api.iter_users.call_count == 3
+    changed = min(inventory.glob("*.yaml"))
+    changed.write_text(changed.read_text() + "\n# changed\n")
+    sync()
+    assert api.iter_users.call_count == 4
+
+
+def test_run_sync_dry_does_not_record_state(
+    inventory: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a dry sync does not record its state, as it applied nothing."""
+    api = MagicMock(metrics=ApiMetrics())
+    api.get_state_fingerprint.return_value = REMOTE
+    monkeypatch.setattr(main, "AuthentikAPI", MagicMock(return_value=api))
+    state_file = tmp_path / "state.json"
+
+    run_sync(CONFIG_APP_SAMPLE, str(inventory), dry=True, no_email=True, state_file=str(state_file))
+
+    assert not state_file.exists()
+
+
+def test_run_sync_failed_request_does_not_record_state(
+    inventory: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a sync with a failed API request records no state, so the next run syncs."""
+    api = MagicMock(metrics=ApiMetrics())
+    api.get_state_fingerprint.return_value = REMOTE
+
+    def fail_request() -> list:
+        api.metrics.record("POST", "/core/groups/1/add_user/", 500, 0.1, 0)
+        return []
+
+    api.iter_users.side_effect = fail_request
+    monkeypatch.setattr(main, "AuthentikAPI", MagicMock(return_value=api))
+    state_file = tmp_path / "state.json"
+
+    def sync() -> None:
+        run_sync(CONFIG_APP_SAMPLE, str(inventory), False, True, state_file=str(state_file))
+
+    sync()
+    assert not state_file.exists()
+
+    # The next run syncs again, and records the state once all requests succeeded
+    api.metrics = ApiMetrics()
+    api.iter_users.side_effect = None
+    sync()
+    assert api.iter_users.call_count == 2
+    assert read_sync_state(state_file)["remote"] == REMOTE
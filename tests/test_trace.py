@@ -0,0 +1,171 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _trace.py."""
+
+import json
+import threading
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from auth_user_mgr._api import AuthentikAPI
+from auth_user_mgr._profile import PhaseTimer
+from auth_user_mgr._trace import SPAN_KIND_CLIENT, Tracer, trace_to
+from auth_user_mgr._user import User
+from auth_user_mgr.main import UserSync
+
+
+def spans_by_name(tracer: Tracer) -> dict:
+    """Return the finished spans of a tracer by name."""
+    return {span.name: span for span in tracer.spans}
+
+
+def test_nested_spans() -> None:
+    """Test that spans opened within another span become its children."""
+    tracer = Tracer()
+    with tracer.span("sync"), tracer.span("Fetch users") as span:
+        span.set("count", 3)
+
+    spans = spans_by_name(tracer)
+    assert spans["sync"].parent_id == ""
+    assert spans["Fetch users"].parent_id == spans["sync"].span_id
+    assert spans["Fetch users"].attributes == {"count": 3}
+    assert spans["sync"].start <= spans["Fetch users"].start <= spans["Fetch users"].end
+
+
+def test_span_in_other_thread() -> None:
+    """Test that spans of other threads become children of the outermost span."""
+    tracer = Tracer()
+
+    def work() -> None:
+        with tracer.span("Send email"):
+            pass
+
+    with tracer.span("sync"), tracer.span("Check users"):
+        worker = threading.Thread(target=work)
+        worker.start()
+        worker.join()
+
+    spans = spans_by_name(tracer)
+    assert spans["Send email"].parent_id == spans["sync"].span_id
+
+
+def test_span_records_error() -> None:
+    """Test that a span is marked as failed if the enclosed code raises."""
+    tracer = Tracer()
+
+    def fail() -> None:
+        with tracer.span("Connect"):
+            msg = "unreachable"
+            raise ConnectionError(msg)
+
+    with pytest.raises(ConnectionError):
+        fail()
+
+    assert tracer.spans[0].error == "ConnectionError: unreachable"
+
+
+def test_disabled_tracer() -> None:
+    """Test that a disabled tracer records nothing."""
+    tracer = Tracer(enabled=False)
+    with tracer.span("sync") as span:
+        span.set("count", 1)
+
+    assert tracer.spans == []
+
+
+def test_to_otlp() -> None:
+    """Test the OpenTelemetry JSON format of the spans and their typed attributes."""
+    tracer = Tracer()
+    with tracer.span("GET /core/users/", kind=SPAN_KIND_CLIENT, status=200, ok=True, ms=1.5):
+        pass
+
+    (resource_spans,) = tracer.to_otlp()["resourceSpans"]
+    assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "auth-user-mgr"}
+    (span,) = resource_spans["scopeSpans"][0]["spans"]
+    assert span["traceId"] == tracer.trace_id
+    assert len(span["traceId"]) == 32
+    assert len(span["spanId"]) == 16
+    assert "parentSpanId" not in span
+    assert span["kind"] == SPAN_KIND_CLIENT
+    assert int(span["endTimeUnixNano"]) >= int(span["startTimeUnixNano"])
+    assert span["attributes"] == [
+        {"key": "status", "value": {"intValue": "200"}},
+        {"key": "ok", "value": {"boolValue": True}},
+        {"key": "ms", "value": {"doubleValue": 1.5}},
+    ]
+
+
+def test_trace_to(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    """Test that the spans are written below a root span, even if the run fails."""
+    trace_file = tmp_path / "trace.json"
+
+    def run() -> None:
+        with trace_to(str(trace_file), "sync") as tracer, tracer.span("Read config"):
+            msg = "broken config"
+            raise ValueError(msg)
+
+    with pytest.raises(ValueError, match="broken config"):
+        run()
+
+    spans = json.loads(trace_file.read_text(encoding="utf-8"))["resourceSpans"][0]["scopeSpans"]
+    names = {span["name"]: span for span in spans[0]["spans"]}
+    assert names["Read config"]["parentSpanId"] == names["sync"]["spanId"]
+    assert names["sync"]["status"]["message"] == "ValueError: broken config"
+    assert "Trace with 2 spans written to" in capsys.readouterr().out
+
+
+def test_trace_to_disabled(tmp_path: Path) -> None:
+    """Test that nothing is recorded or written without a path."""
+    with trace_to("", "sync") as tracer:
+        assert not tracer.enabled
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_api_request_span(sample_api: AuthentikAPI, mock_api_call: callable) -> None:
+    """Test that each API request is recorded as a client span with its status code."""
+    sample_api.tracer = Tracer()
+    mock_api_call("GET", "core-users-GET.json")
+
+    sample_api.list_users()
+
+    (span,) = sample_api.tracer.spans
+    assert span.name == "GET /core/users/"
+    assert span.kind == SPAN_KIND_CLIENT
+    assert span.attributes["http.request.method"] == "GET"
+    assert span.attributes["http.response.status_code"] == 200
+
+
+def test_sync_users_spans(sample_sync: UserSync) -> None:
+    """Test that sync_users records a span per user, with the user's email and result."""
+    sample_sync.timings = PhaseTimer(tracer=Tracer())
+    sample_sync.api.get_pending_invitation_uuid_for_email = MagicMock(return_value="")
+    sample_sync.api.add_user_to_group = MagicMock()
+    sample_sync.api.delete_user_from_group = MagicMock()
+    users = [User(name="Jane Doe", email="jane@example.com", configured_groups=["Group 1"])]
+
+    sample_sync.sync_users(users=users)
+
+    spans = spans_by_name(sample_sync.timings.tracer)
+    assert spans["Sync user"].parent_id == spans["Sync users"].span_id
+    assert spans["Sync user"].attributes == {
+        "email": "jane@example.com",
+        "exists": True,
+        "changed": True,
+    }
+
+
+def test_api_request_without_tracing(
+    sample_api: AuthentikAPI, mock_api_call: callable, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that no span is built per API request without tracing, but metrics still are."""
+    monkeypatch.setattr(Tracer, "span", lambda *_args, **_kwargs: pytest.fail("span built"))
+    mock_api_call("GET", "core-users-GET.json")
+
+    sample_api.list_users()
+
+    assert len(sample_api.metrics) == 1
@@ -4,7 +4,21 @@
 
 """Test _user.py."""
 
-from auth_user_mgr._user import User
+import itertools
+import random
+import string
+
+import pytest
+
+from auth_user_mgr._user import (
+    GroupMemberships,
+    RemoteUser,
+    User,
+    _slugify_invite_slug,
+    _slugify_username,
+    name_to_invite_slug,
+    name_to_username,
+)
 
 
 def test_user_initialization_and_properties() -> None:
@@ -74,3 +88,66 @@ def test_user_with_umlauts() -> None:
 
     user2 = User(name="Ärgölü Baß", email="test@example.com", configured_groups=[])
     assert user2.username == "aergoelue.bass"
+
+
+# Characters of simple names, including combinations that slugify collapses or strips
+SIMPLE_ALPHABET = "aZ9 -."
+
+
+@pytest.mark.parametrize("length", range(5))
+def test_fast_path_equals_slugify_exhaustive(length: int) -> None:
+    """Test that the fast path gives the same slugs as slugify for all short simple names."""
+    for chars in itertools.product(SIMPLE_ALPHABET, repeat=length):
+        name = "".join(chars)
+        assert name_to_username(name) == _slugify_username(name), name
+        assert name_to_invite_slug(name) == _slugify_invite_slug(name), name
+
+
+def test_fast_path_equals_slugify_random() -> None:
+    """Test that cached slugs equal slugify for random names, including truncated long ones."""
+    rng = random.Random(37)  # noqa: S311
+    alphabets = [
+        string.ascii_letters + string.digits + " .-",
+        "ab -.",  # Many separators, to hit truncation at a separator
+        string.printable + "äöüßÅØéÉçñЮщΧ́",  # Mostly not simple, uses slugify
+    ]
+    for _ in range(3000):
+        alphabet = rng.choice(alphabets)
+        name = "".join(rng.choices(alphabet, k=rng.choice([3, 12, 45, 60, 148, 155, 170])))
+        assert name_to_username(name) == _slugify_username(name), name
+        assert name_to_invite_slug(name) == _slugify_invite_slug(name), name
+
+
+def test_user_has_no_instance_dict() -> None:
+    """Test that users are slotted and reject unknown attributes."""
+    user = User(name="Jane Doe", email="jane@example.com", configured_groups=[])
+
+    assert not hasattr(user, "__dict__")
+    with pytest.raises(AttributeError):
+        user.nickname = "jd"
+
+
+def test_remote_user_from_api() -> None:
+    """Test that only the needed fields of an API user are kept."""
+    user_dict = {"pk": 7, "email": "a@example.com", "username": "a", "type": "internal", "x": 1}
+
+    assert RemoteUser.from_api(user_dict) == RemoteUser(7, "a@example.com", "a", "internal")
+    assert RemoteUser.from_api({"pk": 8, "email": None}) == RemoteUser(8, "", "", "")
+
+
+def test_group_memberships() -> None:
+    """Test that group memberships are stored once per name and returned sorted per user."""
+    memberships = GroupMemberships()
+    memberships.add_group("Group B", [1, 2])
+    memberships.add_group("Group A", [1])
+    memberships.add_user(3, ["Group B", "Group C"])
+
+    assert memberships.get(1) == ["Group A", "Group B"]
+    assert memberships.get(3) == ["Group B", "Group C"]
+    assert memberships.get(4) == []
+    assert memberships.get(4, ["default"]) == ["default"]
+    assert memberships.names == ["Group B", "Group A", "Group C"]
+
+    # The per-user index is rebuilt after changes
+    memberships.add_group("Group A", [2])
+    assert memberships.get(2) == ["Group A", "Group B"]
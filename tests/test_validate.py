@@ -0,0 +1,103 @@
+# SPDX-FileCopyrightText: 2026 DB Systel GmbH
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for _validate.py."""
+
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from auth_user_mgr import _index
+from auth_user_mgr._validate import validate_inventory
+from auth_user_mgr.main import run_validate
+
+VALID = "- name: Alice\n  email: alice@example.com\n  username: alice\n"
+
+
+def test_valid_inventory(tmp_path: Path) -> None:
+    """Test that a valid inventory has no errors."""
+    (tmp_path / "a.yaml").write_text(VALID)
+    (tmp_path / "b.jsonl").write_text('{"name": "Bob", "email": "bob@example.com"}\n')
+
+    assert validate_inventory(str(tmp_path)) == (2, 2, [])
+
+
+def test_all_errors_reported_at_once(tmp_path: Path) -> None:
+    """Test that schema, parsing and duplicate errors of all files are reported together."""
+    (tmp_path / "a.yaml").write_text(VALID)
+    (tmp_path / "b.yaml").write_text(
+        "- name: Alice 2\n  email: ALICE@example.com\n"
+        "- name: Bob\n  email: not-an-email\n  groups: Team\n"
+        "- name: Other Alice\n  email: other@example.com\n  username: Alice\n"
+    )
+    (tmp_path / "c.yaml").write_text("- name: Broken\n  email: [\n")
+
+    errors = validate_inventory(str(tmp_path)).errors
+
+    assert len(errors) == 5
+    assert f"{tmp_path / 'b.yaml'}: entry 2: 'not-an-email' is not a 'email'" in errors
+    assert f"{tmp_path / 'b.yaml'}: entry 2: 'Team' is not of type 'array'" in errors
+    assert errors[2].startswith(f"{tmp_path / 'c.yaml'}: cannot be parsed")
+    already_defined = f"already defined in {tmp_path / 'a.yaml'} (entry 1)"
+    assert errors[3:] == [
+        f"{tmp_path / 'b.yaml'}: entry 1: duplicate email 'alice@example.com', {already_defined}",
+        f"{tmp_path / 'b.yaml'}: entry 3: duplicate username 'alice', {already_defined}",
+    ]
+
+
+def test_cached_results_reused(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that unchanged files are not parsed again, and their cached errors still count."""
+    (tmp_path / "a.yaml").write_text(VALID)
+    (tmp_path / "b.yaml").write_text("- name: Bob\n")
+    first = validate_inventory(str(tmp_path), use_index=True)
+
+    def fail(*_args: object) -> None:
+        pytest.fail("unchanged file parsed again")
+
+    monkeypatch.setattr(_index, "_parse_file", fail)
+
+    assert validate_inventory(str(tmp_path), use_index=True) == first
+    assert len(first.errors) == 1
+
+
+def test_nothing_written_without_index(tmp_path: Path) -> None:
+    """Test that validating leaves the inventory directory untouched by default."""
+    (tmp_path / "a.yaml").write_text(VALID)
+
+    validate_inventory(str(tmp_path))
+
+    assert [p.name for p in tmp_path.iterdir()] == ["a.yaml"]
+
+
+def test_changed_files_only(tmp_path: Path, run_git: Callable[..., None]) -> None:
+    """Test that --changed and --since only report errors in changed files."""
+    (tmp_path / "old.yaml").write_text("- name: Old\n")  # Pre-existing error
+    (tmp_path / "a.yaml").write_text(VALID)
+    run_git(tmp_path, "init", "-q")
+    run_git(tmp_path, "add", ".")
+    run_git(tmp_path, "commit", "-q", "-m", "initial")
+
+    assert validate_inventory(str(tmp_path), changed=True).errors == []
+
+    (tmp_path / "new.yaml").write_text(VALID.replace("Alice", "Alice 2"))
+    errors = validate_inventory(str(tmp_path), changed=True).errors
+    assert len(errors) == 2
+    assert all(error.startswith(str(tmp_path / "new.yaml")) for error in errors)
+
+    run_git(tmp_path, "add", ".")
+    run_git(tmp_path, "commit", "-q", "-m", "second")
+    assert validate_inventory(str(tmp_path), changed=True).errors == []
+    assert len(validate_inventory(str(tmp_path), since="HEAD~1").errors) == 2
+
+
+def test_run_validate(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    """Test the validate command output and its error count."""
+    (tmp_path / "a.yaml").write_text(VALID + "- name: Bob\n")
+
+    assert run_validate(str(tmp_path)) == 1
+
+    out = capsys.readouterr().out
+    assert "entry 2: 'email' is a required property" in out
+    assert "Validated 2 users in 1 files: 1 errors" in out